@@ -0,0 +1,126 @@
+import itertools
+import sys
+
+import baggage
+import change_feed
+import connection
+import data_access
+import duty_conflicts
+import flight_search
+import migrations
+import parallel_stats
+import passenger_search
+import rostering
+import seat_inventory
+
+# Index advisor. Runs EXPLAIN QUERY PLAN over the application's canonical queries and reports every full SCAN,
+# so a changed query (or a dropped index) shows up as a regression instead of a slow menu at production volumes.
+#
+# Each entry is (name, sql, params, allowed_scans). allowed_scans lists the tables/aliases where reading every row
+# is the point of the query, e.g. the stats reports walking every Pilot.
+
+
+def canonical_queries(): # The SQL the application runs, taken from the same place the menu gets it
+    queries = []
+
+    # Flight search builds a different statement for each combination of filters, check all of them (first page and a later keyset page)
+    filter_values = (("destination", "1,2"), ("status", "Scheduled,Delayed"), ("from", "2024-12-01"), ("to", "2024-12-08"), ("after", (migrations.to_epoch("2024-12-02 00:00:00"), "FL101")))
+    for mask in itertools.product((False, True), repeat=len(filter_values)):
+        chosen = {label: value for (label, value), used in zip(filter_values, mask) if used}
+        sql, params = flight_search.build_search(chosen.get("destination"), chosen.get("status"), chosen.get("from"), chosen.get("to"), chosen.get("after"), flight_search.DEFAULT_PAGE_SIZE + 1, flight_search.PAGE_COLUMNS)
+        queries.append(("search_flights[" + ",".join(chosen or ["all"]) + "]", sql, params, set()))
+
+    queries += [
+        ("flight_by_number", data_access.FLIGHT_BY_NUMBER_SQL, ["FL101"], set()),
+        ("pilot_by_id", data_access.PILOT_BY_ID_SQL, [1], set()),
+        ("list_pilots", data_access.LIST_PILOTS_SQL, [], {"Pilots"}),
+        ("destination_by_id", data_access.DESTINATION_BY_ID_SQL, [1], set()),
+        ("pilot_schedule", data_access.PILOT_SCHEDULE_SQL, [1], set()),
+        ("pilot_duty_windows", duty_conflicts.PILOT_WINDOWS_SQL, [1], set()),
+        ("duty_audit_sweep", duty_conflicts.ALL_WINDOWS_SQL, [], {"Flights"}),
+        ("roster_window", rostering.ROSTER_FLIGHTS_SQL, [1732838400, 1733788800], set()),
+        ("roster_pilot_ids", rostering.PILOT_IDS_SQL, [], {"Pilots"}),
+        ("roster_assign", rostering.ROSTER_ASSIGN_SQL, [1, "FL101"], set()),
+        ("bookings_for_flight", "SELECT * FROM Bookings WHERE FlightNumber = ?", ["FL101"], set()),
+        ("seat_inventory_load", seat_inventory.TAKEN_SEATS_SQL, ["FL101"], set()),
+        ("seat_inventory_book", seat_inventory.BOOK_SEAT_SQL, [1, "FL101", "2024-11-20", "1A", "Economy", "FL101", "1A"], set()),
+        ("passenger_search", passenger_search.SEARCH_SQL, [passenger_search.match_query("ali smi"), passenger_search.DEFAULT_LIMIT, passenger_search.DEFAULT_BOOKINGS_PER_PASSENGER],
+         {"PassengerSearch", "Candidates", "m"}), # The full-text index itself, and the LIMITed matches it returned
+        ("baggage_for_booking", "SELECT * FROM Baggage WHERE BookingID = ?", [1], set()),
+        ("baggage_for_flight", baggage.BAGS_FOR_FLIGHT_SQL, ["FL101"], set()),
+        ("baggage_flight_totals", baggage.FLIGHT_TOTALS_SQL, ["FL101"], set()),
+        ("baggage_scan_history", baggage.SCAN_HISTORY_SQL, ["BG001"], set()),
+        ("baggage_register", baggage.REGISTER_BAG_SQL, ["BG001", 1, 23.5, None], set()),
+        ("baggage_checkpoint", baggage.UPDATE_CHECKPOINT_SQL, ["Loaded", "2024-12-01 10:00:00", "BG001", "2024-12-01 10:00:00"], set()),
+        ("status_history", "SELECT * FROM FlightStatusLog WHERE FlightNumber = ? ORDER BY Timestamp", ["FL101"], set()),
+        ("change_feed_batch", change_feed.CHANGES_SQL + " ORDER BY Seq LIMIT ?", [0, change_feed.DEFAULT_BATCH_SIZE], set()),
+        ("stats_flights_per_destination", data_access.FLIGHTS_PER_DESTINATION_SQL, [], {"d", "f"}),
+        ("stats_flights_per_pilot", data_access.FLIGHTS_PER_PILOT_SQL, [], {"p"}),
+        ("stats_aircraft_usage", data_access.AIRCRAFT_USAGE_SQL, [], {"a"}),
+        ("summary_flights_per_destination", data_access.SUMMARY_FLIGHTS_PER_DESTINATION_SQL, [], {"c", "d"}),
+        ("summary_flights_per_pilot", data_access.SUMMARY_FLIGHTS_PER_PILOT_SQL, [], {"p"}),
+        ("summary_aircraft_usage", data_access.SUMMARY_AIRCRAFT_USAGE_SQL, [], {"a"}),
+    ]
+
+    # Parallel stats pieces: a row range of Flights, or a week of departures for the date-split reports
+    for name, report in parallel_stats.REPORTS.items():
+        piece, params = parallel_stats.piece_sql(report["split"]), [1, 1000] if report["split"][2] == "rowid" else [1733011200, 1733616000]
+        queries.append((f"parallel_stats[{name}]", report["partial"].format(piece=piece), params, {"a"})) # Aircrafts is small, read whole for the capacity join
+    return queries
+
+
+def explain(conn, sql, params): # Plan detail lines for one statement
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def scanned_table(detail): # "SCAN f USING COVERING INDEX idx" -> "f", None for anything that isn't a scan
+    if not detail.startswith("SCAN ") or detail == "SCAN CONSTANT ROW": # A SELECT without FROM reads no table
+        return None
+    return detail.split()[1]
+
+
+def is_bounded_ordered_walk(sql, plan): # A LIMITed query reading an index in ORDER BY order stops after one page, so its SCAN is not a full scan
+    return " LIMIT " in sql.upper() and not any("TEMP B-TREE FOR ORDER BY" in detail for detail in plan)
+
+
+def analyse(path=None): # Returns one (name, plan, unexpected_scans) tuple per canonical query
+    results = []
+
+    with connection.reader(path) as conn:
+        for name, sql, params, allowed in canonical_queries():
+            plan = explain(conn, sql, params)
+            if is_bounded_ordered_walk(sql, plan):
+                scans = []
+            else:
+                scans = [detail for detail in plan if scanned_table(detail) and scanned_table(detail) not in allowed]
+            results.append((name, plan, scans))
+
+    return results
+
+
+def report(path=None, verbose=False): # Print the advisor report, returns the number of queries with unexpected scans
+    problems = 0
+
+    for name, plan, scans in analyse(path):
+        if scans:
+            problems += 1
+            print(f"SCAN  {name}")
+            for detail in scans:
+                print(f"      {detail}")
+        else:
+            print(f"OK    {name}")
+
+        if verbose:
+            for detail in plan:
+                print(f"        | {detail}")
+
+    print("-" * 60)
+    print(f"{problems} quer{'y' if problems == 1 else 'ies'} with unexpected full scans")
+    return problems
+
+
+if __name__ == "__main__":
+    # Usage: python advisor.py [database file] [-v]. Exits non-zero on any unexpected scan so it can gate CI
+    args = [arg for arg in sys.argv[1:] if arg != "-v"]
+    path = args[0] if args else None
+    sys.exit(1 if report(path, verbose="-v" in sys.argv) else 0)
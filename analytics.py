@@ -0,0 +1,155 @@
+import argparse
+
+import columnar
+from columnar import np, NULL_CODE, NULL_EPOCH, NULL_ID
+
+# Vectorised analytics over a columnar snapshot (columnar.py). Every aggregate is a handful of whole-array operations
+# (bincount, lexsort, unique) on the memory-mapped columns; nothing here opens SQLite or loops over rows in Python.
+# Groups are dense integer keys, so a grouped sum is one np.bincount.
+
+DELAY_BINS = (-np.inf, 0, 5, 15, 30, 60, 120, 240, np.inf) if np is not None else None # Minutes
+DELAYED_AFTER_MINUTES = 15
+
+
+def group_reduce(keys, values=None, size=None): # (sums, counts) per integer key. Keys below zero (NULLs) are ignored
+    keep = keys >= 0
+    keys = keys[keep]
+    size = size if size is not None else (int(keys.max()) + 1 if keys.size else 0)
+    counts = np.bincount(keys, minlength=size)
+    sums = counts.astype(np.float64) if values is None else np.bincount(keys, weights=values[keep], minlength=size)
+    return sums, counts
+
+
+def group_mean(keys, values, size=None): # Mean of values per key, NaN values and empty groups give NaN
+    finite = ~np.isnan(values)
+    sums, counts = group_reduce(np.where(finite, keys, -1), np.where(finite, values, 0.0), size)
+    return np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+
+
+def lookup(ids, values, keys): # values[i] belongs to ids[i]; returns the value for every key (0 where the key is NULL or unknown)
+    if not ids.size:
+        return np.zeros(keys.shape, dtype=values.dtype)
+    table = np.zeros(max(int(ids.max()), int(keys.max(initial=0))) + 1, dtype=values.dtype)
+    table[ids[ids >= 0]] = values[ids >= 0]
+    return np.where(keys >= 0, table[np.clip(keys, 0, None)], 0)
+
+
+def flights_per_destination(snapshot): # {city: flights}, the Stats Mode report from the snapshot
+    flights, destinations = snapshot["flights"], snapshot["destinations"]
+    _, counts = group_reduce(flights["DestinationID"])
+    city_codes = lookup(destinations["DestinationID"], destinations["City"].astype(np.int32) + 1, np.arange(counts.size)) - 1
+    known = (counts > 0) & (city_codes != NULL_CODE) # Like the SQL join, flights to a destination that doesn't exist count nowhere
+    totals = {}
+    for city, count in zip(snapshot.decode("destinations", "City", city_codes[known]), counts[known]):
+        totals[city] = totals.get(city, 0) + int(count)
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def load_factors(snapshot): # Seats booked / aircraft capacity per flight (NaN without a known capacity), with per-destination means
+    flights, bookings, aircrafts = snapshot["flights"], snapshot["bookings"], snapshot["aircrafts"]
+    flight_count = snapshot.rows("flights")
+
+    active = bookings["BookingStatus"] != snapshot.code("bookings", "BookingStatus", "Cancelled")
+    _, booked = group_reduce(np.where(active, bookings["FlightIndex"], -1), size=flight_count)
+    capacity = lookup(aircrafts["AircraftID"], aircrafts["Capacity"], flights["AircraftID"]).astype(np.float64)
+    factors = np.divide(booked, capacity, out=np.full(flight_count, np.nan), where=capacity > 0)
+
+    by_destination = group_mean(flights["DestinationID"], factors)
+    return {
+        "per_flight": factors,
+        "mean": float(np.nanmean(factors)) if np.isfinite(factors).any() else None,
+        "overbooked_flights": int(np.sum(factors > 1)),
+        "per_destination": {int(destination): float(value) for destination, value in enumerate(by_destination) if not np.isnan(value)},
+    }
+
+
+def departure_delays(snapshot): # Minutes between scheduled departure and the first Departed event, one value per departed flight
+    flights, log = snapshot["flights"], snapshot["status_log"]
+    departed = (log["Status"] == snapshot.code("status_log", "Status", "Departed")) & (log["FlightIndex"] >= 0) & (log["Timestamp"] != NULL_EPOCH)
+    flight_index, timestamp = log["FlightIndex"][departed], log["Timestamp"][departed]
+
+    order = np.lexsort((timestamp, flight_index)) # By flight, then time, so the first row of each flight is its first departure
+    flight_index, timestamp = flight_index[order], timestamp[order]
+    flight_index, first = np.unique(flight_index, return_index=True)
+    timestamp = timestamp[first]
+
+    scheduled = flights["Departure"][flight_index]
+    known = scheduled != NULL_EPOCH
+    return (timestamp[known] - scheduled[known]) / 60.0
+
+
+def delay_distribution(snapshot, bins=DELAY_BINS): # Percentiles and a histogram of departure delays
+    delays = departure_delays(snapshot)
+    if not delays.size:
+        return {"flights": 0}
+    counts, edges = np.histogram(delays, bins=np.asarray(bins, dtype=np.float64))
+    p50, p90, p95, p99 = np.percentile(delays, (50, 90, 95, 99))
+    return {
+        "flights": int(delays.size),
+        "mean_minutes": float(delays.mean()),
+        "p50_minutes": float(p50),
+        "p90_minutes": float(p90),
+        "p95_minutes": float(p95),
+        "p99_minutes": float(p99),
+        "delayed_share": float(np.mean(delays > DELAYED_AFTER_MINUTES)),
+        "histogram": [(float(low), float(high), int(count)) for low, high, count in zip(edges[:-1], edges[1:], counts)],
+    }
+
+
+def route_time_series(snapshot, period="M", values=None):
+    # Departures per (destination, period), or the mean of a per-flight values array (e.g. load factors) when given.
+    # period is a NumPy datetime unit: "D", "W" or "M". Returns (destination IDs, period starts, matrix)
+    flights = snapshot["flights"]
+    keep = (flights["Departure"] != NULL_EPOCH) & (flights["DestinationID"] != NULL_ID)
+    periods = flights["Departure"][keep].astype("datetime64[s]").astype(f"datetime64[{period}]")
+    period_starts, period_keys = np.unique(periods, return_inverse=True)
+    destinations, destination_keys = np.unique(flights["DestinationID"][keep], return_inverse=True)
+
+    keys = destination_keys * len(period_starts) + period_keys
+    size = len(destinations) * len(period_starts)
+    if values is None:
+        _, counts = group_reduce(keys, size=size)
+        matrix = counts
+    else:
+        matrix = group_mean(keys, np.asarray(values, dtype=np.float64)[keep], size)
+    return destinations, period_starts, matrix.reshape(len(destinations), len(period_starts))
+
+
+def summary(snapshot, period="M"): # Everything above, in a printable shape
+    factors = load_factors(snapshot)
+    destinations, periods, departures = route_time_series(snapshot, period)
+    busiest = np.argsort(departures.sum(axis=1))[::-1][:5]
+    return {
+        "flights_per_destination": flights_per_destination(snapshot),
+        "load_factor_mean": factors["mean"],
+        "overbooked_flights": factors["overbooked_flights"],
+        "delays": delay_distribution(snapshot),
+        "busiest_routes": {int(destinations[row]): dict(zip((str(start) for start in periods), departures[row].tolist())) for row in busiest},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vectorised analytics over a columnar snapshot")
+    parser.add_argument("--snapshot", default=columnar.DEFAULT_DIRECTORY, help="directory written by columnar.py")
+    parser.add_argument("--period", default="M", choices=["D", "W", "M"], help="time series granularity")
+    args = parser.parse_args()
+
+    result = summary(columnar.load(args.snapshot), args.period)
+
+    print("Load factor (mean):", "n/a" if result["load_factor_mean"] is None else f"{result['load_factor_mean']:.1%}")
+    print("Overbooked flights:", result["overbooked_flights"])
+
+    delays = result["delays"]
+    if delays["flights"]:
+        print(f"\nDeparture delays over {delays['flights']} flights: p50 {delays['p50_minutes']:.0f} min, p95 {delays['p95_minutes']:.0f} min, "
+              f"{delays['delayed_share']:.1%} more than {DELAYED_AFTER_MINUTES} min late")
+        for low, high, count in delays["histogram"]:
+            print(f"  {low:>6.0f} .. {high:<6.0f} min | {count}")
+
+    print("\nFlights per destination:")
+    for city, count in result["flights_per_destination"].items():
+        print(f"  {city:<20} | {count}")
+
+    print(f"\nBusiest routes, departures per period ({args.period}):")
+    for destination, series in result["busiest_routes"].items():
+        print(f"  Destination {destination}: " + ", ".join(f"{start} {count}" for start, count in series.items()))
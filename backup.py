@@ -0,0 +1,256 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+import connection
+import data_access
+import latency
+import migrations
+
+# Online backups. The database is copied with the sqlite3 backup API a few pages at a time, sleeping between steps, so
+# it never holds anything a reader or the writer waits on for more than one step. The copy is taken inside one read
+# transaction on the source: with WAL that is a fixed snapshot the writer keeps committing past, so the snapshot is
+# consistent and the backup never restarts because of a concurrent commit (the WAL just can't be checkpointed past it
+# until the copy finishes).
+#
+# Every snapshot is a self-contained file named after the database and the UTC time it was taken, with a JSON manifest
+# beside it holding its SHA-256, schema version and per-table row counts. verify() checks a snapshot against its
+# manifest and restore() only copies a snapshot that verifies, then checks the restored database the same way.
+#
+# With probe_latency=True a foreground stand-in (a flight lookup plus a write lock round trip) is timed before and during the
+# copy, so the report shows what the backup costs the application.
+
+DEFAULT_BACKUP_DIR = "backups"
+DEFAULT_STEP_PAGES = 256 # 1MB per step with 4KB pages
+DEFAULT_STEP_SLEEP = 0.005 # Seconds between steps
+DEFAULT_PROBE_BASELINE = 2.0 # Seconds of probe timings taken before the copy starts
+PROBE_INTERVAL = 0.005
+CHECK_PRAGMA = "quick_check" # Same checks as integrity_check less the index contents, an order of magnitude faster
+HASH_CHUNK = 1024 * 1024
+
+TABLES_SQL = "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE 'CREATE VIRTUAL%' ORDER BY name"
+
+
+def sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_path(snapshot):
+    return snapshot + ".json"
+
+
+def check(conn): # (CHECK_PRAGMA result, {table: row count}) for an open database
+    result = "; ".join(row[0] for row in conn.execute(f"PRAGMA {CHECK_PRAGMA}"))
+    tables = [name for (name,) in conn.execute(TABLES_SQL)]
+    return result, {name: conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0] for name in tables}
+
+
+def probe(path, stop, samples): # Time a flight lookup and a write lock round trip until stop is set. Writes nothing
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout = 5000")
+    numbers = [number for (number,) in conn.execute("SELECT FlightNumber FROM Flights LIMIT 1000")] or ["FL101"]
+    rng = random.Random(42)
+    try:
+        while not stop.is_set():
+            started = time.perf_counter()
+            conn.execute(data_access.FLIGHT_BY_NUMBER_SQL, (rng.choice(numbers),)).fetchall()
+            samples["read"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("ROLLBACK")
+            samples["write_lock"].append(time.perf_counter() - started)
+            time.sleep(PROBE_INTERVAL)
+    finally:
+        conn.close()
+
+
+def probe_summary(samples):
+    return {kind: {key: value for key, value in latency.summarise(values, 0).items() if key != "mean_rows"} for kind, values in samples.items() if values}
+
+
+def copy(source, target, pages, sleep): # Stepped copy inside one read transaction on source. Returns the number of steps
+    steps = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        if remaining:
+            time.sleep(sleep) # Between steps nothing is locked, readers and the writer run freely
+
+    source.execute("BEGIN")
+    source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall() # BEGIN is deferred, this takes the read snapshot
+    try:
+        source.backup(target, pages=pages, progress=progress)
+    finally:
+        source.rollback()
+    return steps
+
+
+def backup(path=None, directory=DEFAULT_BACKUP_DIR, pages=DEFAULT_STEP_PAGES, sleep=DEFAULT_STEP_SLEEP, probe_latency=False,
+           probe_baseline=DEFAULT_PROBE_BASELINE): # Take a snapshot while the database stays in use. Returns its manifest
+    path = path or connection.db_file
+    os.makedirs(directory, exist_ok=True)
+    taken_at = time.gmtime()
+    name = f"{os.path.splitext(os.path.basename(path))[0]}-{time.strftime('%Y%m%dT%H%M%SZ', taken_at)}.db"
+    snapshot = os.path.join(directory, name)
+    if os.path.exists(snapshot):
+        raise FileExistsError(f"{snapshot} already exists")
+
+    stop, samples, prober = threading.Event(), {}, None
+    if probe_latency:
+        baseline = {"read": [], "write_lock": []}
+        samples = {"read": [], "write_lock": []}
+        prober = threading.Thread(target=probe, args=(path, stop, baseline), daemon=True)
+        prober.start()
+        time.sleep(probe_baseline)
+        stop.set()
+        prober.join()
+        stop = threading.Event()
+        prober = threading.Thread(target=probe, args=(path, stop, samples), daemon=True)
+        prober.start()
+
+    source = sqlite3.connect(path)
+    source.execute("PRAGMA busy_timeout = 5000")
+    target = sqlite3.connect(snapshot + ".tmp")
+    started = time.perf_counter()
+    try:
+        steps = copy(source, target, pages, sleep)
+        elapsed = time.perf_counter() - started
+        target.execute("PRAGMA journal_mode = DELETE") # The copy carries the source's WAL flag; a snapshot is one file
+        result, counts = check(target)
+        version = migrations.current_version(target)
+    finally:
+        stop.set()
+        if prober is not None:
+            prober.join()
+        source.close()
+        target.close()
+
+    if result != "ok":
+        os.remove(snapshot + ".tmp")
+        raise ValueError(f"Snapshot of {path} failed {CHECK_PRAGMA}: {result}")
+    os.replace(snapshot + ".tmp", snapshot)
+
+    size = os.path.getsize(snapshot)
+    manifest = {
+        "snapshot": name,
+        "source": os.path.abspath(path),
+        "taken_at": time.strftime("%Y-%m-%d %H:%M:%S", taken_at),
+        "schema_version": version,
+        "bytes": size,
+        "sha256": sha256(snapshot),
+        "tables": counts,
+        "seconds": round(elapsed, 3),
+        "steps": steps,
+        "mb_per_second": round(size / 1048576 / elapsed, 1) if elapsed else None,
+    }
+    if probe_latency:
+        manifest["foreground"] = {"before": probe_summary(baseline), "during": probe_summary(samples)}
+    with open(manifest_path(snapshot), "w") as handle:
+        json.dump(manifest, handle, indent=2)
+    return dict(manifest, file=snapshot)
+
+
+def verify(snapshot): # Check a snapshot against its manifest: checksum, then structure and row counts. Returns the manifest
+    try:
+        with open(manifest_path(snapshot)) as handle:
+            manifest = json.load(handle)
+    except FileNotFoundError:
+        raise ValueError(f"{snapshot} has no manifest, it can't be verified")
+
+    if sha256(snapshot) != manifest["sha256"]:
+        raise ValueError(f"{snapshot} does not match the checksum in its manifest")
+    conn = sqlite3.connect(f"file:{snapshot}?mode=ro", uri=True)
+    try:
+        result, counts = check(conn)
+    finally:
+        conn.close()
+    if result != "ok":
+        raise ValueError(f"{snapshot} failed {CHECK_PRAGMA}: {result}")
+    if counts != manifest["tables"]:
+        raise ValueError(f"{snapshot} row counts differ from its manifest")
+    return manifest
+
+
+def restore(snapshot, path=None, force=False): # Replace a database with a verified snapshot, then check the result. Returns the manifest
+    path = path or connection.db_file
+    manifest = verify(snapshot)
+
+    source = sqlite3.connect(f"file:{snapshot}?mode=ro", uri=True)
+    target = sqlite3.connect(path)
+    try:
+        target.execute("PRAGMA busy_timeout = 5000")
+        if not force and migrations.current_version(target) and not migrations.is_empty(target):
+            raise FileExistsError(f"{path} already holds data, pass force to overwrite it")
+        source.backup(target) # One step: other connections see the old database or the new one, never a mix
+        target.execute("PRAGMA journal_mode = WAL")
+        result, counts = check(target)
+    finally:
+        source.close()
+        target.close()
+
+    if result != "ok" or counts != manifest["tables"]:
+        raise ValueError(f"{path} did not check out after restoring {snapshot}: {result}")
+    return manifest
+
+
+def snapshots(directory=DEFAULT_BACKUP_DIR): # Manifests of every snapshot in directory, oldest first
+    found = []
+    for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        if name.endswith(".db.json"):
+            with open(os.path.join(directory, name)) as handle:
+                found.append(dict(json.load(handle), file=os.path.join(directory, name[:-len(".json")])))
+    return sorted(found, key=lambda manifest: manifest["taken_at"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Back up the database while it is in use, and verify or restore snapshots")
+    parser.add_argument("command", choices=["backup", "verify", "restore", "list"])
+    parser.add_argument("snapshot", nargs="?", help="snapshot file, for verify and restore")
+    parser.add_argument("--db", default=None, help="database file (defaults to airline.db)")
+    parser.add_argument("--dir", default=DEFAULT_BACKUP_DIR, help="where snapshots are kept")
+    parser.add_argument("--pages", type=int, default=DEFAULT_STEP_PAGES, help="pages copied per step")
+    parser.add_argument("--sleep", type=float, default=DEFAULT_STEP_SLEEP, help="seconds to pause between steps")
+    parser.add_argument("--probe", action="store_true", help="time foreground reads and write locks before and during the backup")
+    parser.add_argument("--force", action="store_true", help="restore over a database that already holds data")
+    args = parser.parse_args()
+
+    if args.db:
+        connection.db_file = args.db
+
+    if args.command == "backup":
+        manifest = backup(directory=args.dir, pages=args.pages, sleep=args.sleep, probe_latency=args.probe)
+        print(f"{manifest['file']}: {manifest['bytes'] / 1048576:.1f} MB in {manifest['seconds']} s "
+              f"({manifest['steps']} steps, {manifest['mb_per_second']} MB/s), sha256 {manifest['sha256']}")
+        for phase, kinds in manifest.get("foreground", {}).items():
+            for kind, summary in kinds.items():
+                print(f"  {phase:<7} {kind:<11} " + "  ".join(f"{key} {value}" for key, value in summary.items()))
+
+    elif args.command in ("verify", "restore"):
+        if not args.snapshot:
+            parser.error(f"{args.command} needs a snapshot file")
+        try:
+            if args.command == "verify":
+                manifest = verify(args.snapshot)
+                print(f"{args.snapshot} is intact: schema version {manifest['schema_version']}, taken {manifest['taken_at']}")
+            else:
+                manifest = restore(args.snapshot, force=args.force)
+                print(f"Restored {connection.db_file} from {args.snapshot} (taken {manifest['taken_at']}) and checked it")
+        except (ValueError, FileExistsError) as e:
+            print(e)
+            sys.exit(1) # Non-zero so a scheduled verify can alert
+
+    elif args.command == "list":
+        for manifest in snapshots(args.dir):
+            print(f"{manifest['taken_at']} | {manifest['file']} | {manifest['bytes'] / 1048576:.1f} MB | v{manifest['schema_version']} | {manifest['sha256'][:12]}")
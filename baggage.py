@@ -0,0 +1,161 @@
+import argparse
+import time
+
+import bulk_import
+import connection
+import group_commit
+import migrations
+
+# Baggage tracking. Tag scans from check-in desks, loaders and carousels are ingested in batches keyed on TagNumber,
+# with the same group-commit writer as flight status events (group_commit.GroupCommitIngestor). A scan carrying a
+# BookingID (check-in, or a re-weigh) registers or updates the bag; any other scan must be for a known tag. Every scan
+# is kept in BaggageScans and the bag's latest checkpoint is stored on the Baggage row.
+#
+# Bag count and weight per booking and per flight come from the totals the triggers of migration 9 maintain, so the
+# weight-and-balance figure for a flight is one primary key lookup. The bags themselves are read through
+# Bookings (FlightNumber) and Baggage (BookingID), both indexed.
+
+CHECKPOINTS = ("CheckIn", "Loaded", "Unloaded", "Transfer", "Claimed", "Offloaded")
+
+SCAN_SPEC = { # Same shape as bulk_import.TABLES, so scans are validated and FK-checked by the same code
+    "table": "BaggageScans",
+    "columns": ["TagNumber", "Checkpoint", "ScannedAt", "Location", "BookingID", "Weight", "Description"],
+    "required": ["TagNumber", "Checkpoint", "ScannedAt"],
+    "types": {"ScannedAt": "datetime", "BookingID": "int", "Weight": "float"},
+    "foreign_keys": [("BookingID", "Bookings", "BookingID")],
+}
+KNOWN_TAG_SPEC = {"columns": ["TagNumber"], "foreign_keys": [("TagNumber", "Baggage", "TagNumber")]}
+
+BAG_COLUMNS = ("BaggageID", "TagNumber", "BookingID", "Weight", "Description", "LastCheckpoint", "LastScannedAt")
+
+# Registers a bag on first sight of its tag; later scans with a booking fill in whatever they carry
+REGISTER_BAG_SQL = """
+    INSERT INTO Baggage (TagNumber, BookingID, Weight, Description) VALUES (?, ?, ?, ?)
+    ON CONFLICT (TagNumber) DO UPDATE SET
+        BookingID = excluded.BookingID,
+        Weight = coalesce(excluded.Weight, Weight),
+        Description = coalesce(excluded.Description, Description)
+"""
+INSERT_SCAN_SQL = "INSERT INTO BaggageScans (TagNumber, Checkpoint, ScannedAt, Location) VALUES (?, ?, ?, ?)"
+# A late scan never replaces a newer checkpoint
+UPDATE_CHECKPOINT_SQL = "UPDATE Baggage SET LastCheckpoint = ?, LastScannedAt = ? WHERE TagNumber = ? AND (LastScannedAt IS NULL OR LastScannedAt <= ?)"
+
+BAGS_FOR_FLIGHT_SQL = f"""
+    SELECT {', '.join(f'g.{column}' for column in BAG_COLUMNS)}
+    FROM Bookings b
+    JOIN Baggage g ON g.BookingID = b.BookingID
+    WHERE b.FlightNumber = ?
+    ORDER BY g.BookingID, g.BaggageID
+"""
+FLIGHT_TOTALS_SQL = "SELECT BagCount, TotalWeight FROM FlightBaggageTotals WHERE FlightNumber = ?"
+BOOKING_TOTALS_SQL = "SELECT BagCount, TotalWeight FROM BookingBaggageTotals WHERE BookingID = ?"
+SCAN_HISTORY_SQL = "SELECT Checkpoint, ScannedAt, Location FROM BaggageScans WHERE TagNumber = ? ORDER BY ScannedAt"
+
+
+def new_scan(tag_number, checkpoint, scanned_at=None, location=None, booking_id=None, weight=None, description=None): # One scan as the ingestor queues it
+    return {"TagNumber": tag_number, "Checkpoint": checkpoint, "ScannedAt": scanned_at or time.strftime(bulk_import.DATETIME_FORMAT, time.gmtime()),
+            "Location": location, "BookingID": booking_id, "Weight": weight, "Description": description}
+
+
+def write_batch(conn, scans): # Validate, register and record one batch inside the caller's transaction. Returns (committed, rejected)
+    rows = []
+    for scan in scans:
+        try:
+            row = bulk_import.validate_row(SCAN_SPEC, scan)
+        except ValueError:
+            continue
+        if row[1] in CHECKPOINTS and (row[5] is None or row[5] >= 0):
+            rows.append(row)
+
+    _, _, unknown_bookings = bulk_import.missing_parents(conn, SCAN_SPEC, rows)[SCAN_SPEC["columns"].index("BookingID")]
+    rows = [row for row in rows if row[4] not in unknown_bookings]
+
+    conn.executemany(REGISTER_BAG_SQL, [(row[0], row[4], row[5], row[6]) for row in rows if row[4] is not None])
+    _, _, unknown_tags = bulk_import.missing_parents(conn, KNOWN_TAG_SPEC, [(row[0],) for row in rows])[0]
+    rows = [row for row in rows if row[0] not in unknown_tags]
+
+    latest = {} # TagNumber -> newest scan in the batch; later arrivals win ties
+    for row in rows:
+        if row[0] not in latest or row[2] >= latest[row[0]][2]:
+            latest[row[0]] = row
+
+    conn.executemany(INSERT_SCAN_SQL, [row[:4] for row in rows])
+    conn.executemany(UPDATE_CHECKPOINT_SQL, [(row[1], row[2], row[0], row[2]) for row in latest.values()])
+    return len(rows), len(scans) - len(rows)
+
+
+class ScanIngestor(group_commit.GroupCommitIngestor):
+
+    def __init__(self, path=None, max_batch=group_commit.DEFAULT_MAX_BATCH, max_delay=group_commit.DEFAULT_MAX_DELAY, max_pending=group_commit.DEFAULT_MAX_PENDING, on_error=None):
+        super().__init__(write_batch, "baggage scan", path, max_batch, max_delay, max_pending, on_error)
+
+    def submit(self, tag_number, checkpoint, scanned_at=None, location=None, booking_id=None, weight=None, description=None, block=True, timeout=None):
+        self.put(new_scan(tag_number, checkpoint, scanned_at, location, booking_id, weight, description), block, timeout)
+
+
+def bags_for_flight(flight_number, path=None): # Every bag booked on the flight, rows follow BAG_COLUMNS
+    with connection.reader(path) as conn:
+        return conn.execute(BAGS_FOR_FLIGHT_SQL, (flight_number,)).fetchall()
+
+
+def flight_totals(flight_number, path=None): # (bag count, total weight) for the flight, (0, 0.0) when it has no bags
+    with connection.reader(path) as conn:
+        row = conn.execute(FLIGHT_TOTALS_SQL, (flight_number,)).fetchone()
+    return (row[0], round(row[1], 3)) if row else (0, 0.0) # Rounded: the running REAL sum picks up float noise
+
+
+def booking_totals(booking_id, path=None):
+    with connection.reader(path) as conn:
+        row = conn.execute(BOOKING_TOTALS_SQL, (booking_id,)).fetchone()
+    return (row[0], round(row[1], 3)) if row else (0, 0.0)
+
+
+def scan_history(tag_number, path=None): # (Checkpoint, ScannedAt, Location) for every scan of the tag, oldest first
+    with connection.reader(path) as conn:
+        return conn.execute(SCAN_HISTORY_SQL, (tag_number,)).fetchall()
+
+
+def rebuild_totals(path=None): # Recompute every total from Baggage, e.g. after rows were written with the triggers dropped
+    with connection.writer(path) as conn:
+        migrations.rebuild_baggage_totals(conn.cursor())
+
+
+def replay(path, db_path=None, max_batch=group_commit.DEFAULT_MAX_BATCH, max_delay=group_commit.DEFAULT_MAX_DELAY): # Feed a CSV/JSONL file of scans through the ingestor, returns its stats
+    ingestor = ScanIngestor(db_path, max_batch, max_delay)
+    try:
+        for _, row in bulk_import.read_rows(path):
+            ingestor.put(row)
+        ingestor.flush()
+    finally:
+        ingestor.stop()
+    return ingestor.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Baggage tag scans and per-flight bag totals")
+    parser.add_argument("command", choices=["replay", "flight", "tag", "rebuild"])
+    parser.add_argument("target", nargs="?", help="replay: CSV/JSONL of scans; flight: flight number; tag: tag number")
+    parser.add_argument("--db", default=None, help="database file (defaults to airline.db)")
+    args = parser.parse_args()
+
+    if args.db:
+        connection.db_file = args.db
+    migrations.bootstrap()
+
+    if args.command == "replay":
+        for name, value in replay(args.target).items():
+            print(f"{name:<18} {value}")
+
+    elif args.command == "flight":
+        count, weight = flight_totals(args.target)
+        print(f"{args.target}: {count} bags, {weight:.1f} kg")
+        for bag in bags_for_flight(args.target):
+            print(" | ".join("" if value is None else str(value) for value in bag))
+
+    elif args.command == "tag":
+        for checkpoint, scanned_at, location in scan_history(args.target):
+            print(f"{scanned_at} | {checkpoint:<10} | {location or ''}")
+
+    elif args.command == "rebuild":
+        rebuild_totals()
+        print("Baggage totals rebuilt")
@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import time
+
+import connection
+import data_access
+import flight_search
+import generate_data
+import latency
+import passenger_search
+
+# Query benchmark. Generates (or reuses) a synthetic database per scale, times each application query over many
+# randomised calls and reports p50/p95/p99 latency. Results are saved as JSON so runs can be compared.
+
+DEFAULT_SCALES = [10000, 100000, 1000000]
+STATUSES = generate_data.FLIGHT_STATUSES[0]
+
+
+def benchmark_queries(rng, bounds): # (name, sql, params factory, iterations) for every query the menu runs
+    def search_first_page():
+        destinations = rng.sample(range(1, bounds["destinations"] + 1), rng.randint(1, 3)) if rng.random() < 0.7 else None
+        statuses = rng.sample(STATUSES, rng.randint(1, 2)) if rng.random() < 0.5 else None
+        departure_from = rng.choice(bounds["departures"])[:10] if rng.random() < 0.5 else None
+        return flight_search.build_search(destinations, statuses, departure_from, None, None, flight_search.DEFAULT_PAGE_SIZE + 1, flight_search.PAGE_COLUMNS)
+
+    def fixed(sql, params):
+        return lambda: (sql, params())
+
+    return [
+        ("search_flights_first_page", search_first_page, 200),
+        ("flight_by_number", fixed(data_access.FLIGHT_BY_NUMBER_SQL, lambda: [f"GN{rng.randint(1, bounds['flights']):08d}"]), 500),
+        ("list_pilots", fixed(data_access.LIST_PILOTS_SQL, lambda: []), 20),
+        ("pilot_schedule", fixed(data_access.PILOT_SCHEDULE_SQL, lambda: [rng.randint(1, bounds["pilots"])]), 500),
+        ("bookings_for_flight", fixed("SELECT * FROM Bookings WHERE FlightNumber = ?", lambda: [f"GN{rng.randint(1, bounds['flights']):08d}"]), 500),
+        ("passenger_search", fixed(passenger_search.SEARCH_SQL, lambda: [passenger_search.match_query(f"{rng.choice(generate_data.FIRST_NAMES)[:3]} {rng.choice(generate_data.LAST_NAMES)}"),
+                                                                        passenger_search.DEFAULT_LIMIT, passenger_search.DEFAULT_BOOKINGS_PER_PASSENGER]), 500),
+        ("stats_flights_per_destination", fixed(data_access.FLIGHTS_PER_DESTINATION_SQL, lambda: []), 5),
+        ("stats_flights_per_pilot", fixed(data_access.FLIGHTS_PER_PILOT_SQL, lambda: []), 5),
+        ("stats_aircraft_usage", fixed(data_access.AIRCRAFT_USAGE_SQL, lambda: []), 5),
+        ("summary_flights_per_destination", fixed(data_access.SUMMARY_FLIGHTS_PER_DESTINATION_SQL, lambda: []), 50),
+        ("summary_flights_per_pilot", fixed(data_access.SUMMARY_FLIGHTS_PER_PILOT_SQL, lambda: []), 50),
+        ("summary_aircraft_usage", fixed(data_access.SUMMARY_AIRCRAFT_USAGE_SQL, lambda: []), 50),
+    ]
+
+
+def bounds_for(conn): # Parameter ranges taken from the database itself, so any generated scale works
+    count = lambda table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    departures = [row[0] for row in conn.execute("SELECT DepartureDateTime FROM Flights ORDER BY random() LIMIT 200")]
+    return {"flights": count("Flights"), "pilots": count("Pilots"), "destinations": count("Destinations"), "departures": departures or [""]}
+
+
+def run_scale(path, seed=42, iteration_scale=1.0): # Time every query against one database. Returns {query name: summary}
+    rng = random.Random(seed)
+    results = {}
+
+    with connection.reader(path) as conn:
+        bounds = bounds_for(conn)
+        for name, make_query, iterations in benchmark_queries(rng, bounds):
+            iterations = max(1, int(iterations * iteration_scale))
+            sql, params = make_query()
+            conn.execute(sql, params).fetchall() # Warm-up, the first run pays for the page cache and statement prepare
+
+            samples, rows = [], 0
+            for _ in range(iterations):
+                sql, params = make_query()
+                started = time.perf_counter()
+                rows += len(conn.execute(sql, params).fetchall())
+                samples.append(time.perf_counter() - started)
+
+            results[name] = latency.summarise(samples, rows)
+
+    return results
+
+
+def database_for_scale(directory, flights, seed): # Generated databases are cached on disk, generation dominates a large run
+    path = os.path.join(directory, f"bench_{flights}_{seed}.db")
+    if not os.path.exists(path):
+        print(f"Generating {flights:,} flights into {path}")
+        generate_data.generate(path, flights, seed)
+    return path
+
+
+def run(scales, seed=42, directory=".", iteration_scale=1.0): # Full benchmark run, returned as a JSON-ready dict
+    report = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seed": seed,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "scales": {},
+    }
+
+    for flights in scales:
+        path = database_for_scale(directory, flights, seed)
+        print(f"\nBenchmarking {flights:,} flights")
+        report["scales"][str(flights)] = results = run_scale(path, seed, iteration_scale)
+        print_results(results)
+
+    return report
+
+
+def print_results(results, baseline=None): # Table of percentiles, with the change against a baseline run when given
+    print("{:<32} | {:>10} | {:>10} | {:>10} | {}".format("Query", "p50 ms", "p95 ms", "p99 ms", "vs baseline p95" if baseline else ""))
+    print("-" * 90)
+    for name, summary in results.items():
+        change = ""
+        if baseline and name in baseline and baseline[name]["p95_ms"]:
+            change = f"{summary['p95_ms'] / baseline[name]['p95_ms']:.2f}x"
+        print("{:<32} | {:>10} | {:>10} | {:>10} | {}".format(name, summary["p50_ms"], summary["p95_ms"], summary["p99_ms"], change))
+
+
+def compare(current_file, baseline_file): # Print two saved runs side by side, scale by scale
+    with open(current_file) as handle:
+        current = json.load(handle)
+    with open(baseline_file) as handle:
+        baseline = json.load(handle)
+
+    for scale, results in current["scales"].items():
+        print(f"\n{int(scale):,} flights ({current_file} vs {baseline_file})")
+        print_results(results, baseline["scales"].get(scale))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the application queries at several data scales")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="flight counts to benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dir", default=".", help="where generated databases are kept between runs")
+    parser.add_argument("--iterations", type=float, default=1.0, help="multiplier on the per-query iteration counts")
+    parser.add_argument("--output", default=None, help="save results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("CURRENT", "BASELINE"), help="compare two saved result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        report = run(args.scales, args.seed, args.dir, args.iterations)
+        if args.output:
+            with open(args.output, "w") as handle:
+                json.dump(report, handle, indent=2)
+            print(f"\nResults saved to {args.output}")
@@ -0,0 +1,320 @@
+import argparse
+import csv
+import json
+import sqlite3
+import time
+from datetime import datetime
+
+import connection
+import migrations
+
+# Streaming bulk loader for the nightly schedule feed. Files are read one row at a time (CSV or JSONL), validated in
+# batches and inserted with executemany inside chunked transactions, so memory stays flat however big the file is.
+
+DATETIME_FORMAT = migrations.DATETIME_FORMAT
+DATE_FORMAT = migrations.DATE_FORMAT
+
+# Per table: the columns accepted from the file (in insert order), which of them are required, how each is typed,
+# and the foreign keys checked per batch as (column, parent table, parent column)
+TABLES = {
+    "flights": {
+        "table": "Flights",
+        "columns": ["FlightNumber", "DepartureDateTime", "ArrivalDateTime", "Status", "DestinationID", "PilotID", "AircraftID"],
+        "required": ["FlightNumber", "DepartureDateTime", "ArrivalDateTime"],
+        "types": {"DepartureDateTime": "datetime", "ArrivalDateTime": "datetime", "DestinationID": "int", "PilotID": "int", "AircraftID": "int"},
+        "foreign_keys": [("DestinationID", "Destinations", "DestinationID"), ("PilotID", "Pilots", "PilotID"), ("AircraftID", "Aircrafts", "AircraftID")],
+    },
+    "passengers": {
+        "table": "Passengers",
+        "columns": ["PassengerID", "FirstName", "LastName", "DateOfBirth", "PassportNumber", "ContactNumber", "Email", "Nationality"],
+        "required": ["FirstName", "LastName", "PassportNumber"],
+        "types": {"PassengerID": "int", "DateOfBirth": "date"},
+        "foreign_keys": [],
+    },
+    "bookings": {
+        "table": "Bookings",
+        "columns": ["BookingID", "PassengerID", "FlightNumber", "BookingDate", "SeatNumber", "Class", "BookingStatus"],
+        "required": ["PassengerID", "FlightNumber"],
+        "types": {"BookingID": "int", "PassengerID": "int", "BookingDate": "date"},
+        "foreign_keys": [("PassengerID", "Passengers", "PassengerID"), ("FlightNumber", "Flights", "FlightNumber")],
+    },
+    "baggage": {
+        "table": "Baggage",
+        "columns": ["BaggageID", "BookingID", "Weight", "TagNumber", "Description"],
+        "required": ["BookingID", "TagNumber"],
+        "types": {"BaggageID": "int", "BookingID": "int", "Weight": "float"},
+        "foreign_keys": [("BookingID", "Bookings", "BookingID")],
+    },
+    "status": {
+        "table": migrations.STATUS_LOG_LIVE, # New events always land in the Live partition
+        "columns": ["LogID", "FlightNumber", "Status", "Timestamp", "Reason"],
+        "required": ["FlightNumber", "Status", "Timestamp"],
+        "types": {"LogID": "int", "Timestamp": "datetime"},
+        "foreign_keys": [("FlightNumber", "Flights", "FlightNumber")],
+    },
+}
+
+MAX_IN_PARAMS = 500 # Keep IN (...) lists well under SQLite's bound parameter limit
+
+
+def read_rows(path): # Yields (line number, dict) one row at a time. .jsonl/.ndjson files are JSON lines, anything else is CSV
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as handle:
+            for line_number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, {"__error__": f"invalid JSON: {e}", "__raw__": line.rstrip("\n")}
+                    continue
+                yield line_number, row
+    else:
+        with open(path, newline="", encoding="utf-8") as handle:
+            for line_number, row in enumerate(csv.DictReader(handle), start=2): # Line 1 is the header
+                yield line_number, row
+
+
+def batched(rows, size): # Group an iterator into lists of at most size items without reading ahead any further
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def convert(value, kind, column): # Coerce one field to its column type, raising ValueError with a readable reason
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+
+    try:
+        if kind == "int":
+            return int(value)
+        if kind == "float":
+            return float(value)
+        if kind == "datetime": # Written back zero-padded, the only form the timestamp check triggers (migration 10) accept
+            return datetime.strptime(value, DATETIME_FORMAT).strftime(DATETIME_FORMAT)
+        if kind == "date":
+            return datetime.strptime(value, DATE_FORMAT).strftime(DATE_FORMAT)
+    except (TypeError, ValueError):
+        raise ValueError(f"{column} has invalid {kind} value {value!r}")
+
+    return value
+
+
+def validate_row(spec, row): # Returns the insert tuple for one row, or raises ValueError explaining why it was rejected
+    if "__error__" in row:
+        raise ValueError(row["__error__"])
+
+    values = []
+    for column in spec["columns"]:
+        value = convert(row.get(column), spec["types"].get(column), column)
+        if value is None and column in spec["required"]:
+            raise ValueError(f"missing required column {column}")
+        values.append(value)
+
+    if spec["table"] == "Flights" and values[2] < values[1]: # Fixed format strings compare correctly as text
+        raise ValueError("ArrivalDateTime is before DepartureDateTime")
+
+    return tuple(values)
+
+
+def missing_parents(conn, spec, rows): # Batch-level foreign key check: one IN query per key instead of one lookup per row
+    missing = {}
+    for column, parent, parent_column in spec["foreign_keys"]:
+        index = spec["columns"].index(column)
+        wanted = list({row[index] for row in rows if row[index] is not None})
+        found = set()
+        for start in range(0, len(wanted), MAX_IN_PARAMS):
+            chunk = wanted[start:start + MAX_IN_PARAMS]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(value for (value,) in conn.execute(f"SELECT {parent_column} FROM {parent} WHERE {parent_column} IN ({placeholders})", chunk))
+        missing[index] = (column, parent, set(wanted) - found)
+    return missing
+
+
+class Rejects: # Side file of rejected rows, one JSON object per line. Only created if something is actually rejected
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._handle = None
+
+    def write(self, line_number, reason, row):
+        if self._handle is None:
+            self._handle = open(self.path, "w", encoding="utf-8")
+        self._handle.write(json.dumps({"line": line_number, "reason": reason, "row": row}, default=str) + "\n")
+        self.count += 1
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+
+
+def table_indexes(conn, table): # (name, CREATE statement) for the secondary indexes on a table, skipping the automatic UNIQUE/PK ones
+    return conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)).fetchall()
+
+
+def insert_batch(conn, insert_sql, batch, rejects): # executemany the whole batch, falling back to row by row only if it hits a constraint
+    if not conn.in_transaction: # Releasing an outermost savepoint would commit, so keep it nested in the chunk's transaction
+        conn.execute("BEGIN")
+    conn.execute("SAVEPOINT batch")
+    try:
+        conn.executemany(insert_sql, [values for _, values, _ in batch])
+        conn.execute("RELEASE batch")
+        return len(batch)
+    except sqlite3.IntegrityError:
+        conn.execute("ROLLBACK TO batch")
+        conn.execute("RELEASE batch")
+
+    inserted = 0
+    for line_number, values, row in batch:
+        try:
+            conn.execute(insert_sql, values)
+            inserted += 1
+        except sqlite3.IntegrityError as e:
+            rejects.write(line_number, str(e), row)
+    return inserted
+
+
+def track_inserted_rowids(conn, table): # Record the rowid of every row this connection inserts into table, in temp.imported_rowids
+    # A temp trigger only fires for this connection, so rows other writers add are never counted as part of the load
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS imported_rowids (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.imported_rowids")
+    conn.execute(f"CREATE TEMP TRIGGER IF NOT EXISTS track_imported_rowids AFTER INSERT ON main.{table} BEGIN "
+                 f"INSERT INTO imported_rowids (id) VALUES (NEW.rowid); END")
+
+
+def untrack_inserted_rowids(conn):
+    conn.execute("DROP TRIGGER IF EXISTS temp.track_imported_rowids")
+    conn.execute("DROP TABLE IF EXISTS temp.imported_rowids")
+
+
+def reject_fk_violations(conn, spec, rejects): # Fast-load cleanup: move the loaded rows failing a foreign key check into the rejects file
+    # Only the rows in temp.imported_rowids are checked, so rows that were in the table before the load are never deleted
+    table = spec["table"]
+    bad_rowids = {}
+    for column, parent, parent_column in spec["foreign_keys"]:
+        for (rowid,) in conn.execute(f"SELECT t.rowid FROM temp.imported_rowids i JOIN {table} t ON t.rowid = i.id "
+                                     f"WHERE t.{column} IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {parent} p WHERE p.{parent_column} = t.{column})"):
+            bad_rowids.setdefault(rowid, parent)
+
+    columns = ", ".join(spec["columns"])
+    for rowid, parent in bad_rowids.items():
+        values = conn.execute(f"SELECT {columns} FROM {table} WHERE rowid = ?", (rowid,)).fetchone()
+        rejects.write(None, f"FOREIGN KEY constraint failed ({parent})", dict(zip(spec["columns"], values)))
+        conn.execute(f"DELETE FROM {table} WHERE rowid = ?", (rowid,))
+
+    return len(bad_rowids)
+
+
+def import_file(kind, path, batch_size=5000, transaction_rows=50000, fast=False, rejects_path=None, db_path=None, progress=True):
+    # Stream one file into its table. Returns a summary dict with counts, elapsed seconds and rows/sec
+    spec = TABLES[kind]
+    table = spec["table"]
+    insert_sql = f"INSERT INTO {table} ({', '.join(spec['columns'])}) VALUES ({', '.join('?' * len(spec['columns']))})"
+    rejects = Rejects(rejects_path or path + ".rejects.jsonl")
+
+    read = inserted = 0
+    started = time.perf_counter()
+
+    with connection.writer(db_path) as conn:
+        dropped_indexes = []
+        if fast: # Defer index maintenance and FK checks: one sorted index build and one FK pass at the end beats millions of incremental ones
+            conn.execute("PRAGMA foreign_keys = OFF") # Has no effect inside a transaction, the writer is idle here
+            dropped_indexes = table_indexes(conn, table)
+            for name, _ in dropped_indexes:
+                conn.execute(f"DROP INDEX {name}")
+            track_inserted_rowids(conn, table)
+
+        try:
+            pending_rows = 0
+            for raw_batch in batched(read_rows(path), batch_size):
+                read += len(raw_batch)
+
+                valid = []
+                for line_number, row in raw_batch:
+                    try:
+                        valid.append((line_number, validate_row(spec, row), row))
+                    except ValueError as e:
+                        rejects.write(line_number, str(e), row)
+
+                if not fast and valid:
+                    missing = missing_parents(conn, spec, [values for _, values, _ in valid])
+                    checked = []
+                    for line_number, values, row in valid:
+                        failed = [f"{column} {values[index]!r} not found in {parent}" for index, (column, parent, absent) in missing.items() if values[index] in absent]
+                        if failed:
+                            rejects.write(line_number, "; ".join(failed), row)
+                        else:
+                            checked.append((line_number, values, row))
+                    valid = checked
+
+                if valid:
+                    inserted += insert_batch(conn, insert_sql, valid, rejects)
+                    pending_rows += len(valid)
+
+                if pending_rows >= transaction_rows: # Chunked transactions bound the WAL size and the work lost on a crash
+                    conn.commit()
+                    pending_rows = 0
+                    if progress:
+                        elapsed = time.perf_counter() - started
+                        print(f"  {read} rows read, {inserted} inserted ({inserted / elapsed:,.0f} rows/sec)")
+
+            conn.commit()
+
+            if fast:
+                for _, sql in dropped_indexes:
+                    conn.execute(sql)
+                inserted -= reject_fk_violations(conn, spec, rejects)
+                conn.commit()
+
+        finally:
+            if fast:
+                if conn.in_transaction:
+                    conn.rollback()
+                untrack_inserted_rowids(conn)
+                existing = {name for name, _ in table_indexes(conn, table)}
+                for name, sql in dropped_indexes: # Never leave the table without its indexes, even if the load failed
+                    if name not in existing:
+                        conn.execute(sql)
+                conn.commit()
+                conn.execute("PRAGMA foreign_keys = ON")
+            rejects.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "table": table,
+        "read": read,
+        "inserted": inserted,
+        "rejected": rejects.count,
+        "rejects_file": rejects.path if rejects.count else None,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(inserted / elapsed, 1) if elapsed else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import flights, passengers, bookings, baggage or status events from CSV/JSONL")
+    parser.add_argument("kind", choices=sorted(TABLES))
+    parser.add_argument("file")
+    parser.add_argument("--db", default=None, help="database file (defaults to airline.db)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--transaction-rows", type=int, default=50000)
+    parser.add_argument("--fast", action="store_true", help="drop indexes and skip FK checks during the load, rebuild and check at the end")
+    parser.add_argument("--rejects", default=None, help="rejected rows file (defaults to <file>.rejects.jsonl)")
+    args = parser.parse_args()
+
+    if args.db:
+        connection.db_file = args.db
+    migrations.bootstrap()
+
+    summary = import_file(args.kind, args.file, args.batch_size, args.transaction_rows, args.fast, args.rejects)
+    print(f"{summary['inserted']} of {summary['read']} rows imported into {summary['table']} in {summary['seconds']}s ({summary['rows_per_sec']} rows/sec)")
+    if summary["rejected"]:
+        print(f"{summary['rejected']} rows rejected, see {summary['rejects_file']}")
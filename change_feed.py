@@ -0,0 +1,141 @@
+import argparse
+import time
+
+import connection
+import migrations
+
+# Consumer side of the change data capture log (migration 6). Every change to Flights, Bookings and Destinations is a
+# ChangeLog row with a monotonic Seq. A consumer keeps its position in ChangeConsumers and pulls the changes after it
+# in Seq order, a batch at a time, so catching up costs O(changes) instead of re-reading whole tables.
+#
+# Positions only move when a batch is acknowledged, so a consumer that crashes mid-batch sees that batch again
+# (at-least-once delivery). truncate() drops changes older than the retention period; a consumer whose position has
+# fallen behind the truncated range gets CursorExpiredError and has to resync from the tables.
+
+CHANGE_COLUMNS = ("Seq", "TableName", "RowKey", "Operation", "ChangedColumns", "ChangedAt")
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_RETENTION_DAYS = 7
+
+CHANGES_SQL = f"SELECT {', '.join(CHANGE_COLUMNS)} FROM ChangeLog WHERE Seq > ?"
+
+
+class CursorExpiredError(LookupError): # The changes after a consumer's position have already been truncated
+
+    def __init__(self, consumer, position, truncated_through):
+        self.consumer, self.position, self.truncated_through = consumer, position, truncated_through
+        super().__init__(f"Consumer {consumer} is at change {position} but changes up to {truncated_through} have been truncated")
+
+
+def head(conn): # Seq of the newest change ever written, 0 before the first one
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog'").fetchone()
+    return row[0] if row else 0
+
+
+def truncated_through(conn):
+    return conn.execute("SELECT TruncatedThrough FROM ChangeLogState WHERE Id = 1").fetchone()[0]
+
+
+def register(consumer, from_start=False, path=None): # Create a consumer at the current head (or the oldest retained change). Returns its position
+    with connection.writer(path) as conn:
+        position = truncated_through(conn) if from_start else head(conn)
+        conn.execute("INSERT INTO ChangeConsumers (Consumer, LastSeq, UpdatedAt) VALUES (?, ?, ?) ON CONFLICT (Consumer) DO NOTHING",
+                     (consumer, position, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())))
+        return conn.execute("SELECT LastSeq FROM ChangeConsumers WHERE Consumer = ?", (consumer,)).fetchone()[0]
+
+
+def position(conn, consumer): # A consumer's acknowledged Seq; unknown consumers start from the oldest retained change
+    row = conn.execute("SELECT LastSeq FROM ChangeConsumers WHERE Consumer = ?", (consumer,)).fetchone()
+    return row[0] if row else truncated_through(conn)
+
+
+def changes_since(seq, limit=DEFAULT_BATCH_SIZE, tables=None, path=None): # Up to limit changes after seq, oldest first
+    sql, params = CHANGES_SQL, [seq]
+    if tables:
+        sql += f" AND TableName IN ({','.join('?' * len(tables))})"
+        params += list(tables)
+    sql += " ORDER BY Seq LIMIT ?"
+    params.append(int(limit))
+
+    with connection.reader(path) as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def pull(consumer, limit=DEFAULT_BATCH_SIZE, tables=None, path=None): # Next batch after the consumer's position. Nothing moves until acknowledge()
+    with connection.reader(path) as conn:
+        conn.execute("BEGIN")
+        seq = position(conn, consumer)
+        horizon = truncated_through(conn)
+    if seq < horizon:
+        raise CursorExpiredError(consumer, seq, horizon)
+    return changes_since(seq, limit, tables, path)
+
+
+def acknowledge(consumer, seq, path=None): # Move the consumer's position up to seq, never backwards
+    with connection.writer(path) as conn:
+        conn.execute("INSERT INTO ChangeConsumers (Consumer, LastSeq, UpdatedAt) VALUES (?, ?, ?) "
+                     "ON CONFLICT (Consumer) DO UPDATE SET LastSeq = max(LastSeq, excluded.LastSeq), UpdatedAt = excluded.UpdatedAt",
+                     (consumer, seq, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())))
+
+
+def consume(consumer, handler, batch_size=DEFAULT_BATCH_SIZE, tables=None, follow=False, poll_interval=1.0, path=None):
+    # Call handler(batch) for every batch after the consumer's position, acknowledging each once handler returns.
+    # Stops when caught up unless follow is set, then polls. Returns how many changes were handled
+    handled = 0
+    while True:
+        batch = pull(consumer, batch_size, tables, path)
+        if batch:
+            handler(batch)
+            acknowledge(consumer, batch[-1][0], path)
+            handled += len(batch)
+        if len(batch) < batch_size:
+            if not follow:
+                return handled
+            time.sleep(poll_interval)
+
+
+def truncate(retention_days=DEFAULT_RETENTION_DAYS, path=None): # Drop changes older than the retention period. Returns how many were removed
+    cutoff = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - retention_days * 86400))
+
+    with connection.writer(path) as conn:
+        # Seq and ChangedAt grow together, so the first retained change is found by walking from the oldest, no index needed
+        first_kept = conn.execute("SELECT Seq FROM ChangeLog WHERE ChangedAt >= ? ORDER BY Seq LIMIT 1", (cutoff,)).fetchone()
+        through = (first_kept[0] - 1) if first_kept else head(conn)
+        removed = conn.execute("DELETE FROM ChangeLog WHERE Seq <= ?", (through,)).rowcount
+        conn.execute("UPDATE ChangeLogState SET TruncatedThrough = max(TruncatedThrough, ?) WHERE Id = 1", (through,))
+        return removed
+
+
+def consumers(path=None): # (Consumer, LastSeq, UpdatedAt, changes behind) for every registered consumer
+    with connection.reader(path) as conn:
+        latest = head(conn)
+        return [row + (latest - row[1],) for row in conn.execute("SELECT Consumer, LastSeq, UpdatedAt FROM ChangeConsumers ORDER BY Consumer")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Change data capture feed for Flights, Bookings and Destinations")
+    parser.add_argument("command", choices=["tail", "consumers", "truncate"])
+    parser.add_argument("--db", default=None, help="database file (defaults to airline.db)")
+    parser.add_argument("--consumer", default="cli", help="tail: consumer name whose position is used and advanced")
+    parser.add_argument("--table", action="append", choices=sorted(migrations.CHANGE_CAPTURE_TABLES), help="tail: only these tables")
+    parser.add_argument("--follow", action="store_true", help="tail: keep polling for new changes")
+    parser.add_argument("--retention-days", type=float, default=DEFAULT_RETENTION_DAYS, help="truncate: changes to keep")
+    args = parser.parse_args()
+
+    if args.db:
+        connection.db_file = args.db
+    migrations.bootstrap()
+
+    if args.command == "tail":
+        def show(batch):
+            for seq, table, key, operation, columns, changed_at in batch:
+                print(f"{seq:>10} | {changed_at} | {operation:<6} | {table}[{key}] {columns or ''}")
+        count = consume(args.consumer, show, tables=args.table, follow=args.follow)
+        print(f"{count} changes")
+
+    elif args.command == "consumers":
+        print("Consumer | Position | Updated | Behind")
+        for consumer, seq, updated_at, behind in consumers():
+            print(f"{consumer} | {seq} | {updated_at} | {behind}")
+
+    elif args.command == "truncate":
+        print(f"{truncate(args.retention_days)} changes removed")
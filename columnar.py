@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import time
+
+import connection
+import migrations
+
+try:
+    import numpy as np
+except ImportError: # Optional: only the analytics export needs it
+    np = None
+
+# Columnar snapshot of the tables the analytics need. Each column is streamed out of SQLite in chunks into a typed
+# NumPy array and saved as its own .npy file, which load() memory-maps, so analytics never touch SQLite or build
+# Python tuples per row.
+#
+#   - timestamps and dates become int64 epoch seconds, read from their epoch columns (migration 10), NULL -> NULL_EPOCH
+#   - IDs become int32, NULL -> NULL_ID
+#   - categorical text (Status, Class, BookingStatus, City, ...) is dictionary encoded: an int16 code per row plus the
+#     list of values in manifest.json
+#   - flights.FlightNumber is a fixed-width text array; every other table refers to a flight by its row number in it
+#     (FlightIndex), so joins are plain array indexing
+#
+# Everything is read inside one transaction, so the snapshot is consistent even while the application is writing.
+
+DEFAULT_DIRECTORY = "snapshot"
+CHUNK = 50000
+NULL_ID = -1
+NULL_EPOCH = np.iinfo(np.int64).min if np is not None else -(2 ** 63)
+NULL_CODE = -1
+
+
+# table -> (source SQL, [(column name, kind)]). kind is epoch, id, int, code (dictionary encoded text), key (plain text)
+# or flight (FlightNumber as a flights row number). Flights is exported first, its row order defines FlightIndex.
+# status_log reads the FlightStatusLog view, so archived partitions are not included
+TABLES = {
+    "flights": (
+        "SELECT FlightNumber, DepartureEpoch, ArrivalEpoch, Status, DestinationID, PilotID, AircraftID FROM Flights ORDER BY FlightNumber",
+        [("FlightNumber", "key"), ("Departure", "epoch"), ("Arrival", "epoch"), ("Status", "code"),
+         ("DestinationID", "id"), ("PilotID", "id"), ("AircraftID", "id")],
+    ),
+    "bookings": (
+        "SELECT BookingID, FlightNumber, PassengerID, BookingEpoch, Class, BookingStatus FROM Bookings",
+        [("BookingID", "id"), ("FlightIndex", "flight"), ("PassengerID", "id"), ("BookingDate", "epoch"),
+         ("Class", "code"), ("BookingStatus", "code")],
+    ),
+    "aircrafts": (
+        "SELECT AircraftID, Capacity, Model FROM Aircrafts",
+        [("AircraftID", "id"), ("Capacity", "int"), ("Model", "code")],
+    ),
+    "destinations": (
+        "SELECT DestinationID, City, Country FROM Destinations",
+        [("DestinationID", "id"), ("City", "code"), ("Country", "code")],
+    ),
+    "status_log": (
+        "SELECT FlightNumber, Status, TimestampEpoch FROM FlightStatusLog",
+        [("FlightIndex", "flight"), ("Status", "code"), ("Timestamp", "epoch")],
+    ),
+}
+
+# Columns that share one dictionary, so codes compare directly across tables
+SHARED_DICTIONARIES = {("flights", "Status"): "Status", ("status_log", "Status"): "Status"}
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("The columnar snapshot needs numpy: pip install numpy")
+
+
+def dtype_for(kind):
+    return {"epoch": np.int64, "id": np.int32, "int": np.int32, "code": np.int16, "flight": np.int32, "key": np.str_}[kind]
+
+
+class Encoder: # Value -> code dictionary, grown as new values are seen
+
+    def __init__(self, max_codes=np.iinfo(np.int16).max if np is not None else 32767):
+        self.codes = {}
+        self.values = []
+        self.max_codes = max_codes
+
+    def encode(self, value):
+        if value is None:
+            return NULL_CODE
+        code = self.codes.get(value)
+        if code is None:
+            if len(self.values) >= self.max_codes:
+                raise ValueError(f"More than {self.max_codes} distinct values, too many to dictionary encode")
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def convert_chunk(rows, position, kind, encoder, flight_index): # One column of a fetched chunk as a typed array
+    values = [row[position] for row in rows]
+    if kind == "key":
+        return values # Collected as a list, the array is built once its width is known
+    if kind == "code":
+        values = [encoder.encode(value) for value in values]
+    elif kind == "flight":
+        values = [flight_index.get(value, NULL_ID) for value in values]
+    elif kind == "epoch":
+        values = [NULL_EPOCH if value is None else value for value in values]
+    else:
+        values = [NULL_ID if value is None else value for value in values]
+    return np.fromiter(values, dtype=dtype_for(kind), count=len(values))
+
+
+def export(directory=DEFAULT_DIRECTORY, path=None, progress=True): # Write every table's columns plus manifest.json. Returns the manifest
+    require_numpy()
+    os.makedirs(directory, exist_ok=True)
+    manifest = {"created": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()), "schema_version": None, "null_id": NULL_ID,
+                "null_epoch": int(NULL_EPOCH), "null_code": NULL_CODE, "tables": {}}
+    encoders = {}
+    flight_index = {}
+
+    with connection.reader(path) as conn:
+        conn.execute("BEGIN") # One snapshot for every table
+        manifest["schema_version"] = migrations.current_version(conn)
+
+        for table, (sql, columns) in TABLES.items():
+            started = time.perf_counter()
+            count = conn.execute(f"SELECT COUNT(*) FROM ({sql})").fetchone()[0]
+            arrays = [[] if kind == "key" else np.empty(count, dtype=dtype_for(kind)) for _, kind in columns]
+            table_encoders = [encoders.setdefault(SHARED_DICTIONARIES.get((table, name), (table, name)), Encoder()) if kind == "code" else None
+                              for name, kind in columns]
+
+            filled = 0
+            cursor = conn.execute(sql)
+            while filled < count:
+                rows = cursor.fetchmany(CHUNK)
+                if not rows:
+                    break
+                for position, ((_, kind), array, encoder) in enumerate(zip(columns, arrays, table_encoders)):
+                    if kind == "key":
+                        array += convert_chunk(rows, position, kind, encoder, flight_index)
+                    else:
+                        array[filled:filled + len(rows)] = convert_chunk(rows, position, kind, encoder, flight_index)
+                filled += len(rows)
+            cursor.close()
+
+            if table == "flights": # Later tables refer to flights by row number
+                flight_index = {value: index for index, value in enumerate(arrays[0])}
+            arrays = [np.array(array, dtype=np.str_) if kind == "key" else array[:filled] for (_, kind), array in zip(columns, arrays)]
+
+            entry = manifest["tables"][table] = {"rows": filled, "columns": {}}
+            for (name, kind), array, encoder in zip(columns, arrays, table_encoders):
+                np.save(os.path.join(directory, f"{table}.{name}.npy"), array)
+                entry["columns"][name] = {"kind": kind, "dtype": str(array.dtype)}
+                if encoder is not None:
+                    entry["columns"][name]["dictionary"] = encoder.values # Shared dictionaries are the same list, complete by the time the manifest is written
+            if progress:
+                print(f"  {table:<13} {filled:>12,} rows in {time.perf_counter() - started:.1f}s")
+
+    with open(os.path.join(directory, "manifest.json"), "w") as handle:
+        json.dump(manifest, handle, indent=2)
+    return manifest
+
+
+class Snapshot: # Loaded snapshot: snapshot["flights"]["Departure"] is a (memory-mapped) array
+
+    def __init__(self, directory, manifest, tables):
+        self.directory = directory
+        self.manifest = manifest
+        self.tables = tables
+
+    def __getitem__(self, table):
+        return self.tables[table]
+
+    def rows(self, table):
+        return self.manifest["tables"][table]["rows"]
+
+    def dictionary(self, table, column): # Code -> value list for a dictionary encoded column
+        return self.manifest["tables"][table]["columns"][column]["dictionary"]
+
+    def code(self, table, column, value): # Code for a value, NULL_CODE if it never occurs (so comparisons simply match nothing)
+        values = self.dictionary(table, column)
+        return values.index(value) if value in values else NULL_CODE
+
+    def decode(self, table, column, codes):
+        values = self.dictionary(table, column)
+        return [values[code] if code != NULL_CODE else None for code in codes]
+
+
+def load(directory=DEFAULT_DIRECTORY, mmap=True): # Open a snapshot; with mmap the arrays are paged in on demand rather than read up front
+    require_numpy()
+    with open(os.path.join(directory, "manifest.json")) as handle:
+        manifest = json.load(handle)
+
+    tables = {}
+    for table, entry in manifest["tables"].items():
+        tables[table] = {name: np.load(os.path.join(directory, f"{table}.{name}.npy"), mmap_mode="r" if mmap else None)
+                         for name in entry["columns"]}
+    return Snapshot(directory, manifest, tables)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export Flights, Bookings, Aircrafts and FlightStatusLog as NumPy column files")
+    parser.add_argument("--db", default=None, help="database file (defaults to airline.db)")
+    parser.add_argument("--out", default=DEFAULT_DIRECTORY, help="directory for the .npy files and manifest.json")
+    args = parser.parse_args()
+
+    if args.db:
+        connection.db_file = args.db
+
+    started = time.perf_counter()
+    export(args.out)
+    print(f"Snapshot written to {args.out} in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,158 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import instrumentation
+
+db_file = 'airline.db'
+
+# Applied once to every connection when it is opened, rather than paying for it on every operation
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",         # Readers no longer block the writer (and vice versa)
+    "PRAGMA synchronous = NORMAL",       # Safe with WAL, only the checkpoint needs a full fsync
+    "PRAGMA cache_size = -65536",        # Negative value is in KiB, so a 64MB page cache per connection
+    "PRAGMA mmap_size = 268435456",      # Map the first 256MB of the file instead of read() calls
+    "PRAGMA temp_store = MEMORY",        # Sorts and temp b-trees (GROUP BY / ORDER BY) stay in RAM
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",        # Wait for a lock instead of failing with "database is locked"
+)
+
+DEFAULT_READERS = 4
+STATEMENT_CACHE_SIZE = 512 # Prepared statements kept per connection, above the flight search shapes query_builder can produce
+
+
+class ConnectionManager: # Owns the long-lived connections for one database file: a single writer and a bounded pool of readers
+
+    def __init__(self, path=db_file, readers=DEFAULT_READERS):
+        self.path = path
+        self.max_readers = max(1, readers)
+        self._writer = None
+        self._write_lock = threading.RLock() # Re-entrant so a write operation can call another write helper
+        self._readers = queue.LifoQueue() # LIFO keeps the most recently used (warmest) connection in play
+        self._reader_count = 0
+        self._pool_lock = threading.Lock()
+        self._closed = False
+        self.replica = None # replica.ReplicaManager serving this file's reads from memory, see replica.enable
+        self.commit_listeners = [] # Called with no arguments after every commit made through writer()
+
+    def open_connection(self, read_only=False): # Open and tune a connection. check_same_thread is off as the manager hands connections between threads
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE,
+                               factory=instrumentation.connection_factory())
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def writer(self): # Borrow the single writer connection. Commits on success, rolls back if the block raises
+        with self._write_lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection manager has been closed")
+            if self._writer is None:
+                self._writer = self.open_connection()
+
+            conn = self._writer
+            try:
+                yield conn
+                if conn.in_transaction:
+                    conn.commit()
+                    for listener in self.commit_listeners:
+                        listener()
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+
+    @contextmanager
+    def reader(self): # Borrow a read-only connection from the pool, opening a new one only while under the limit
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction: # Never hand back a connection still holding a read snapshot
+                conn.rollback()
+            self._readers.put(conn)
+
+    def _acquire_reader(self):
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection manager has been closed")
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._pool_lock:
+            if self._reader_count < self.max_readers:
+                self._reader_count += 1
+                try:
+                    return self.open_connection(read_only=True)
+                except sqlite3.Error:
+                    self._reader_count -= 1
+                    raise
+
+        return self._readers.get() # Pool is at its limit, wait for a connection to be returned
+
+    def close(self): # Close every connection owned by the manager
+        self._closed = True
+        if self.replica is not None:
+            self.replica.close()
+            self.replica = None
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+        with self._pool_lock:
+            while True:
+                try:
+                    self._readers.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._reader_count = 0
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_manager(path=None, readers=None): # One shared manager per database file, created on first use. readers can only raise the pool limit
+    path = path or db_file
+    with _managers_lock:
+        manager = _managers.get(path)
+        if manager is None:
+            manager = ConnectionManager(path, readers or DEFAULT_READERS)
+            _managers[path] = manager
+        elif readers:
+            with manager._pool_lock:
+                manager.max_readers = max(manager.max_readers, readers)
+        return manager
+
+
+def writer(path=None): # Shortcut for get_manager().writer()
+    return get_manager(path).writer()
+
+
+def reader(path=None): # Shortcut for get_manager().reader(), served by the in-memory replica when one is enabled
+    manager = get_manager(path)
+    if manager.replica is None:
+        return manager.reader()
+    return manager.replica.reader(0 if getattr(_local, "fresh", 0) else None)
+
+
+@contextmanager
+def fresh_reads(): # Reads in this block see every committed write, even with a replica. For cache fills and read-after-write
+    _local.fresh = getattr(_local, "fresh", 0) + 1
+    try:
+        yield
+    finally:
+        _local.fresh -= 1
+
+
+def close_all(): # Close every shared manager, called when the program exits
+    with _managers_lock:
+        for manager in _managers.values():
+            manager.close()
+        _managers.clear()
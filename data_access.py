@@ -0,0 +1,371 @@
+import bulk_import
+import connection
+import duty_conflicts
+import flight_search
+import instrumentation
+import parallel_stats
+import passenger_search
+import query_builder
+import reference_cache
+import rostering
+
+# Programmatic data-access layer. Every menu operation is a plain function here, with no input() or print(), plus a
+# batch variant that takes many items and runs them in one transaction. The batch variants reuse one fixed SQL text
+# per operation, so sqlite3's statement cache prepares it once and executemany only rebinds parameters.
+#
+# Lookups return rows as tuples in table column order. Missing rows raise NotFoundError, bad input ValueError and
+# double-booked pilots DutyConflictError; a batch is all or nothing, any failing item rolls the whole transaction back.
+
+FLIGHT_COLUMNS = ("FlightNumber", "DepartureDateTime", "ArrivalDateTime", "Status", "DestinationID", "PilotID", "AircraftID")
+DESTINATION_COLUMNS = ("DestinationID", "City", "Country", "AirportCode")
+PILOT_COLUMNS = ("PilotID", "FirstName", "LastName")
+SCHEDULE_COLUMNS = ("FlightNumber", "DepartureDateTime", "ArrivalDateTime", "Status", "DestinationCity")
+
+
+class NotFoundError(LookupError): # A flight, pilot or destination that the operation needs does not exist
+    pass
+
+
+DutyConflictError = duty_conflicts.DutyConflictError # Re-exported so callers only need this module
+
+
+# Queries shared with the index advisor (advisor.py) and benchmark, so they always measure the SQL the application runs
+# Destination cities are filled in from reference_cache rather than a correlated subquery per flight row
+PILOT_SCHEDULE_SQL = """
+    SELECT FlightNumber, DepartureDateTime, ArrivalDateTime, Status, DestinationID
+    FROM Flights
+    WHERE PilotID = ?
+"""
+
+FLIGHTS_PER_DESTINATION_SQL = """
+    SELECT
+        d.City,
+        COUNT(f.FlightNumber) AS NumberOfFlights
+    FROM
+        Destinations d
+    JOIN
+        Flights f ON d.DestinationID = f.DestinationID
+    GROUP BY
+        d.City
+    ORDER BY
+        NumberOfFlights DESC;
+"""
+
+FLIGHTS_PER_PILOT_SQL = """
+    SELECT
+        p.FirstName,
+        p.LastName,
+        COUNT(f.FlightNumber) AS NumberOfFlights
+    FROM
+        Pilots p
+    LEFT JOIN
+        Flights f ON p.PilotID = f.PilotID
+    GROUP BY
+        p.PilotID, p.FirstName, p.LastName
+    ORDER BY
+        NumberOfFlights DESC;
+"""
+
+AIRCRAFT_USAGE_SQL = """
+    SELECT
+        a.Model,
+        a.Manufacturer,
+        COUNT(f.AircraftID) AS UsageCount
+    FROM
+        Aircrafts a
+    LEFT JOIN
+        Flights f ON a.AircraftID = f.AircraftID
+    GROUP BY
+        a.AircraftID, a.Model, a.Manufacturer
+    ORDER BY
+        UsageCount DESC;
+"""
+
+# Same reports read from the summary tables the Flights triggers keep up to date (migration 3), O(destinations + pilots + aircraft)
+SUMMARY_FLIGHTS_PER_DESTINATION_SQL = """
+    SELECT
+        d.City,
+        SUM(c.FlightCount) AS NumberOfFlights
+    FROM
+        DestinationFlightCounts c
+    JOIN
+        Destinations d ON d.DestinationID = c.DestinationID
+    WHERE
+        c.FlightCount > 0
+    GROUP BY
+        d.City
+    ORDER BY
+        NumberOfFlights DESC;
+"""
+
+SUMMARY_FLIGHTS_PER_PILOT_SQL = """
+    SELECT
+        p.FirstName,
+        p.LastName,
+        COALESCE(c.FlightCount, 0) AS NumberOfFlights
+    FROM
+        Pilots p
+    LEFT JOIN
+        PilotFlightCounts c ON c.PilotID = p.PilotID
+    ORDER BY
+        NumberOfFlights DESC;
+"""
+
+SUMMARY_AIRCRAFT_USAGE_SQL = """
+    SELECT
+        a.Model,
+        a.Manufacturer,
+        COALESCE(c.UsageCount, 0) AS UsageCount
+    FROM
+        Aircrafts a
+    LEFT JOIN
+        AircraftUsageCounts c ON c.AircraftID = a.AircraftID
+    ORDER BY
+        UsageCount DESC;
+"""
+
+
+INSERT_FLIGHT_SQL = """
+    INSERT INTO Flights (FlightNumber, DepartureDateTime, ArrivalDateTime, Status, DestinationID, PilotID, AircraftID)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Partial updates use one statement shape for every combination of fields: a NULL parameter keeps the current value
+UPDATE_FLIGHT_SQL = query_builder.partial_update("Flights", ("DepartureDateTime", "ArrivalDateTime", "Status"), "FlightNumber")
+UPDATE_DESTINATION_SQL = query_builder.partial_update("Destinations", ("City", "Country", "AirportCode"), "DestinationID")
+
+ASSIGN_PILOT_SQL = "UPDATE Flights SET PilotID = ? WHERE FlightNumber = ?"
+FLIGHT_BY_NUMBER_SQL = f"SELECT {', '.join(FLIGHT_COLUMNS)} FROM Flights WHERE FlightNumber = ?"
+PILOT_BY_ID_SQL = reference_cache.LOADERS["pilot"]
+LIST_PILOTS_SQL = reference_cache.ALL_PILOTS_SQL
+DESTINATION_BY_ID_SQL = reference_cache.LOADERS["destination"]
+
+
+def blank_to_none(value): # Form and file input use "" for "not given", the SQL uses NULL
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def fetch_one(conn, sql, key, what): # Fetch a single row or raise NotFoundError
+    row = conn.execute(sql, (key,)).fetchone()
+    if row is None:
+        raise NotFoundError(f"{what} {key} not found")
+    return row
+
+
+def cached(kind, key, path): # Reference row from reference_cache or raise NotFoundError
+    row = reference_cache.get_cache(path).lookup(kind, key)
+    if row is None:
+        raise NotFoundError(f"{kind.capitalize()} {key} not found")
+    return row
+
+
+def timestamp(value, column): # Canonical 'YYYY-MM-DD HH:MM:SS' text or None, ValueError for anything the database would reject
+    return bulk_import.convert(blank_to_none(value), "datetime", column)
+
+
+def flight_values(flight): # Insert tuple from a dict keyed by column name (or a tuple already in column order)
+    if isinstance(flight, dict):
+        flight = [flight.get(column) for column in FLIGHT_COLUMNS]
+    values = tuple(blank_to_none(value) for value in flight)
+    if len(values) != len(FLIGHT_COLUMNS):
+        raise ValueError(f"A flight needs {len(FLIGHT_COLUMNS)} values: {', '.join(FLIGHT_COLUMNS)}")
+    if not values[0]:
+        raise ValueError("FlightNumber is required")
+    return (values[0], timestamp(values[1], FLIGHT_COLUMNS[1]), timestamp(values[2], FLIGHT_COLUMNS[2])) + values[3:]
+
+
+# Flights
+
+@instrumentation.operation
+def get_flight(flight_number, path=None):
+    with connection.reader(path) as conn:
+        return fetch_one(conn, FLIGHT_BY_NUMBER_SQL, flight_number, "Flight")
+
+
+@instrumentation.operation
+def create_flight(flight, path=None): # flight is a dict keyed by column name, blank IDs are stored as NULL so foreign keys stay valid
+    create_flights([flight], path)
+
+
+@instrumentation.operation
+def create_flights(flights, path=None): # Insert many flights in one transaction. Returns how many were inserted
+    rows = [flight_values(flight) for flight in flights]
+    with connection.writer(path) as conn:
+        conn.executemany(INSERT_FLIGHT_SQL, rows)
+    return len(rows)
+
+
+@instrumentation.operation
+def search_flights(destinations=None, statuses=None, departure_from=None, departure_to=None, after=None, page_size=flight_search.DEFAULT_PAGE_SIZE, path=None):
+    # One keyset page of matching flights and the cursor for the next one, see flight_search
+    return flight_search.search_page(destinations, statuses, departure_from, departure_to, after, page_size, path)
+
+
+@instrumentation.operation
+def iter_flights(destinations=None, statuses=None, departure_from=None, departure_to=None, path=None):
+    # Every matching flight, streamed
+    return flight_search.iter_flights(destinations, statuses, departure_from, departure_to, path=path)
+
+
+@instrumentation.operation
+def update_flight(flight_number, departure=None, arrival=None, status=None, path=None): # Fields left as None/blank keep their current value
+    update_flights([(flight_number, departure, arrival, status)], path)
+
+
+@instrumentation.operation
+def update_flights(updates, path=None): # updates is an iterable of (flight_number, departure, arrival, status)
+    with connection.writer(path) as conn:
+        cursor = conn.cursor()
+        count = 0
+        for flight_number, departure, arrival, status in updates:
+            cursor.execute(UPDATE_FLIGHT_SQL, (timestamp(departure, "DepartureDateTime"), timestamp(arrival, "ArrivalDateTime"), blank_to_none(status), flight_number))
+            if cursor.rowcount == 0:
+                raise NotFoundError(f"Flight {flight_number} not found")
+            count += 1
+        return count
+
+
+# Pilots
+
+@instrumentation.operation
+def list_pilots(path=None):
+    return list(reference_cache.all_pilots(path))
+
+
+@instrumentation.operation
+def get_pilot(pilot_id, path=None):
+    return cached("pilot", pilot_id, path)
+
+
+@instrumentation.operation
+def assign_pilot(flight_number, pilot_id, min_rest_minutes=duty_conflicts.DEFAULT_MIN_REST_MINUTES, path=None):
+    assign_pilots([(flight_number, pilot_id)], min_rest_minutes, path)
+
+
+@instrumentation.operation
+def assign_pilots(assignments, min_rest_minutes=duty_conflicts.DEFAULT_MIN_REST_MINUTES, path=None):
+    # assignments is an iterable of (flight_number, pilot_id). Every assignment is checked against the pilot's other
+    # flights (and the rest of the batch) first; any duty conflict raises DutyConflictError and nothing is written.
+    # min_rest_minutes=None skips the conflict check
+    with connection.writer(path) as conn:
+        checked = []
+        for flight_number, pilot_id in assignments:
+            pilot = cached("pilot", pilot_id, path) # Check if the Pilot ID exists
+            checked.append((fetch_one(conn, FLIGHT_BY_NUMBER_SQL, flight_number, "Flight"), pilot[0]))
+
+        if min_rest_minutes is not None:
+            conflicts = duty_conflicts.check_assignments(conn, checked, min_rest_minutes)
+            if conflicts:
+                raise DutyConflictError(conflicts)
+
+        conn.executemany(ASSIGN_PILOT_SQL, [(pilot_id, flight[0]) for flight, pilot_id in checked])
+        return len(checked)
+
+
+@instrumentation.operation
+def roster_pilots(departure_from=None, departure_to=None, min_rest_minutes=duty_conflicts.DEFAULT_MIN_REST_MINUTES, rebalance=False, dry_run=False, path=None):
+    # Assign pilots to every unassigned or double-booked flight departing in the window in one transaction, see rostering.
+    # Returns the report, including the flights left without a pilot
+    return rostering.roster(departure_from, departure_to, min_rest_minutes, rebalance, dry_run, path)
+
+
+@instrumentation.operation
+def pilot_schedule(pilot_id, path=None): # Returns (pilot row, list of schedule rows)
+    return pilot_schedules([pilot_id], path)[pilot_id]
+
+
+@instrumentation.operation
+def pilot_schedules(pilot_ids, path=None): # {pilot_id: (pilot row, schedule rows)}, all flights read from one snapshot
+    schedules = {}
+    with connection.reader(path) as conn:
+        conn.execute("BEGIN")
+        for pilot_id in pilot_ids:
+            pilot = cached("pilot", pilot_id, path)
+            flights = conn.execute(PILOT_SCHEDULE_SQL, (pilot_id,)).fetchall()
+            schedules[pilot_id] = (pilot, [flight[:4] + (destination_city(flight[4], path),) for flight in flights])
+    return schedules
+
+
+def destination_city(destination_id, path=None): # City name from the cache, None for unassigned or unknown destinations
+    if destination_id is None:
+        return None
+    destination = reference_cache.destination(destination_id, path)
+    return destination[1] if destination else None
+
+
+# Destinations
+
+@instrumentation.operation
+def get_destination(destination_id, path=None):
+    return cached("destination", destination_id, path)
+
+
+@instrumentation.operation
+def update_destination(destination_id, city=None, country=None, airport_code=None, path=None): # Fields left as None/blank keep their current value
+    update_destinations([(destination_id, city, country, airport_code)], path)
+
+
+@instrumentation.operation
+def update_destinations(updates, path=None): # updates is an iterable of (destination_id, city, country, airport_code)
+    changed = []
+    with connection.writer(path) as conn:
+        cursor = conn.cursor()
+        for destination_id, city, country, airport_code in updates:
+            cursor.execute(UPDATE_DESTINATION_SQL, (blank_to_none(city), blank_to_none(country), blank_to_none(airport_code), destination_id))
+            if cursor.rowcount == 0:
+                raise NotFoundError(f"Destination {destination_id} not found")
+            changed.append(destination_id)
+
+    for destination_id in changed: # Write-through: the cached rows are dropped as soon as the new values are committed
+        reference_cache.invalidate("destination", destination_id, path)
+    return len(changed)
+
+
+# Baggage. baggage is imported on first use: it sits on the ingest side (group_commit) and this module should not load
+# it, or anything it grows to import, just to be imported itself
+
+@instrumentation.operation
+def bags_for_flight(flight_number, path=None): # Rows follow baggage.BAG_COLUMNS
+    import baggage
+    return baggage.bags_for_flight(flight_number, path)
+
+
+@instrumentation.operation
+def flight_baggage_totals(flight_number, path=None): # (bag count, total weight) from the maintained totals
+    import baggage
+    return baggage.flight_totals(flight_number, path)
+
+
+# Passengers
+
+@instrumentation.operation
+def search_passengers(text, limit=passenger_search.DEFAULT_LIMIT, bookings_per_passenger=passenger_search.DEFAULT_BOOKINGS_PER_PASSENGER, path=None):
+    # [(passenger row, [recent booking rows])] best match first, see passenger_search
+    return passenger_search.search(text, limit, bookings_per_passenger, path)
+
+
+# Aircraft
+
+@instrumentation.operation
+def get_aircraft(aircraft_id, path=None):
+    return cached("aircraft", aircraft_id, path)
+
+
+# Stats
+
+@instrumentation.operation
+def stats(live=False, path=None, parallel=False): # The three Stats Mode reports. live=True aggregates Flights instead of reading the summary tables
+    if parallel: # Live aggregates cut into pieces across parallel_stats' process pool
+        return parallel_stats.get_engine(path).run(parallel_stats.STATS_MODE_REPORTS)
+    if live:
+        queries = (FLIGHTS_PER_DESTINATION_SQL, FLIGHTS_PER_PILOT_SQL, AIRCRAFT_USAGE_SQL)
+    else:
+        queries = (SUMMARY_FLIGHTS_PER_DESTINATION_SQL, SUMMARY_FLIGHTS_PER_PILOT_SQL, SUMMARY_AIRCRAFT_USAGE_SQL)
+
+    with connection.reader(path) as conn:
+        conn.execute("BEGIN") # All three reports from the same snapshot
+        destinations, pilots, aircraft = (conn.execute(sql).fetchall() for sql in queries)
+    return {"flights_per_destination": destinations, "flights_per_pilot": pilots, "aircraft_usage": aircraft}
@@ -0,0 +1,171 @@
+import argparse
+import bisect
+import heapq
+import sys
+
+import connection
+import migrations
+
+# Pilot duty-conflict detection. Two flights conflict when the same pilot would have to start the second one before
+# finishing the first plus the minimum rest gap. PilotIntervalIndex keeps each pilot's duty windows sorted by start,
+# so checking a new assignment is a bisect plus a look at its immediate neighbours, and audit() finds every conflict
+# in the whole schedule with one ordered sweep instead of a self-join.
+
+DEFAULT_MIN_REST_MINUTES = 60
+
+# Windows come back as epoch seconds, converted by SQLite from the text in idx_flights_pilot_schedule. The expression
+# rather than the DepartureEpoch/ArrivalEpoch columns: those are computed from the table row, which would turn the
+# covering index read into a lookup per flight
+PILOT_WINDOWS_SQL = f"""
+    SELECT FlightNumber, {migrations.epoch('DepartureDateTime')}, {migrations.epoch('ArrivalDateTime')}
+    FROM Flights
+    WHERE PilotID = ?
+"""
+
+# Ordered by the covering idx_flights_pilot_schedule index, so the sweep needs no sort
+ALL_WINDOWS_SQL = f"""
+    SELECT PilotID, FlightNumber, {migrations.epoch('DepartureDateTime')}, {migrations.epoch('ArrivalDateTime')}
+    FROM Flights
+    WHERE PilotID IS NOT NULL
+    ORDER BY PilotID, DepartureDateTime
+"""
+
+# A flight row's times through the same conversion, so an assignment and the windows it is checked against agree
+WINDOW_SQL = f"SELECT {migrations.epoch('?')}, {migrations.epoch('?')}"
+
+
+class DutyConflictError(ValueError): # Raised when an assignment would double-book a pilot
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts # [(flight_number, pilot_id, [conflicting flight numbers])]
+        details = "; ".join(f"{flight} clashes with {', '.join(clashes)} for pilot {pilot}" for flight, pilot, clashes in conflicts)
+        super().__init__(f"Pilot duty conflict: {details}")
+
+
+class PilotIntervalIndex: # Per-pilot duty windows sorted by start time
+
+    def __init__(self, min_rest_minutes=DEFAULT_MIN_REST_MINUTES):
+        self.gap = int(min_rest_minutes * 60)
+        self._starts = {}   # pilot -> sorted start times
+        self._windows = {}  # pilot -> (start, end, flight) in the same order
+        self._longest = {}  # pilot -> longest window, bounds how far back an overlapping window can start
+
+    def __contains__(self, pilot_id):
+        return pilot_id in self._windows
+
+    def load(self, conn, pilot_id): # Read one pilot's existing flights into the index
+        self._starts[pilot_id], self._windows[pilot_id], self._longest[pilot_id] = [], [], 0
+        for flight_number, start, end in conn.execute(PILOT_WINDOWS_SQL, (pilot_id,)):
+            self.add(pilot_id, flight_number, start, end)
+
+    def add(self, pilot_id, flight_number, start, end):
+        if start is None or end is None:
+            return
+        starts = self._starts.setdefault(pilot_id, [])
+        windows = self._windows.setdefault(pilot_id, [])
+        position = bisect.bisect_right(starts, start)
+        starts.insert(position, start)
+        windows.insert(position, (start, end, flight_number))
+        self._longest[pilot_id] = max(self._longest.get(pilot_id, 0), end - start)
+
+    def remove(self, pilot_id, flight_number, start):
+        starts = self._starts.get(pilot_id, [])
+        windows = self._windows.get(pilot_id, [])
+        position = bisect.bisect_left(starts, start)
+        while position < len(starts) and starts[position] == start:
+            if windows[position][2] == flight_number:
+                del starts[position], windows[position]
+                return
+            position += 1
+
+    def conflicts(self, pilot_id, start, end, exclude=None): # Flight numbers whose window (plus rest gap) overlaps [start, end)
+        if start is None or end is None:
+            return []
+        starts = self._starts.get(pilot_id, [])
+        windows = self._windows.get(pilot_id, [])
+        found = []
+
+        # Later windows: anything starting before this one ends plus the rest gap
+        position = bisect.bisect_left(starts, start)
+        for index in range(position, bisect.bisect_left(starts, end + self.gap)):
+            if windows[index][2] != exclude:
+                found.append(windows[index][2])
+
+        # Earlier windows: only those starting within the longest duty of this one can still be running
+        earliest = start - self._longest.get(pilot_id, 0) - self.gap
+        for index in range(position - 1, -1, -1):
+            window_start, window_end, flight_number = windows[index]
+            if window_start < earliest:
+                break
+            if window_end + self.gap > start and flight_number != exclude:
+                found.append(flight_number)
+
+        return found
+
+
+def check_assignments(conn, assignments, min_rest_minutes=DEFAULT_MIN_REST_MINUTES):
+    # assignments is [(flight row, pilot_id)] where the row is in data_access.FLIGHT_COLUMNS order. Each pilot's
+    # schedule is loaded once, each assignment is then a bisect; assignments in the same batch are checked against
+    # each other too. A flight without both times has no window, so it can't clash and isn't checked, the same as in
+    # audit(). Returns the list of conflicts (empty if the batch is clean)
+    index = PilotIntervalIndex(min_rest_minutes)
+    conflicts = []
+
+    for pilot_id in {pilot for _, pilot in assignments} | {flight[5] for flight, _ in assignments if flight[5] is not None}:
+        index.load(conn, pilot_id) # Old pilots too, so a flight moved away earlier in the batch frees its slot
+
+    for flight, pilot_id in assignments:
+        flight_number, previous_pilot = flight[0], flight[5]
+        departure, arrival = conn.execute(WINDOW_SQL, (flight[1], flight[2])).fetchone()
+        if departure is None or arrival is None:
+            continue
+        if previous_pilot is not None: # Moving a flight away frees its old slot
+            index.remove(previous_pilot, flight_number, departure)
+
+        clashes = index.conflicts(pilot_id, departure, arrival, exclude=flight_number)
+        if clashes:
+            conflicts.append((flight_number, pilot_id, clashes))
+        else:
+            index.add(pilot_id, flight_number, departure, arrival)
+
+    return conflicts
+
+
+def audit(path=None, min_rest_minutes=DEFAULT_MIN_REST_MINUTES):
+    # Every conflicting pair in the schedule from one ordered sweep. For each pilot, a heap holds the windows still
+    # "open" (end + rest gap after the current start); each new flight conflicts with exactly those.
+    # Returns [(pilot_id, earlier flight, later flight)]
+    gap = int(min_rest_minutes * 60)
+    conflicts = []
+    current_pilot, active = None, []
+
+    with connection.reader(path) as conn:
+        for pilot_id, flight_number, start, end in conn.execute(ALL_WINDOWS_SQL):
+            if start is None or end is None:
+                continue
+            if pilot_id != current_pilot:
+                current_pilot, active = pilot_id, []
+
+            while active and active[0][0] <= start: # Windows that finished (with rest) before this one starts
+                heapq.heappop(active)
+            for _, earlier in active:
+                conflicts.append((pilot_id, earlier, flight_number))
+            heapq.heappush(active, (end + gap, flight_number))
+
+    return conflicts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Audit the whole schedule for pilot duty conflicts")
+    parser.add_argument("--db", default=None, help="database file (defaults to airline.db)")
+    parser.add_argument("--min-rest", type=float, default=DEFAULT_MIN_REST_MINUTES, help="minimum rest between flights, in minutes")
+    args = parser.parse_args()
+
+    found = audit(args.db, args.min_rest)
+    if found:
+        print("Pilot | Earlier Flight | Later Flight")
+        print("-" * 40)
+        for pilot_id, earlier, later in found:
+            print(f"{pilot_id:<5} | {earlier:<14} | {later}")
+    print(f"{len(found)} conflicts found")
+    sys.exit(1 if found else 0)
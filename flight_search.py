@@ -0,0 +1,116 @@
+import connection
+import migrations
+import query_builder
+
+# Flight search with range predicates and keyset pagination. Results are ordered by (DepartureEpoch, FlightNumber),
+# which is unique, so "the page after this row" is a single index seek rather than an OFFSET that re-reads every
+# earlier page. Rows are streamed with fetchmany, nothing ever holds the full result set.
+# The cursor is (DepartureEpoch, FlightNumber) of the last row, read back from the row itself, so it is exactly the key
+# the index holds even for text written before migration 10 added the format checks. Flights with no departure sort
+# first, as NULLs do in the index, and a page ending on one gets a cursor of (None, FlightNumber): the rest of them by
+# FlightNumber, then every dated flight.
+#
+# The ranges are on the integer DepartureEpoch (migration 10), so bounds are turned into epoch seconds once here and
+# the index compares integers. Callers still pass and get back the DepartureDateTime text.
+
+COLUMNS = "FlightNumber, DepartureDateTime, ArrivalDateTime, Status, DestinationID, PilotID, AircraftID"
+PAGE_COLUMNS = COLUMNS + ", DepartureEpoch" # The extra column is the cursor's key, search_page strips it again
+DEFAULT_PAGE_SIZE = 50
+FETCH_SIZE = 500
+
+
+def as_list(values): # Accept a single value, a comma separated string or any iterable; blanks are dropped
+    if values is None:
+        return []
+    if isinstance(values, str):
+        values = values.split(",")
+    elif not isinstance(values, (list, tuple, set, frozenset)):
+        values = [values]
+    return [value.strip() if isinstance(value, str) else value for value in values if str(value).strip()]
+
+
+def epoch_bound(value, name):
+    seconds = migrations.to_epoch(value.strip() if isinstance(value, str) else value)
+    if seconds is None:
+        raise ValueError(f"{name} must be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS, not {value!r}")
+    return seconds
+
+
+def build_search(destinations=None, statuses=None, departure_from=None, departure_to=None, after=None, limit=None, columns=COLUMNS):
+    # Returns (sql, params). departure_from is inclusive and departure_to exclusive, so consecutive windows never
+    # overlap. Both accept a date (its midnight) or a full timestamp, anything else raises ValueError.
+    # after is the cursor of the last row already seen, (DepartureEpoch, FlightNumber) with DepartureEpoch None for a flight without one.
+    # Filters go through query_builder, so every combination maps onto a small fixed set of statement texts
+    predicates, params = [], []
+
+    destinations = as_list(destinations)
+    if destinations:
+        predicate, values = query_builder.in_list("DestinationID", destinations)
+        predicates.append(predicate)
+        params += values
+
+    statuses = as_list(statuses)
+    if statuses:
+        predicate, values = query_builder.in_list("Status", statuses)
+        predicates.append(predicate)
+        params += values
+
+    if departure_from:
+        predicates.append("DepartureEpoch >= ?")
+        params.append(epoch_bound(departure_from, "departure_from"))
+
+    if departure_to:
+        predicates.append("DepartureEpoch < ?")
+        params.append(epoch_bound(departure_to, "departure_to"))
+
+    if after and after[0] is None: # Still on the undated flights, still the same index scan
+        predicates.append("(DepartureEpoch IS NOT NULL OR FlightNumber > ?)")
+        params.append(after[1])
+    elif after:
+        predicates.append("(DepartureEpoch, FlightNumber) > (?, ?)") # Row-value comparison, a range seek on the keyset index
+        params += [int(after[0]), after[1]]
+
+    if limit:
+        params.append(int(limit))
+
+    return query_builder.select(columns, "Flights", predicates, "DepartureEpoch, FlightNumber", bool(limit)), params
+
+
+def iter_flights(destinations=None, statuses=None, departure_from=None, departure_to=None, after=None, limit=None, path=None):
+    # Lazily yield every matching flight, fetching FETCH_SIZE rows at a time. The reader connection is held until the
+    # generator is exhausted or closed
+    sql, params = build_search(destinations, statuses, departure_from, departure_to, after, limit)
+
+    with connection.reader(path) as conn:
+        cursor = conn.execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+
+def search_page(destinations=None, statuses=None, departure_from=None, departure_to=None, after=None, page_size=DEFAULT_PAGE_SIZE, path=None):
+    # One page of results plus the cursor for the next page (None on the last page). Each page is an independent
+    # query, so nothing is held open between pages
+    sql, params = build_search(destinations, statuses, departure_from, departure_to, after, page_size + 1, PAGE_COLUMNS) # One extra row tells us whether there is a next page
+
+    with connection.reader(path) as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    after = (rows[page_size - 1][-1], rows[page_size - 1][0]) if len(rows) > page_size else None
+    return [row[:-1] for row in rows[:page_size]], after
+
+
+def iter_pages(destinations=None, statuses=None, departure_from=None, departure_to=None, page_size=DEFAULT_PAGE_SIZE, path=None):
+    # Yield page after page using keyset cursors, for callers that want to stop at any point
+    after = None
+    while True:
+        rows, after = search_page(destinations, statuses, departure_from, departure_to, after, page_size, path)
+        if rows:
+            yield rows
+        if after is None:
+            return
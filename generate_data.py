@@ -0,0 +1,226 @@
+import argparse
+import calendar
+import itertools
+import random
+import time
+
+import bulk_import
+import connection
+import migrations
+
+# Deterministic synthetic data at production scale. The same seed and flight count always produce the same database,
+# so benchmark runs at a given scale are comparable. Every table in the schema is filled with referential integrity
+# (IDs are allocated sequentially, so every foreign key points at a row that was generated before it).
+
+CITIES = [
+    ("New York", "USA", "JFK"), ("London", "UK", "LHR"), ("Tokyo", "Japan", "HND"), ("Paris", "France", "CDG"),
+    ("Sydney", "Australia", "SYD"), ("Moscow", "Russia", "SVO"), ("Rome", "Italy", "FCO"), ("Madrid", "Spain", "MAD"),
+    ("Seoul", "South Korea", "ICN"), ("Bangkok", "Thailand", "BKK"), ("Dubai", "UAE", "DXB"), ("Singapore", "Singapore", "SIN"),
+    ("Frankfurt", "Germany", "FRA"), ("Amsterdam", "Netherlands", "AMS"), ("Istanbul", "Turkey", "IST"), ("Los Angeles", "USA", "LAX"),
+    ("Chicago", "USA", "ORD"), ("Toronto", "Canada", "YYZ"), ("Hong Kong", "China", "HKG"), ("Delhi", "India", "DEL"),
+    ("Mexico City", "Mexico", "MEX"), ("Sao Paulo", "Brazil", "GRU"), ("Johannesburg", "South Africa", "JNB"), ("Cairo", "Egypt", "CAI"),
+]
+FIRST_NAMES = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "David", "Elizabeth", "William",
+               "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Wei", "Yuki", "Amir", "Priya", "Olga", "Luca"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez", "Wilson",
+              "Anderson", "Taylor", "Thomas", "Moore", "Martin", "Lee", "Chen", "Kim", "Nguyen", "Khan", "Rossi", "Muller", "Sato"]
+NATIONALITIES = ["USA", "UK", "Canada", "Australia", "Japan", "France", "Germany", "Italy", "Spain", "India", "China", "Brazil"]
+AIRCRAFT_MODELS = [("737", "Boeing", 180), ("A320", "Airbus", 150), ("777", "Boeing", 350), ("A330", "Airbus", 300),
+                   ("787", "Boeing", 250), ("A350", "Airbus", 320), ("190", "Embraer", 100), ("767", "Boeing", 280),
+                   ("A321", "Airbus", 200), ("747", "Boeing", 400)]
+
+FLIGHT_STATUSES = (["Scheduled", "Departed", "Arrived", "Delayed", "Cancelled"], [55, 10, 25, 7, 3])
+BOOKING_CLASSES = (["Economy", "Premium Economy", "Business", "First"], [75, 10, 12, 3])
+BOOKING_STATUSES = (["Confirmed", "Pending", "Cancelled"], [85, 10, 5])
+BAGGAGE_DESCRIPTIONS = ["Large suitcase", "Carry-on bag", "Medium suitcase", "Small bag", "Sports equipment", "Travel bag", "Backpack"]
+DELAY_REASONS = ["Adverse weather conditions", "Air traffic control", "Crew availability", "Technical fault", "Late inbound aircraft"]
+
+SCHEDULE_START = 1735689600 # 2025-01-01 00:00:00 UTC
+SCHEDULE_DAYS = 365
+CHUNK = 20000
+
+
+def timestamp(epoch): # Epoch seconds to the 'YYYY-MM-DD HH:MM:SS' text the schema stores
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(epoch))
+
+
+def sizes(flights, bookings_per_flight=3.0): # Row counts for every table, derived from the number of flights
+    bookings = int(flights * bookings_per_flight)
+    return {
+        "destinations": len(CITIES) if flights < 100000 else max(len(CITIES), flights // 5000),
+        "pilots": max(10, flights // 150),   # Roughly two flights a day each over the year
+        "aircrafts": max(10, flights // 400),
+        "flights": flights,
+        "passengers": max(10, bookings // 3),
+        "bookings": bookings,
+    }
+
+
+def zipf_weights(count, skew=1.1): # A few hubs get most of the traffic, like real route networks
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+def destinations(rng, count):
+    for index in range(count):
+        city, country, code = CITIES[index % len(CITIES)]
+        if index >= len(CITIES): # Beyond the real list, make up regional airports with unique codes
+            city, code = f"{city} {index // len(CITIES)}", f"{code[:2]}{index:04d}"
+        yield (index + 1, city, country, code)
+
+
+def pilots(rng, count):
+    for pilot_id in range(1, count + 1):
+        yield (pilot_id, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f"LIC{pilot_id:08d}", f"555-{rng.randrange(10000):04d}")
+
+
+def aircrafts(rng, count):
+    for aircraft_id in range(1, count + 1):
+        model, manufacturer, capacity = rng.choice(AIRCRAFT_MODELS)
+        maintenance = timestamp(SCHEDULE_START - rng.randrange(180) * 86400)[:10]
+        yield (aircraft_id, model, manufacturer, capacity, f"REG{aircraft_id:07d}", maintenance)
+
+
+def flights(rng, count, counts):
+    destination_weights = list(itertools.accumulate(zipf_weights(counts["destinations"]))) # Cumulative, so each pick is a bisect not a full pass
+    destination_ids = range(1, counts["destinations"] + 1)
+    hour_weights = [1, 1, 1, 1, 1, 3, 8, 10, 9, 7, 6, 6, 6, 6, 7, 8, 9, 9, 8, 6, 4, 3, 2, 1] # Morning and evening banks
+
+    for number in range(1, count + 1):
+        day = rng.randrange(SCHEDULE_DAYS)
+        hour = rng.choices(range(24), hour_weights)[0]
+        departure = SCHEDULE_START + day * 86400 + hour * 3600 + rng.randrange(12) * 300
+        arrival = departure + int(rng.triangular(1, 14, 3) * 3600)
+        pilot_id = rng.randint(1, counts["pilots"]) if rng.random() > 0.02 else None # A few flights still need a pilot
+        yield (f"GN{number:08d}", timestamp(departure), timestamp(arrival), rng.choices(*FLIGHT_STATUSES)[0],
+               rng.choices(destination_ids, cum_weights=destination_weights)[0], pilot_id, rng.randint(1, counts["aircrafts"]))
+
+
+def passengers(rng, count):
+    for passenger_id in range(1, count + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        birth = timestamp(SCHEDULE_START - rng.randrange(18 * 365, 80 * 365) * 86400)[:10]
+        yield (passenger_id, first, last, birth, f"P{passenger_id:09d}", f"555-{rng.randrange(10000):04d}",
+               f"{first.lower()}.{last.lower()}{passenger_id}@example.com", rng.choice(NATIONALITIES))
+
+
+def bookings(rng, counts, flight_rows): # Spread bookings over flights; flight_rows yields (FlightNumber, DepartureDateTime) in order
+    remaining = counts["bookings"]
+    flights_left = counts["flights"]
+    booking_id = 0
+
+    for flight_number, departure in flight_rows:
+        average = remaining / flights_left if flights_left else 0
+        flights_left -= 1
+        seats = min(remaining, int(rng.uniform(0, 2 * average) + 0.5)) if flights_left else remaining
+        remaining -= seats
+        departure_epoch = calendar.timegm(time.strptime(departure, "%Y-%m-%d %H:%M:%S"))
+
+        for seat in range(seats):
+            booking_id += 1
+            booked = timestamp(departure_epoch - rng.randrange(1, 120) * 86400)[:10]
+            yield (booking_id, rng.randint(1, counts["passengers"]), flight_number, booked,
+                   f"{seat // 6 + 1}{'ABCDEF'[seat % 6]}", rng.choices(*BOOKING_CLASSES)[0], rng.choices(*BOOKING_STATUSES)[0])
+
+
+def baggage(rng, booking_count):
+    baggage_id = 0
+    for booking_id in range(1, booking_count + 1):
+        for _ in range(rng.choices((0, 1, 2, 3), (25, 50, 20, 5))[0]):
+            baggage_id += 1
+            weight = round(min(32.0, max(1.0, rng.gauss(18, 6))), 1)
+            yield (baggage_id, booking_id, weight, f"BG{baggage_id:010d}", rng.choice(BAGGAGE_DESCRIPTIONS))
+
+
+def status_log(rng, flight_rows): # Scheduled event for every flight, plus the events that led to its current status
+    for flight_number, departure, arrival, status in flight_rows:
+        yield (flight_number, "Scheduled", departure, "Flight scheduled")
+        if status == "Delayed":
+            yield (flight_number, "Delayed", departure, rng.choice(DELAY_REASONS))
+        elif status == "Cancelled":
+            yield (flight_number, "Cancelled", departure, rng.choice(DELAY_REASONS))
+        elif status in ("Departed", "Arrived"):
+            yield (flight_number, "Departed", departure, "Flight departed on time")
+            if status == "Arrived":
+                yield (flight_number, "Arrived", arrival, "Flight arrived on time")
+
+
+def insert_all(conn, sql, rows): # executemany in fixed-size chunks, committing each, so no table is ever fully materialised
+    total = 0
+    for chunk in bulk_import.batched(rows, CHUNK):
+        conn.executemany(sql, chunk)
+        conn.commit()
+        total += len(chunk)
+    return total
+
+
+def generate(path, flights_count, seed=42, bookings_per_flight=3.0, progress=True): # Build a fresh database at the given scale. Returns row counts per table
+    migrations.migrate(path)
+    counts = sizes(flights_count, bookings_per_flight)
+    rng = random.Random(seed)
+    written = {}
+
+    def step(name, table, columns, rows):
+        started = time.perf_counter()
+        sql = f"INSERT INTO {table} ({columns}) VALUES ({','.join('?' * len(columns.split(',')))})"
+        written[name] = insert_all(conn, sql, rows)
+        if progress:
+            print(f"  {table:<16} {written[name]:>12,} rows in {time.perf_counter() - started:.1f}s")
+
+    with connection.writer(path) as conn:
+        if not migrations.is_empty(conn):
+            raise ValueError(f"{path} already has data, generate into a new file")
+
+        # Bulk load: no FK enforcement (keys are correct by construction) and indexes built once at the end
+        conn.execute("PRAGMA foreign_keys = OFF")
+        indexes = [index for table in ("Flights", "Bookings", "Baggage", migrations.STATUS_LOG_LIVE) for index in bulk_import.table_indexes(conn, table)]
+        for name, _ in indexes:
+            conn.execute(f"DROP INDEX {name}")
+        migrations.drop_change_triggers(conn.cursor()) # Generated rows are the starting snapshot, not changes for the feed
+        migrations.drop_passenger_search_triggers(conn.cursor()) # Indexed in one pass at the end instead of row by row
+        migrations.drop_baggage_total_triggers(conn.cursor()) # Likewise the bag totals, summed once at the end
+        migrations.drop_timestamp_check_triggers(conn.cursor()) # timestamp() only writes the canonical format
+
+        try:
+            step("destinations", "Destinations", "DestinationID,City,Country,AirportCode", destinations(rng, counts["destinations"]))
+            step("pilots", "Pilots", "PilotID,FirstName,LastName,LicenseNumber,ContactNumber", pilots(rng, counts["pilots"]))
+            step("aircrafts", "Aircrafts", "AircraftID,Model,Manufacturer,Capacity,RegistrationNumber,LastMaintenanceDate", aircrafts(rng, counts["aircrafts"]))
+            step("flights", "Flights", "FlightNumber,DepartureDateTime,ArrivalDateTime,Status,DestinationID,PilotID,AircraftID", flights(rng, flights_count, counts))
+            step("passengers", "Passengers", "PassengerID,FirstName,LastName,DateOfBirth,PassportNumber,ContactNumber,Email,Nationality", passengers(rng, counts["passengers"]))
+
+            # Later tables are driven off the flights already written, read back in key order with a separate cursor
+            flight_rows = conn.execute("SELECT FlightNumber, DepartureDateTime FROM Flights ORDER BY FlightNumber")
+            step("bookings", "Bookings", "BookingID,PassengerID,FlightNumber,BookingDate,SeatNumber,Class,BookingStatus", bookings(rng, counts, flight_rows))
+            step("baggage", "Baggage", "BaggageID,BookingID,Weight,TagNumber,Description", baggage(rng, written["bookings"]))
+            flight_rows = conn.execute("SELECT FlightNumber, DepartureDateTime, ArrivalDateTime, Status FROM Flights ORDER BY FlightNumber")
+            step("status_log", migrations.STATUS_LOG_LIVE, "FlightNumber,Status,Timestamp,Reason", status_log(rng, flight_rows))
+
+        finally:
+            started = time.perf_counter()
+            for _, sql in indexes:
+                conn.execute(sql)
+            migrations.create_change_triggers(conn.cursor())
+            migrations.rebuild_passenger_search(conn.cursor())
+            migrations.create_passenger_search_triggers(conn.cursor())
+            migrations.rebuild_baggage_totals(conn.cursor())
+            migrations.create_baggage_total_triggers(conn.cursor())
+            migrations.create_timestamp_check_triggers(conn.cursor())
+            conn.execute("ANALYZE") # Give the planner real statistics for the benchmark
+            conn.commit()
+            conn.execute("PRAGMA foreign_keys = ON")
+            if progress:
+                print(f"  indexes + ANALYZE in {time.perf_counter() - started:.1f}s")
+
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic airline database")
+    parser.add_argument("output", help="new database file to create")
+    parser.add_argument("--flights", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--bookings-per-flight", type=float, default=3.0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate(args.output, args.flights, args.seed, args.bookings_per_flight)
+    print(f"Generated {sum(counts.values()):,} rows in {time.perf_counter() - started:.1f}s")
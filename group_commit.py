@@ -0,0 +1,180 @@
+import collections
+import logging
+import queue
+import threading
+import time
+
+import connection
+import latency
+
+# Group commit. Producers put events on a bounded queue and return at once; one background thread drains it and hands
+# whole batches to a write(conn, events) function inside a single transaction, returning (committed, rejected). A batch
+# is flushed when it reaches max_batch events or its oldest event has waited max_delay seconds, so one commit is paid
+# per batch rather than per event. When the queue is full, put() blocks (or raises queue.Full with block=False), which
+# is the back-pressure. status_ingest and baggage subclass GroupCommitIngestor with their own write functions.
+#
+# A batch that fails is rolled back and its events are dropped: the producers were answered long ago. The failure is
+# logged, counted in failed_batches with the message in last_error (so whoever reads stats() sees it), and handed to
+# on_error(events, exception) when the owner passes one, which can requeue, dead-letter or alert.
+
+DEFAULT_MAX_BATCH = 1000
+DEFAULT_MAX_DELAY = 0.05 # Seconds
+DEFAULT_MAX_PENDING = 50000
+LATENCY_SAMPLES = 1000 # Commit latencies kept for the percentiles
+
+log = logging.getLogger(__name__)
+
+class EventQueue(queue.Queue): # queue.Queue plus put_all, for callers that must queue a whole batch or none of it
+
+    def put_all(self, items): # Never blocks: raises queue.Full, with nothing queued, when the items don't all fit
+        with self.not_full:
+            if self.maxsize > 0 and self._qsize() + len(items) > self.maxsize:
+                raise queue.Full
+            for item in items:
+                self._put(item)
+            self.unfinished_tasks += len(items)
+            self.not_empty.notify(len(items))
+
+
+_FLUSH = object() # Queue marker asking the writer to commit what it has and report back
+
+
+class IngestMetrics: # Counters and commit latencies, updated by the writer thread and read from anywhere
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.submitted = self.committed = self.rejected = self.batches = self.failed_batches = 0
+        self.last_error = None # "time: message" of the latest failed batch
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+
+    def record_submit(self):
+        with self._lock:
+            self.submitted += 1
+
+    def record_failure(self, events, error):
+        with self._lock:
+            self.failed_batches += 1
+            self.rejected += events
+            self.last_error = f"{time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())}: {error}"
+
+    def record_batch(self, committed, rejected, seconds):
+        with self._lock:
+            self.batches += 1
+            self.committed += committed
+            self.rejected += rejected
+            self.latencies.append(seconds)
+
+    def snapshot(self, pending=0):
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            latencies = sorted(self.latencies)
+            ms = lambda value: None if value is None else round(value * 1000, 3)
+            return {
+                "submitted": self.submitted,
+                "committed": self.committed,
+                "rejected": self.rejected,
+                "pending": pending,
+                "batches": self.batches,
+                "failed_batches": self.failed_batches,
+                "last_error": self.last_error,
+                "mean_batch_size": round(self.committed / self.batches, 1) if self.batches else None,
+                "events_per_second": round(self.committed / elapsed, 1) if elapsed else None,
+                "commit_p50_ms": ms(latency.percentile(latencies, 0.50)),
+                "commit_p95_ms": ms(latency.percentile(latencies, 0.95)),
+                "commit_p99_ms": ms(latency.percentile(latencies, 0.99)),
+            }
+
+
+class GroupCommitIngestor: # Bounded event queue plus the writer thread that group-commits it through write(conn, events)
+
+    def __init__(self, write, name, path=None, max_batch=DEFAULT_MAX_BATCH, max_delay=DEFAULT_MAX_DELAY, max_pending=DEFAULT_MAX_PENDING, on_error=None):
+        self.write = write
+        self.name = name
+        self.on_error = on_error # on_error(events, exception), called on the writer thread for each failed batch
+        self.path = path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.metrics = IngestMetrics()
+        self.max_pending = max_pending
+        self._events = EventQueue(max_pending)
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=f"{name}-ingest", daemon=True)
+        self._thread.start()
+
+    def put(self, event, block=True, timeout=None):
+        # Queue one event. Blocks while the queue is full unless block=False, which raises queue.Full instead
+        if self._stopping:
+            raise RuntimeError(f"The {self.name} ingestor has been stopped")
+        self._events.put(event, block, timeout)
+        self.metrics.record_submit()
+
+    def put_all(self, events):
+        # Queue every event or none of them, without blocking. Raises queue.Full when they don't all fit right now and
+        # ValueError when they never could, so a caller retrying a rejected batch can't write any event twice
+        if self._stopping:
+            raise RuntimeError(f"The {self.name} ingestor has been stopped")
+        if len(events) > self.max_pending > 0:
+            raise ValueError(f"At most {self.max_pending} {self.name} events can be queued at once")
+        self._events.put_all(events)
+        for _ in events:
+            self.metrics.record_submit()
+
+    def flush(self, timeout=None): # Wait until every event submitted so far is committed
+        done = threading.Event()
+        self._events.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def pending(self):
+        return self._events.qsize()
+
+    def stats(self):
+        return self.metrics.snapshot(self.pending())
+
+    def stop(self): # Commit whatever is queued, then stop the writer thread
+        self._stopping = True
+        self._events.put(None)
+        self._thread.join()
+
+    def _run(self):
+        batch, waiters, running = [], [], True
+        while running:
+            try:
+                timeout = None if not batch else max(0, deadline - time.monotonic())
+                item = self._events.get(timeout=timeout)
+            except queue.Empty:
+                item = False # Deadline reached
+
+            if item is None:
+                running = False
+            elif isinstance(item, tuple) and item[0] is _FLUSH:
+                waiters.append(item[1])
+            elif item is not False:
+                if not batch:
+                    deadline = time.monotonic() + self.max_delay
+                batch.append(item)
+                if len(batch) < self.max_batch:
+                    continue
+
+            if batch:
+                self._commit(batch)
+                batch = []
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+
+    def _commit(self, batch):
+        started = time.perf_counter()
+        try:
+            with connection.writer(self.path) as conn:
+                committed, rejected = self.write(conn, batch)
+        except Exception as e:
+            self.metrics.record_failure(len(batch), e)
+            log.error("%s batch of %d events failed and was dropped: %s", self.name.capitalize(), len(batch), e)
+            if self.on_error is not None:
+                try:
+                    self.on_error(batch, e)
+                except Exception: # The writer thread must keep going whatever the handler does
+                    log.exception("on_error handler for the %s ingestor failed", self.name)
+            return
+        self.metrics.record_batch(committed, rejected, time.perf_counter() - started)
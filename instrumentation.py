@@ -0,0 +1,462 @@
+import collections
+import functools
+import hashlib
+import inspect
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Query instrumentation. When enabled, every connection the ConnectionManager opens is an InstrumentedConnection:
+#
+#   - each statement is timed from execute() until its cursor is exhausted or closed, with the rows it returned (or
+#     changed) and the VM steps it took, counted by a progress handler as the "rows examined" proxy
+#   - set_trace_callback counts every statement SQLite actually runs by kind, including ones issued inside triggers
+#     and the BEGIN/COMMIT the wrappers never see
+#   - statements slower than the threshold go to the slow-query log with redacted parameters and their query plan
+#   - functions decorated with @operation (the data_access API) get their own latency histograms; one that returns a
+#     generator is timed while the generator is consumed
+#
+# Everything is exported as JSON (snapshot) or Prometheus text (prometheus). Disabled, the decorator is a flag check
+# and connections are plain sqlite3 ones.
+#
+# Environment: AIRLINE_INSTRUMENT=1 turns it on, AIRLINE_SLOW_QUERY_MS sets the threshold, AIRLINE_SLOW_QUERY_LOG
+# appends slow queries to a JSON lines file and AIRLINE_METRICS_FILE is where main() saves the snapshot on exit.
+
+BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # Seconds, Prometheus style
+DEFAULT_SLOW_QUERY_MS = 100
+SLOW_QUERY_ENTRIES = 200 # Kept in memory, the log file (if any) keeps everything
+PROGRESS_STEP = 1000 # The progress handler fires every this many VM instructions, so vm_steps is accurate to this
+PLAN_PREFIXES = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+enabled = False
+slow_query_ms = DEFAULT_SLOW_QUERY_MS
+slow_query_log = None
+
+_lock = threading.Lock()
+_local = threading.local()
+_gauges = {} # (metric, labels) -> (help text, function returning the value), see register_gauge
+
+
+class Histogram: # Cumulative-bucket latency histogram
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1) # Last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        index = 0
+        while index < len(BUCKETS) and seconds > BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.total += seconds
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+    def cumulative(self): # [(upper bound, observations at or below it)], ending with +Inf
+        running, result = 0, []
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            running += count
+            result.append((bound, running))
+        return result
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.count, 3) if self.count else None,
+            "max_ms": round(self.max * 1000, 3),
+            "buckets": {("+Inf" if bound == float("inf") else str(bound)): count for bound, count in self.cumulative()},
+        }
+
+
+class Metrics: # Everything recorded since the last reset
+
+    def __init__(self):
+        self.operations = collections.defaultdict(Histogram)
+        self.operation_errors = collections.Counter()
+        self.statements = {} # fingerprint id -> {"sql", "latency", "rows", "vm_steps", "errors"}
+        self.statement_kinds = collections.Counter()
+        self.slow_queries = collections.deque(maxlen=SLOW_QUERY_ENTRIES)
+        self.slow_query_count = 0
+
+
+metrics = Metrics()
+
+
+def enable(threshold_ms=None, log_path=None): # Instrument connections opened from now on
+    global enabled, slow_query_ms, slow_query_log
+    enabled = True
+    if threshold_ms is not None:
+        slow_query_ms = threshold_ms
+    if log_path is not None:
+        slow_query_log = log_path
+
+
+def enable_from_environment(): # Honour AIRLINE_INSTRUMENT and friends, returns whether instrumentation is on
+    if os.environ.get("AIRLINE_INSTRUMENT", "") not in ("", "0", "false"):
+        threshold = os.environ.get("AIRLINE_SLOW_QUERY_MS")
+        enable(float(threshold) if threshold else None, os.environ.get("AIRLINE_SLOW_QUERY_LOG") or None)
+    return enabled
+
+
+def reset():
+    global metrics
+    with _lock:
+        metrics = Metrics()
+
+
+def register_gauge(metric, help_text, read, **labels): # Export a value owned elsewhere (e.g. replica lag), read() is called at export time
+    with _lock:
+        _gauges[(metric, tuple(sorted(labels.items())))] = (help_text, read)
+
+
+def unregister_gauge(metric, **labels):
+    with _lock:
+        _gauges.pop((metric, tuple(sorted(labels.items()))), None)
+
+
+def read_gauges(): # [(metric, labels, help text, value)], read outside the lock as read() may take locks of its own
+    with _lock:
+        gauges = sorted(_gauges.items())
+    return [(metric, labels, help_text, read()) for (metric, labels), (help_text, read) in gauges]
+
+
+# Operations
+
+def operation(function): # Time a data_access call as an operation; statements it runs are tagged with its name
+    name = function.__name__
+
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        if not enabled:
+            return function(*args, **kwargs)
+        stack = _operation_stack()
+        stack.append(name)
+        started = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        except Exception:
+            stack.pop()
+            _observe(name, time.perf_counter() - started, True)
+            raise
+        stack.pop()
+        if inspect.isgenerator(result): # Streamed results do their work as they are consumed, so that is what gets timed
+            return _timed_iteration(name, result, time.perf_counter() - started)
+        _observe(name, time.perf_counter() - started, False)
+        return result
+    return timed
+
+
+def _timed_iteration(name, generator, elapsed): # Counts only the time spent producing rows, not the caller's between them
+    failed = False
+    try:
+        while True:
+            stack = _operation_stack()
+            stack.append(name)
+            started = time.perf_counter()
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+            except Exception:
+                failed = True
+                raise
+            finally:
+                elapsed += time.perf_counter() - started
+                stack.pop()
+            yield item
+    finally: # Exhausted, raised or closed early: one observation either way
+        generator.close()
+        _observe(name, elapsed, failed)
+
+
+def _observe(name, elapsed, failed):
+    with _lock:
+        metrics.operations[name].observe(elapsed)
+        if failed:
+            metrics.operation_errors[name] += 1
+
+
+def _operation_stack():
+    stack = getattr(_local, "operations", None)
+    if stack is None:
+        stack = _local.operations = []
+    return stack
+
+
+def current_operation():
+    stack = _operation_stack()
+    return stack[-1] if stack else None
+
+
+# Statements
+
+def normalise_sql(sql): # One line, single spaces, IN lists collapsed, so every variant of a query shares one fingerprint
+    sql = " ".join(sql.split())
+    return re.sub(r"IN \((\?,\s*)+\?\)", "IN (?...)", sql, flags=re.IGNORECASE)
+
+
+def fingerprint(sql):
+    return hashlib.sha1(sql.encode()).hexdigest()[:12]
+
+
+def redact(params): # Numbers and NULLs are kept, text (names, passports, emails) is replaced by its length
+    def one(value):
+        if value is None or isinstance(value, (int, float)):
+            return value
+        if isinstance(value, str):
+            return f"<text:{len(value)}>"
+        return f"<{type(value).__name__}>"
+
+    if isinstance(params, dict):
+        return {key: one(value) for key, value in params.items()}
+    return [one(value) for value in params]
+
+
+def statement_kind(sql):
+    words = sql.lstrip(" \n\t(").split(None, 1)
+    return words[0].upper() if words else ""
+
+
+def record_statement(conn, sql, params, elapsed, rows, vm_steps, failed, many=False):
+    normalised = normalise_sql(sql)
+    key = fingerprint(normalised)
+    operation_name = current_operation()
+
+    with _lock:
+        stats = metrics.statements.get(key)
+        if stats is None:
+            stats = metrics.statements[key] = {"sql": normalised, "latency": Histogram(), "rows": 0, "vm_steps": 0, "errors": 0}
+        stats["latency"].observe(elapsed)
+        stats["rows"] += rows
+        stats["vm_steps"] += vm_steps
+        stats["errors"] += failed
+
+    if elapsed * 1000 < slow_query_ms:
+        return
+
+    entry = {
+        "at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()),
+        "operation": operation_name,
+        "statement": key,
+        "sql": normalised,
+        "params": [redact(item) for item in params[:3]] if many else redact(params),
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "rows": rows,
+        "vm_steps": vm_steps,
+        "plan": query_plan(conn, sql, params[0] if many and params else params),
+    }
+    with _lock:
+        metrics.slow_queries.append(entry)
+        metrics.slow_query_count += 1
+        if slow_query_log:
+            with open(slow_query_log, "a") as handle:
+                handle.write(json.dumps(entry) + "\n")
+
+
+def query_plan(conn, sql, params): # EXPLAIN QUERY PLAN detail lines, run on the uninstrumented path so it is not itself recorded
+    if statement_kind(sql) not in PLAN_PREFIXES:
+        return None
+    try:
+        return [row[3] for row in sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params)]
+    except sqlite3.Error as e:
+        return [f"plan unavailable: {e}"]
+
+
+class InstrumentedCursor(sqlite3.Cursor): # Times each statement from execute() until its rows are exhausted or the cursor is closed
+    _pending = None
+
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters, False)
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters) # Kept for the slow-query log
+        return self._run(super().executemany, sql, seq_of_parameters, True)
+
+    def _run(self, method, sql, parameters, many):
+        self._finish()
+        self._pending = {"sql": sql, "params": parameters, "many": many, "elapsed": 0.0, "rows": 0, "ticks": self.connection.progress_ticks}
+        started = time.perf_counter()
+        try:
+            method(sql, parameters)
+        except Exception:
+            self._pending["elapsed"] += time.perf_counter() - started
+            self._finish(failed=True)
+            raise
+        self._pending["elapsed"] += time.perf_counter() - started
+        if self.description is None: # No result rows to wait for (DML, DDL, PRAGMA without output)
+            self._pending["rows"] = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def _fetched(self, started, rows, exhausted):
+        if self._pending is not None:
+            self._pending["elapsed"] += time.perf_counter() - started
+            self._pending["rows"] += rows
+            if exhausted:
+                self._finish()
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, int(row is not None), row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, True)
+            raise
+        self._fetched(started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self): # A cursor dropped half read still gets recorded
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def _finish(self, failed=False):
+        pending, self._pending = self._pending, None
+        if pending is None or not enabled:
+            return
+        vm_steps = (self.connection.progress_ticks - pending["ticks"]) * PROGRESS_STEP
+        record_statement(self.connection, pending["sql"], pending["params"], pending["elapsed"], pending["rows"], vm_steps, failed, pending["many"])
+
+
+class InstrumentedConnection(sqlite3.Connection): # Hands out InstrumentedCursors and counts VM progress and traced statements
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.progress_ticks = 0
+        self.set_progress_handler(self._progress, PROGRESS_STEP)
+        self.set_trace_callback(self._trace)
+
+    def _progress(self):
+        self.progress_ticks += 1
+        return 0 # Non-zero would abort the statement
+
+    def _trace(self, sql): # Called by SQLite for every statement it starts, trigger bodies included
+        kind = "TRIGGER" if sql.startswith("--") else statement_kind(sql)
+        with _lock:
+            metrics.statement_kinds[kind] += 1
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connection_factory(): # What ConnectionManager passes to sqlite3.connect
+    return InstrumentedConnection if enabled else sqlite3.Connection
+
+
+# Export
+
+def snapshot(): # Everything recorded so far as a JSON-ready dict
+    gauges = [dict(labels, metric=metric, value=value) for metric, labels, _, value in read_gauges()]
+    with _lock:
+        return {
+            "slow_query_ms": slow_query_ms,
+            "operations": {name: dict(histogram.as_dict(), errors=metrics.operation_errors[name]) for name, histogram in sorted(metrics.operations.items())},
+            "statements": {
+                key: {"sql": stats["sql"], "rows": stats["rows"], "vm_steps": stats["vm_steps"], "errors": stats["errors"], **stats["latency"].as_dict()}
+                for key, stats in sorted(metrics.statements.items(), key=lambda item: -item[1]["latency"].total)
+            },
+            "statement_kinds": dict(metrics.statement_kinds),
+            "slow_query_count": metrics.slow_query_count,
+            "slow_queries": list(metrics.slow_queries),
+            "gauges": gauges,
+        }
+
+
+def write_json(path):
+    with open(path, "w") as handle:
+        json.dump(snapshot(), handle, indent=2)
+
+
+def label(value): # Prometheus label value escaping
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def histogram_lines(metric, labels, histogram):
+    lines = []
+    for bound, count in histogram.cumulative():
+        le = "+Inf" if bound == float("inf") else repr(bound)
+        lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {count}')
+    lines.append(f"{metric}_sum{{{labels}}} {histogram.total:.6f}")
+    lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def prometheus(): # Text exposition format, for a /metrics endpoint or the node exporter textfile collector
+    lines = []
+    with _lock:
+        lines += ["# HELP airline_operation_duration_seconds Latency of data_access operations",
+                  "# TYPE airline_operation_duration_seconds histogram"]
+        for name, histogram in sorted(metrics.operations.items()):
+            lines += histogram_lines("airline_operation_duration_seconds", f'operation="{label(name)}"', histogram)
+
+        lines += ["# HELP airline_operation_errors_total Operations that raised",
+                  "# TYPE airline_operation_errors_total counter"]
+        lines += [f'airline_operation_errors_total{{operation="{label(name)}"}} {count}' for name, count in sorted(metrics.operation_errors.items())]
+
+        lines += ["# HELP airline_statement_duration_seconds Latency of each distinct SQL statement, from execute until its rows are read",
+                  "# TYPE airline_statement_duration_seconds histogram"]
+        for key, stats in sorted(metrics.statements.items()):
+            lines += histogram_lines("airline_statement_duration_seconds", f'statement="{key}"', stats["latency"])
+
+        for metric, field, help_text in (("airline_statement_rows_total", "rows", "Rows returned or changed"),
+                                         ("airline_statement_vm_steps_total", "vm_steps", "SQLite VM steps, a proxy for rows examined"),
+                                         ("airline_statement_errors_total", "errors", "Statements that raised")):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            lines += [f'{metric}{{statement="{key}"}} {stats[field]}' for key, stats in sorted(metrics.statements.items())]
+
+        lines += ["# HELP airline_statement_info SQL text for each statement fingerprint",
+                  "# TYPE airline_statement_info gauge"]
+        lines += [f'airline_statement_info{{statement="{key}",sql="{label(stats["sql"])}"}} 1' for key, stats in sorted(metrics.statements.items())]
+
+        lines += ["# HELP airline_sqlite_statements_total Statements run by SQLite, by kind (from the trace callback)",
+                  "# TYPE airline_sqlite_statements_total counter"]
+        lines += [f'airline_sqlite_statements_total{{kind="{label(kind)}"}} {count}' for kind, count in sorted(metrics.statement_kinds.items())]
+
+        lines += ["# HELP airline_slow_queries_total Statements over the slow-query threshold",
+                  "# TYPE airline_slow_queries_total counter",
+                  f"airline_slow_queries_total {metrics.slow_query_count}"]
+
+    described = set()
+    for metric, labels, help_text, value in read_gauges():
+        if metric not in described:
+            described.add(metric)
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        text = ",".join(f'{name}="{label(label_value)}"' for name, label_value in labels)
+        lines.append(f"{metric}{{{text}}} {value}" if text else f"{metric} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,22 @@
+# Latency percentiles shared by the benchmark, the ingestors and the backup probe. No imports, so anything can use it
+# without pulling in the modules it measures.
+
+
+def percentile(sorted_values, fraction): # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarise(samples, rows): # Latencies are collected in seconds, reported in milliseconds
+    samples.sort()
+    ms = lambda value: round(value * 1000, 3)
+    return {
+        "iterations": len(samples),
+        "p50_ms": ms(percentile(samples, 0.50)),
+        "p95_ms": ms(percentile(samples, 0.95)),
+        "p99_ms": ms(percentile(samples, 0.99)),
+        "max_ms": ms(samples[-1]),
+        "mean_rows": round(rows / len(samples), 1),
+    }
@@ -0,0 +1,646 @@
+import calendar
+import sqlite3
+import time
+
+import connection
+
+# Schema changes ship as numbered migrations. The database records the last one applied in PRAGMA user_version,
+# so startup only runs the steps it is missing and a fully migrated database needs no DDL at all
+MIGRATIONS = []
+
+
+def migration(version): # Decorator registering a function as the schema step for the given version
+    def register(step):
+        MIGRATIONS.append((version, step))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return step
+    return register
+
+
+@migration(1)
+def create_base_schema(cursor): # Creates the Airline Database Tables, as per schema. IF NOT EXISTS lets this adopt databases created before versioning
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS Destinations (
+                   DestinationID INTEGER PRIMARY KEY AUTOINCREMENT,
+                   City TEXT,
+                   Country TEXT,
+                   AirportCode TEXT
+                   )
+    ''')
+
+    cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS Pilots (
+                    PilotID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    FirstName TEXT,
+                    LastName TEXT,
+                    LicenseNumber TEXT UNIQUE,
+                    ContactNumber TEXT 
+                    )
+                   ''') # Contact# is a String due to leading zeros being lost when stored as integer, formatting characters e.g - # or +
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS Aircrafts (
+                   AircraftID INTEGER PRIMARY KEY AUTOINCREMENT,
+                   Model TEXT,
+                   Manufacturer TEXT,
+                   Capacity INTEGER,
+                   RegistrationNumber TEXT UNIQUE,
+                   LastMaintenanceDate DATE
+                   )
+                   ''')
+
+    cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS Flights (
+                    FlightNumber TEXT PRIMARY KEY,
+                    DepartureDateTime DATETIME,
+                    ArrivalDateTime DATETIME,
+                    Status TEXT,
+                    DestinationID INTEGER,
+                    PilotID INTEGER,
+                    AircraftID INTEGER,
+                    FOREIGN KEY (DestinationID) REFERENCES Destinations(DestinationID),
+                    FOREIGN KEY (PilotID) REFERENCES Pilots(PilotID),
+                    FOREIGN KEY (AircraftID) REFERENCES Aircrafts(AircraftID)                   
+                   )
+                   ''')
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS Passengers (
+                   PassengerID INTEGER PRIMARY KEY AUTOINCREMENT,
+                   FirstName TEXT,
+                   LastName TEXT,
+                   DateOfBirth DATE,
+                   PassportNumber TEXT UNIQUE,
+                   ContactNumber TEXT,
+                   Email TEXT,
+                   Nationality TEXT
+                   )
+                   ''')
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS Bookings (
+                   BookingID INTEGER PRIMARY KEY AUTOINCREMENT,
+                   PassengerID INTEGER,
+                   FlightNumber TEXT,
+                   BookingDate DATE,
+                   SeatNumber TEXT,
+                   Class TEXT,
+                   BookingStatus TEXT,
+                   FOREIGN KEY (PassengerID) REFERENCES Passengers(PassengerID),
+                   FOREIGN KEY (FlightNumber) REFERENCES Flights(FlightNumber)
+                   )
+                   ''')
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS Baggage (
+                   BaggageID INTEGER PRIMARY KEY AUTOINCREMENT,
+                   BookingID INTEGER,
+                   Weight REAL,
+                   TagNumber TEXT UNIQUE,
+                   Description TEXT,
+                   FOREIGN KEY (BookingID) REFERENCES Bookings(BookingID)
+                   )
+                   ''')
+
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS FlightStatusLog (
+                   LogID INTEGER PRIMARY KEY AUTOINCREMENT,
+                   FlightNumber TEXT,
+                   Status TEXT,
+                   Timestamp TEXT,
+                   Reason TEXT,
+                   FOREIGN KEY (FlightNumber) REFERENCES Flights(FlightNumber)
+                   )
+                   ''')
+
+
+@migration(2)
+def create_secondary_indexes(cursor): # Indexes for the hot filters, so lookups stop being full table scans as the tables grow
+    # query_flights filters on any combination of DestinationID, Status and DepartureDateTime. These three cover every
+    # combination by leading with whichever column is present
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_flights_destination_status_departure ON Flights (DestinationID, Status, DepartureDateTime)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_flights_status_departure ON Flights (Status, DepartureDateTime)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_flights_departure ON Flights (DepartureDateTime)")
+
+    # Covering index for view_pilot_schedule and the pilot stats, the Flights table itself is never read
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_flights_pilot_schedule ON Flights (PilotID, DepartureDateTime, ArrivalDateTime, Status, DestinationID, FlightNumber)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_flights_aircraft ON Flights (AircraftID)")
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_flight ON Bookings (FlightNumber)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_passenger ON Bookings (PassengerID)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_baggage_booking ON Baggage (BookingID)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_flightstatuslog_flight_time ON FlightStatusLog (FlightNumber, Timestamp)")
+
+
+# (summary table, key column, count column) for the Stats Mode aggregates kept up to date by triggers on Flights
+FLIGHT_COUNT_SUMMARIES = (
+    ("DestinationFlightCounts", "DestinationID", "FlightCount"),
+    ("PilotFlightCounts", "PilotID", "FlightCount"),
+    ("AircraftUsageCounts", "AircraftID", "UsageCount"),
+)
+
+
+def rebuild_flight_count_summaries(cursor): # Recompute every summary table from Flights in one pass each
+    for table, key, count in FLIGHT_COUNT_SUMMARIES:
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"INSERT INTO {table} ({key}, {count}) SELECT {key}, COUNT(*) FROM Flights WHERE {key} IS NOT NULL GROUP BY {key}")
+
+
+@migration(3)
+def create_flight_count_summaries(cursor): # Stats Mode reads these instead of a JOIN + GROUP BY over every flight
+    increment, decrement, changed = [], [], []
+    for table, key, count in FLIGHT_COUNT_SUMMARIES:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({key} INTEGER PRIMARY KEY, {count} INTEGER NOT NULL DEFAULT 0)")
+
+        # Trigger statements for this summary. {guard} is empty for INSERT/DELETE, for UPDATE it skips keys that did not change
+        increment.append(f"INSERT INTO {table} ({key}, {count}) SELECT NEW.{key}, 1 WHERE NEW.{key} IS NOT NULL{{guard}} "
+                         f"ON CONFLICT ({key}) DO UPDATE SET {count} = {count} + 1;")
+        decrement.append(f"UPDATE {table} SET {count} = {count} - 1 WHERE {key} = OLD.{key}{{guard}};")
+        changed.append(f"OLD.{key} IS NOT NEW.{key}")
+
+    update_guard = " AND OLD.{0} IS NOT NEW.{0}"
+    keys = [key for _, key, _ in FLIGHT_COUNT_SUMMARIES]
+
+    cursor.execute("CREATE TRIGGER IF NOT EXISTS trg_flights_counts_insert AFTER INSERT ON Flights BEGIN "
+                   + " ".join(body.format(guard="") for body in increment) + " END")
+    cursor.execute("CREATE TRIGGER IF NOT EXISTS trg_flights_counts_delete AFTER DELETE ON Flights BEGIN "
+                   + " ".join(body.format(guard="") for body in decrement) + " END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_flights_counts_update AFTER UPDATE OF {', '.join(keys)} ON Flights "
+                   f"WHEN {' OR '.join(changed)} BEGIN "
+                   + " ".join(body.format(guard=update_guard.format(key)) for body, key in zip(decrement, keys))
+                   + " " + " ".join(body.format(guard=update_guard.format(key)) for body, key in zip(increment, keys)) + " END")
+
+    rebuild_flight_count_summaries(cursor)
+
+
+@migration(4)
+def create_flight_keyset_indexes(cursor): # Flight search pages on (DepartureDateTime, FlightNumber), so the indexes need FlightNumber as the tie-breaker
+    cursor.execute("DROP INDEX IF EXISTS idx_flights_departure")
+    cursor.execute("DROP INDEX IF EXISTS idx_flights_status_departure")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_flights_departure_number ON Flights (DepartureDateTime, FlightNumber)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_flights_status_departure_number ON Flights (Status, DepartureDateTime, FlightNumber)")
+
+
+# FlightStatusLog is split by month. New events land in FlightStatusLogLive; status_log.py rolls finished months out
+# into FlightStatusLog_YYYYMM tables and archives cold ones to compressed files. FlightStatusLog itself becomes a
+# UNION ALL view over Live and every partition still in the database, so existing queries keep working
+STATUS_LOG_LIVE = "FlightStatusLogLive"
+STATUS_LOG_COLUMNS = "LogID, FlightNumber, Status, Timestamp, Reason"
+
+
+def status_log_partition_ddl(table): # Same shape as the original log. LogIDs are carried over from Live, so no AUTOINCREMENT here
+    return (f"CREATE TABLE IF NOT EXISTS {table} (LogID INTEGER PRIMARY KEY, FlightNumber TEXT, Status TEXT, Timestamp TEXT, Reason TEXT, "
+            f"{epoch_column_ddl('Timestamp', 'TimestampEpoch')}, FOREIGN KEY (FlightNumber) REFERENCES Flights(FlightNumber))",
+            f"CREATE INDEX IF NOT EXISTS idx_{table.lower()}_flight_time ON {table} (FlightNumber, Timestamp)")
+
+
+def has_column(cursor, table, column):
+    return any(row[1] == column for row in cursor.execute(f"PRAGMA table_xinfo({table})")) # xinfo also lists generated columns
+
+
+def rebuild_status_log_view(cursor): # Recreate the FlightStatusLog view (and its insert trigger) over Live plus the partitions in LogPartitions
+    tables = [STATUS_LOG_LIVE] + [name for (name,) in cursor.execute("SELECT TableName FROM LogPartitions WHERE ArchivePath IS NULL ORDER BY PeriodStart")]
+    cursor.execute("DROP VIEW IF EXISTS FlightStatusLog")
+    columns = STATUS_LOG_COLUMNS + (", TimestampEpoch" if has_column(cursor, STATUS_LOG_LIVE, "TimestampEpoch") else "") # From migration 10 on
+    cursor.execute("CREATE VIEW FlightStatusLog AS " + " UNION ALL ".join(f"SELECT {columns} FROM {table}" for table in tables))
+    cursor.execute(f"CREATE TRIGGER trg_flightstatuslog_insert INSTEAD OF INSERT ON FlightStatusLog BEGIN "
+                   f"INSERT INTO {STATUS_LOG_LIVE} ({STATUS_LOG_COLUMNS}) VALUES (NEW.LogID, NEW.FlightNumber, NEW.Status, NEW.Timestamp, NEW.Reason); END")
+
+
+@migration(5)
+def partition_flight_status_log(cursor): # The log table becomes the Live partition, everything already in it stays there until the first roll
+    cursor.execute(f"ALTER TABLE FlightStatusLog RENAME TO {STATUS_LOG_LIVE}")
+    cursor.execute("DROP INDEX IF EXISTS idx_flightstatuslog_flight_time")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{STATUS_LOG_LIVE.lower()}_flight_time ON {STATUS_LOG_LIVE} (FlightNumber, Timestamp)")
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS LogPartitions (
+                   TableName TEXT PRIMARY KEY,
+                   PeriodStart TEXT NOT NULL,
+                   PeriodEnd TEXT NOT NULL,
+                   RowCount INTEGER NOT NULL DEFAULT 0,
+                   ArchivePath TEXT,
+                   ArchivedAt TEXT
+                   )
+                   """)
+    rebuild_status_log_view(cursor)
+
+
+# Change data capture: triggers append one ChangeLog row per inserted, updated or deleted row of these tables, with the
+# columns an UPDATE actually changed. change_feed.py reads it through per-consumer cursors
+CHANGE_CAPTURE_TABLES = {
+    "Flights": ("FlightNumber", ("DepartureDateTime", "ArrivalDateTime", "Status", "DestinationID", "PilotID", "AircraftID")),
+    "Bookings": ("BookingID", ("PassengerID", "FlightNumber", "BookingDate", "SeatNumber", "Class", "BookingStatus")),
+    "Destinations": ("DestinationID", ("City", "Country", "AirportCode")),
+}
+CHANGE_TIME = "strftime('%Y-%m-%d %H:%M:%S', 'now')"
+
+
+def create_change_triggers(cursor): # Separate from the migration so bulk loads can drop and restore them around an initial load
+    for table, (key, columns) in CHANGE_CAPTURE_TABLES.items():
+        name = table.lower()
+        insert = f"INSERT INTO ChangeLog (TableName, RowKey, Operation, ChangedColumns, ChangedAt) VALUES ('{table}', {{row}}.{key}, '{{operation}}', {{columns}}, {CHANGE_TIME});"
+        changed = " || ".join(f"CASE WHEN OLD.{column} IS NOT NEW.{column} THEN '{column},' ELSE '' END" for column in (key,) + columns)
+
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{name}_changes_insert AFTER INSERT ON {table} BEGIN "
+                       + insert.format(row="NEW", operation="INSERT", columns="NULL") + " END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{name}_changes_delete AFTER DELETE ON {table} BEGIN "
+                       + insert.format(row="OLD", operation="DELETE", columns="NULL") + " END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{name}_changes_update AFTER UPDATE ON {table} "
+                       f"WHEN {' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in (key,) + columns)} BEGIN " # No-op updates are not changes
+                       + insert.format(row="NEW", operation="UPDATE", columns=f"rtrim({changed}, ',')") + " END")
+
+
+def drop_change_triggers(cursor):
+    for table in CHANGE_CAPTURE_TABLES:
+        for operation in ("insert", "delete", "update"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table.lower()}_changes_{operation}")
+
+
+@migration(6)
+def create_change_log(cursor): # Seq is AUTOINCREMENT so it never goes backwards, even after the oldest changes are truncated
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS ChangeLog (
+                   Seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                   TableName TEXT NOT NULL,
+                   RowKey TEXT NOT NULL,
+                   Operation TEXT NOT NULL,
+                   ChangedColumns TEXT,
+                   ChangedAt TEXT NOT NULL
+                   )
+                   """)
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS ChangeConsumers (
+                   Consumer TEXT PRIMARY KEY,
+                   LastSeq INTEGER NOT NULL,
+                   UpdatedAt TEXT
+                   )
+                   """)
+    cursor.execute("CREATE TABLE IF NOT EXISTS ChangeLogState (Id INTEGER PRIMARY KEY CHECK (Id = 1), TruncatedThrough INTEGER NOT NULL)")
+    cursor.execute("INSERT OR IGNORE INTO ChangeLogState (Id, TruncatedThrough) VALUES (1, 0)")
+    create_change_triggers(cursor)
+
+
+@migration(7)
+def create_booking_seat_index(cursor): # Covers the seat inventory's load and its "seat still free?" check; FlightNumber lookups use its prefix
+    cursor.execute("DROP INDEX IF EXISTS idx_bookings_flight")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bookings_flight_seat ON Bookings (FlightNumber, SeatNumber, BookingStatus)")
+
+
+# Full-text index over Passengers for lookups by partial name, email or passport (passenger_search.py). It is an
+# external content table: the text is only stored in Passengers, PassengerSearch holds the index and is kept in step
+# by triggers. rowid is the PassengerID.
+#
+# An email address is indexed as one token with EMAIL_TOKEN_PREFIX in front ("mailto:mary.smith84@example.com"),
+# rather than split into words. Split up, every address adds a near-unique token starting with a first or last name,
+# and a prefix search for that name has to merge all of them; kept whole and marked, names and addresses never mix
+PASSENGER_SEARCH_COLUMNS = ("FirstName", "LastName", "Email", "PassportNumber")
+PASSENGER_SEARCH_WEIGHTS = (2.0, 2.0, 1.0, 5.0) # bm25 weight per column, a passport hit is as good as it gets
+EMAIL_TOKEN_PREFIX = "mailto:"
+
+
+def passenger_search_values(row): # SQL for the indexed value of each column, row being NEW, OLD or Passengers itself
+    return [f"'{EMAIL_TOKEN_PREFIX}' || {row}.{column}" if column == "Email" else f"{row}.{column}" for column in PASSENGER_SEARCH_COLUMNS]
+
+
+def create_passenger_search_triggers(cursor): # Separate from the migration so bulk loads can drop them and rebuild the index once
+    columns = ", ".join(PASSENGER_SEARCH_COLUMNS)
+    insert = f"INSERT INTO PassengerSearch (rowid, {columns}) VALUES (NEW.PassengerID, {', '.join(passenger_search_values('NEW'))});"
+    delete = f"INSERT INTO PassengerSearch (PassengerSearch, rowid, {columns}) VALUES ('delete', OLD.PassengerID, {', '.join(passenger_search_values('OLD'))});"
+
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_passengers_search_insert AFTER INSERT ON Passengers BEGIN {insert} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_passengers_search_delete AFTER DELETE ON Passengers BEGIN {delete} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_passengers_search_update AFTER UPDATE OF PassengerID, {columns} ON Passengers BEGIN {delete} {insert} END")
+
+
+def drop_passenger_search_triggers(cursor):
+    for operation in ("insert", "delete", "update"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_passengers_search_{operation}")
+
+
+def rebuild_passenger_search(cursor): # Reindex every passenger from the content view
+    cursor.execute("INSERT INTO PassengerSearch (PassengerSearch) VALUES ('rebuild')")
+
+
+@migration(8)
+def create_passenger_search(cursor):
+    # The content "table" is a view giving the values exactly as indexed, which 'rebuild' and 'delete' rely on.
+    # Prefix indexes up to six characters make a partly typed name one doclist rather than a merge of every word it starts
+    values = [f"{value} AS {column}" for value, column in zip(passenger_search_values("Passengers"), PASSENGER_SEARCH_COLUMNS)]
+    cursor.execute(f"CREATE VIEW IF NOT EXISTS PassengerSearchContent AS SELECT PassengerID, {', '.join(values)} FROM Passengers")
+    cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS PassengerSearch USING fts5({', '.join(PASSENGER_SEARCH_COLUMNS)}, "
+                   f"content='PassengerSearchContent', content_rowid='PassengerID', "
+                   f"tokenize=\"unicode61 remove_diacritics 2 tokenchars '.@_+:'\", prefix='2 3 4 5 6')")
+    cursor.execute(f"INSERT INTO PassengerSearch (PassengerSearch, rank) VALUES ('rank', 'bm25({', '.join(map(str, PASSENGER_SEARCH_WEIGHTS))})')")
+    create_passenger_search_triggers(cursor)
+    rebuild_passenger_search(cursor)
+
+
+# Bag count and weight per booking and per flight for weight-and-balance, kept up to date by triggers on Baggage and
+# Bookings like the flight count summaries (migration 3), so a flight's load is one row instead of a Baggage ->
+# Bookings join. Tag scans land in BaggageScans (baggage.py), the latest checkpoint is kept on the bag itself
+BAGGAGE_TOTALS = (("BookingBaggageTotals", "BookingID", "INTEGER"), ("FlightBaggageTotals", "FlightNumber", "TEXT"))
+
+
+def baggage_delta(row, sign): # Trigger statements adding (sign +) or removing (sign -) row's bag from its booking's and flight's totals
+    upsert = "ON CONFLICT ({key}) DO UPDATE SET BagCount = BagCount + excluded.BagCount, TotalWeight = TotalWeight + excluded.TotalWeight;"
+    return (f"INSERT INTO BookingBaggageTotals (BookingID, BagCount, TotalWeight) "
+            f"SELECT {row}.BookingID, {sign}1, {sign}coalesce({row}.Weight, 0) WHERE {row}.BookingID IS NOT NULL "
+            + upsert.format(key="BookingID") +
+            f" INSERT INTO FlightBaggageTotals (FlightNumber, BagCount, TotalWeight) "
+            f"SELECT FlightNumber, {sign}1, {sign}coalesce({row}.Weight, 0) FROM Bookings WHERE BookingID = {row}.BookingID AND FlightNumber IS NOT NULL "
+            + upsert.format(key="FlightNumber"))
+
+
+def create_baggage_total_triggers(cursor): # Separate from the migration so bulk loads can drop them and rebuild the totals once
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_baggage_totals_insert AFTER INSERT ON Baggage BEGIN {baggage_delta('NEW', '+')} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_baggage_totals_delete AFTER DELETE ON Baggage BEGIN {baggage_delta('OLD', '-')} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS trg_baggage_totals_update AFTER UPDATE OF BookingID, Weight ON Baggage "
+                   f"WHEN OLD.BookingID IS NOT NEW.BookingID OR OLD.Weight IS NOT NEW.Weight BEGIN "
+                   f"{baggage_delta('OLD', '-')} {baggage_delta('NEW', '+')} END")
+
+    # A booking moved to another flight takes its bags' totals with it
+    cursor.execute("CREATE TRIGGER IF NOT EXISTS trg_bookings_baggage_move AFTER UPDATE OF FlightNumber ON Bookings "
+                   "WHEN OLD.FlightNumber IS NOT NEW.FlightNumber BEGIN "
+                   "UPDATE FlightBaggageTotals SET BagCount = FlightBaggageTotals.BagCount - t.BagCount, TotalWeight = FlightBaggageTotals.TotalWeight - t.TotalWeight "
+                   "FROM BookingBaggageTotals t WHERE t.BookingID = NEW.BookingID AND FlightBaggageTotals.FlightNumber = OLD.FlightNumber; "
+                   "INSERT INTO FlightBaggageTotals (FlightNumber, BagCount, TotalWeight) "
+                   "SELECT NEW.FlightNumber, BagCount, TotalWeight FROM BookingBaggageTotals WHERE BookingID = NEW.BookingID AND NEW.FlightNumber IS NOT NULL "
+                   "ON CONFLICT (FlightNumber) DO UPDATE SET BagCount = BagCount + excluded.BagCount, TotalWeight = TotalWeight + excluded.TotalWeight; END")
+
+
+def drop_baggage_total_triggers(cursor):
+    for name in ("baggage_totals_insert", "baggage_totals_delete", "baggage_totals_update", "bookings_baggage_move"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_{name}")
+
+
+def rebuild_baggage_totals(cursor): # Recompute both totals tables from Baggage in one pass each
+    cursor.execute("DELETE FROM BookingBaggageTotals")
+    cursor.execute("INSERT INTO BookingBaggageTotals (BookingID, BagCount, TotalWeight) "
+                   "SELECT BookingID, COUNT(*), coalesce(SUM(Weight), 0) FROM Baggage WHERE BookingID IS NOT NULL GROUP BY BookingID")
+    cursor.execute("DELETE FROM FlightBaggageTotals")
+    cursor.execute("INSERT INTO FlightBaggageTotals (FlightNumber, BagCount, TotalWeight) "
+                   "SELECT b.FlightNumber, SUM(t.BagCount), SUM(t.TotalWeight) FROM BookingBaggageTotals t JOIN Bookings b ON b.BookingID = t.BookingID "
+                   "WHERE b.FlightNumber IS NOT NULL GROUP BY b.FlightNumber")
+
+
+@migration(9)
+def create_baggage_tracking(cursor):
+    cursor.execute("ALTER TABLE Baggage ADD COLUMN LastCheckpoint TEXT")
+    cursor.execute("ALTER TABLE Baggage ADD COLUMN LastScannedAt TEXT")
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS BaggageScans (
+                   ScanID INTEGER PRIMARY KEY AUTOINCREMENT,
+                   TagNumber TEXT NOT NULL,
+                   Checkpoint TEXT NOT NULL,
+                   ScannedAt TEXT NOT NULL,
+                   Location TEXT
+                   )
+                   """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_baggagescans_tag_time ON BaggageScans (TagNumber, ScannedAt)")
+    for table, key, key_type in BAGGAGE_TOTALS:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({key} {key_type} PRIMARY KEY, BagCount INTEGER NOT NULL DEFAULT 0, TotalWeight REAL NOT NULL DEFAULT 0)")
+    create_baggage_total_triggers(cursor)
+    rebuild_baggage_totals(cursor)
+
+
+# Integer epoch twins of the stored timestamps and dates. Each is a VIRTUAL generated column, so it can never drift from
+# its text and adds nothing to the row; indexed, the index holds the integer, so range scans compare integers and the
+# index entries are a varint instead of 10-19 bytes of text. Date-window searches and duration maths use these columns.
+# The text stays the stored value everything else reads. Writes are checked by BEFORE triggers: a value must already be
+# in the canonical format and a real date (strftime of it gives it back unchanged), anything else aborts the statement,
+# so a new non-NULL text always has a non-NULL epoch
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+DATE_FORMAT = "%Y-%m-%d"
+FORMAT_NAMES = {DATETIME_FORMAT: "YYYY-MM-DD HH:MM:SS", DATE_FORMAT: "YYYY-MM-DD"}
+EPOCH_COLUMNS = ( # (table, text column, epoch column, canonical format)
+    ("Flights", "DepartureDateTime", "DepartureEpoch", DATETIME_FORMAT),
+    ("Flights", "ArrivalDateTime", "ArrivalEpoch", DATETIME_FORMAT),
+    ("Bookings", "BookingDate", "BookingEpoch", DATE_FORMAT),
+    ("Aircrafts", "LastMaintenanceDate", "LastMaintenanceEpoch", DATE_FORMAT),
+    (STATUS_LOG_LIVE, "Timestamp", "TimestampEpoch", DATETIME_FORMAT),
+)
+
+
+def epoch(column): # SQL expression turning a stored timestamp or date into epoch seconds, NULL when missing or unparseable
+    return f"CAST(strftime('%s', {column}) AS INTEGER)"
+
+
+def to_epoch(value): # The same in Python, for parameters compared against the epoch columns. A date means its midnight
+    for fmt in (DATETIME_FORMAT, DATE_FORMAT):
+        try:
+            return calendar.timegm(time.strptime(value, fmt))
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def epoch_column_ddl(column, epoch_column):
+    return f"{epoch_column} INTEGER GENERATED ALWAYS AS ({epoch(column)}) VIRTUAL"
+
+
+def create_timestamp_check_triggers(cursor): # Separate from the migration so bulk loads of generated rows can skip the checks
+    for table, column, _, fmt in EPOCH_COLUMNS:
+        name = f"trg_{table.lower()}_{column.lower()}_check"
+        bad = f"NEW.{column} IS NOT strftime('{fmt}', NEW.{column}, '+0 days')" # The no-op modifier makes SQLite normalise 02-30 to 03-02
+        fail = f"SELECT RAISE(ABORT, '{column} must be {FORMAT_NAMES[fmt]}');"
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name}_insert BEFORE INSERT ON {table} WHEN {bad} BEGIN {fail} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name}_update BEFORE UPDATE OF {column} ON {table} " # Unchanged old rows are let through
+                       f"WHEN NEW.{column} IS NOT OLD.{column} AND {bad} BEGIN {fail} END")
+
+
+def drop_timestamp_check_triggers(cursor):
+    for table, column, _, _ in EPOCH_COLUMNS:
+        for operation in ("insert", "update"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_{table.lower()}_{column.lower()}_check_{operation}")
+
+
+@migration(10)
+def create_epoch_columns(cursor):
+    for table, column, epoch_column, _ in EPOCH_COLUMNS:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {epoch_column_ddl(column, epoch_column)}")
+    for (table,) in cursor.execute("SELECT TableName FROM LogPartitions WHERE ArchivePath IS NULL").fetchall(): # New partitions get it from status_log_partition_ddl
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {epoch_column_ddl('Timestamp', 'TimestampEpoch')}")
+    rebuild_status_log_view(cursor)
+
+    # The departure indexes (migrations 2 and 4) move to the integer; the pilot schedule index keeps the text it covers
+    cursor.execute("DROP INDEX IF EXISTS idx_flights_departure_number")
+    cursor.execute("DROP INDEX IF EXISTS idx_flights_status_departure_number")
+    cursor.execute("DROP INDEX IF EXISTS idx_flights_destination_status_departure")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_flights_departure_epoch_number ON Flights (DepartureEpoch, FlightNumber)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_flights_status_departure_epoch_number ON Flights (Status, DepartureEpoch, FlightNumber)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_flights_destination_status_departure_epoch ON Flights (DestinationID, Status, DepartureEpoch)")
+    create_timestamp_check_triggers(cursor)
+
+
+def seed_data(cursor): # Populating the Tables created above, only ever run against an empty database
+    cursor.execute('''
+                  INSERT INTO Destinations (City, Country, AirportCode) VALUES
+                   ('New York','USA','JFK'),
+                   ('London','UK','LHR'),
+                   ('Tokyo', 'Japan', 'HND'),
+                   ('Paris', 'France', 'CDG'),
+                   ('Sydney', 'Australia', 'SYD'),
+                   ('Moscow', 'Russia', 'SVO'),
+                   ('Rome', 'Italy', 'FCO'),
+                   ('Madrid', 'Spain', 'MAD'),
+                   ('Seoul', 'South Korea', 'ICN'),
+                   ('Bangkok', 'Thailand', 'BKK')
+                   ''')
+
+    cursor.execute('''
+                  INSERT INTO Pilots (FirstName, LastName, LicenseNumber, ContactNumber) VALUES
+                  ('John', 'Doe', '12345', '555-1234'),
+                  ('Jane', 'Smith', '67890', '555-5678'),
+                  ('Alice', 'Johnson', '13579', '555-9012'),
+                  ('Michael', 'Jackson', '24680', '555-3456'),
+                  ('Emily', 'Davis', '98765', '555-7890'),
+                  ('David', 'Wilson', '54321', '555-2345'),
+                  ('Sarah', 'Garcia', '11223', '555-6789'),
+                  ('Robert', 'Rodriguez', '44556', '555-0123'),
+                  ('Linda', 'Martinez', '77889', '555-4567'),
+                  ('Christopher', 'Anderson', '99001', '555-8901')  
+                   ''')
+
+    cursor.execute('''
+                  INSERT INTO Aircrafts (Model, Manufacturer, Capacity, RegistrationNumber, LastMaintenanceDate) VALUES
+                  ('737', 'Boeing', 180, 'N737AA', '2024-10-26'),
+                  ('A320', 'Airbus', 150, 'A320BB', '2024-11-01'),
+                  ('777', 'Boeing', 350, 'N777CC', '2024-10-15'),
+                  ('A330', 'Airbus', 300, 'A330DD', '2024-11-10'),
+                  ('787', 'Boeing', 250, 'N787EE', '2024-10-20'),
+                  ('A350', 'Airbus', 320, 'A350FF', '2024-11-05'),
+                  ('190', 'Embraer', 100, 'E190GG', '2024-10-30'),
+                  ('767', 'Boeing', 280, 'N767II', '2024-10-22'),
+                  ('A321', 'Airbus', 200, 'A321JJ', '2024-11-08'),
+                  ('747', 'Boeing', 400, 'N747KK', '2024-10-18')   
+                   ''')
+
+    cursor.execute('''
+                   INSERT INTO Flights (FlightNumber, DepartureDateTime, ArrivalDateTime, Status, DestinationID, PilotID, AircraftID) VALUES
+                   ('FL101', '2024-12-01 08:00:00', '2024-12-01 12:00:00', 'Scheduled', 1, 1, 1),
+                   ('FL102', '2024-12-02 14:00:00', '2024-12-02 18:00:00', 'Departed', 2, 2, 2),
+                   ('FL103', '2024-12-03 09:30:00', '2024-12-03 13:30:00', 'Arrived', 3, 3, 3),
+                   ('FL104', '2024-12-04 15:15:00', '2024-12-04 19:15:00', 'Scheduled', 4, 4, 3),
+                   ('FL105', '2024-12-05 11:00:00', '2024-12-05 15:00:00', 'Cancelled', 5, 5, 3),
+                   ('FL106', '2024-12-06 16:45:00', '2024-12-06 20:45:00', 'Departed', 1, 6, 6),
+                   ('FL107', '2024-12-07 10:30:00', '2024-12-07 14:30:00', 'Arrived', 2, 7, 6),
+                   ('FL108', '2024-12-08 17:00:00', '2024-12-08 21:00:00', 'Scheduled', 3, 8, 8),
+                   ('FL109', '2024-12-09 12:15:00', '2024-12-09 16:15:00', 'Cancelled', 4, 9, 9),
+                   ('FL110', '2024-12-10 18:30:00', '2024-12-10 22:30:00', 'Departed', 5, 10, 10)
+                   ''')
+
+    cursor.execute('''
+                   INSERT INTO Passengers (FirstName, LastName, DateOfBirth, PassportNumber, ContactNumber, Email, Nationality) VALUES
+                   ('Alice', 'Smith', '1990-05-15', 'PA123456', '555-1111', 'alice.smith@gmail.com', 'USA'),
+                   ('Bob', 'Johnson', '1985-10-20', 'PB789012', '555-2222', 'bob.johnson@gmail.com', 'Canada'),
+                   ('Carol', 'Williams', '1992-03-08', 'PC345678', '555-3333', 'carol.williams@gmail.com', 'UK'),
+                   ('David', 'Brown', '1988-12-01', 'PD901234', '555-4444', 'david.brown@gmail.com', 'Australia'),
+                   ('Eve', 'Jones', '1995-07-25', 'PE567890', '555-5555', 'eve.jones@gmail.com', 'Japan'),
+                   ('Frank', 'Miller', '1983-09-10', 'PF123789', '555-6666', 'frank.miller@gmail.com', 'France'),
+                   ('Grace', 'Davis', '1998-02-18', 'PG456012', '555-7777', 'grace.davis@gmail.com', 'Russia'),
+                   ('Henry', 'Garcia', '1987-06-03', 'PH789345', '555-8888', 'henry.garcia@gmail.com', 'Italy'),
+                   ('Ivy', 'Rodriguez', '1991-11-28', 'PI012678', '555-9999', 'ivy.rodriguez@gmail.com', 'Spain'),
+                   ('Jack', 'Martinez', '1989-04-12', 'PJ345901', '555-0000', 'jack.martinez@gmail.com', 'South Korea')
+                   ''')
+
+    cursor.execute('''
+                   INSERT INTO Bookings (PassengerID, FlightNumber, BookingDate, SeatNumber, Class, BookingStatus) VALUES
+                   (1, 'FL101', '2024-11-20', '1A', 'Business', 'Confirmed'),
+                   (2, 'FL102', '2024-11-21', '5B', 'Economy', 'Confirmed'),
+                   (3, 'FL103', '2024-11-22', '10C', 'Economy', 'Pending'),
+                   (4, 'FL104', '2024-11-23', '2D', 'Business', 'Confirmed'),
+                   (5, 'FL105', '2024-11-24', '15E', 'Economy', 'Cancelled'),
+                   (6, 'FL106', '2024-11-25', '3A', 'Business', 'Confirmed'),
+                   (7, 'FL107', '2024-11-26', '8B', 'Economy', 'Confirmed'),
+                   (8, 'FL108', '2024-11-27', '12C', 'Economy', 'Pending'),
+                   (9, 'FL109', '2024-11-28', '4D', 'Business', 'Cancelled'),
+                   (10, 'FL110', '2024-11-29', '18E', 'Economy', 'Confirmed')
+                   ''')
+
+    cursor.execute('''
+                   INSERT INTO Baggage (BookingID, Weight, TagNumber, Description) VALUES
+                   (1, 25.5, 'BG1001', 'Large suitcase'),
+                   (2, 15.0, 'BG1002', 'Carry-on bag'),
+                   (3, 30.2, 'BG1003', 'Oversized luggage'),
+                   (4, 20.8, 'BG1004', 'Medium suitcase'),
+                   (5, 10.5, 'BG1005', 'Small bag'),
+                   (6, 22.3, 'BG1006', 'Suitcase with documents'),
+                   (7, 18.7, 'BG1007', 'Sports equipment'),
+                   (8, 28.1, 'BG1008', 'Heavy luggage'),
+                   (9, 12.9, 'BG1009', 'Personal items'),
+                   (10, 26.4, 'BG1010', 'Travel bag')
+                   ''')
+
+    cursor.execute('''
+                   INSERT INTO FlightStatusLog (FlightNumber, Status, Timestamp, Reason) VALUES
+                   ('FL101', 'Scheduled', '2024-12-01 08:00:00', 'Flight scheduled'),
+                   ('FL101', 'Departed', '2024-12-01 12:00:00', 'Flight departed on time'),
+                   ('FL102', 'Scheduled', '2024-12-02 14:00:00', 'Flight scheduled'),
+                   ('FL102', 'Departed', '2024-12-02 18:00:00', 'Flight departed on time'),
+                   ('FL103', 'Scheduled', '2024-12-03 09:30:00', 'Flight scheduled'),
+                   ('FL103', 'Arrived', '2024-12-03 13:30:00', 'Flight arrived on time'),
+                   ('FL104', 'Scheduled', '2024-12-04 15:15:00', 'Flight scheduled'),
+                   ('FL104', 'Scheduled', '2024-12-04 19:15:00', 'Flight scheduled'),
+                   ('FL105', 'Scheduled', '2024-12-05 11:00:00', 'Flight scheduled'),
+                   ('FL105', 'Cancelled', '2024-12-05 15:00:00', 'Adverse weather conditions')
+                   ''')
+
+
+def latest_version(): # Version number a fully migrated database will report
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(conn): # Version recorded in the database file, 0 for a brand new (or pre-versioning) file
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(path=None): # Apply every migration newer than the database's user_version, each in its own transaction. Returns the versions applied
+    applied = []
+
+    with connection.writer(path) as conn:
+        version = current_version(conn)
+
+        for target, step in MIGRATIONS:
+            if target <= version:
+                continue
+
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE") # DDL does not open a transaction implicitly, so do it by hand to keep each step atomic
+            try:
+                if current_version(conn) >= target: # Another process got here first while we waited for the lock
+                    conn.rollback()
+                    continue
+
+                step(cursor)
+                cursor.execute(f"PRAGMA user_version = {int(target)}") # user_version is transactional, it only moves if the step commits
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+
+            applied.append(target)
+
+    return applied
+
+
+def is_empty(conn): # True when no reference data has been loaded yet
+    for table in ("Destinations", "Pilots", "Aircrafts", "Flights"):
+        if conn.execute(f"SELECT EXISTS (SELECT 1 FROM {table})").fetchone()[0]:
+            return False
+    return True
+
+
+def seed_if_empty(path=None): # Load the seed data into an empty database. Returns True if anything was inserted
+    with connection.writer(path) as conn:
+        if not is_empty(conn):
+            return False
+
+        seed_data(conn.cursor())
+        conn.commit()
+        return True
+
+
+def bootstrap(path=None): # Bring the database up to date on startup. A warm start only reads user_version and the empty check
+    applied = migrate(path)
+    seeded = seed_if_empty(path)
+    return applied, seeded
@@ -0,0 +1,241 @@
+import argparse
+import collections
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import connection
+import migrations
+
+# Parallel Stats Mode. Each report is a partial aggregate that can run over any piece of a table, a merge that adds the
+# pieces' sums by key and a finish step that turns the merged totals into the report rows. Big tables are cut into
+# pieces (row ranges of Flights, or departure time ranges) and every piece of every report is queued on one process
+# pool, each worker with its own read-only connection, so a run takes about as long as its slowest piece rather than
+# the sum of the queries. The finish steps only read the small reference tables, in this process.
+#
+# Adding a report is one REPORTS entry: its columns, the partial SQL with a {piece} filter and the sums it returns
+# after the group key, how to split it, and a finish(conn, totals) returning rows. Pieces run on separate connections,
+# so unlike data_access.stats() a report is not read from a single snapshot.
+
+DEFAULT_WORKERS = max(2, os.cpu_count() or 1)
+ON_TIME_MINUTES = 15 # Departed within this long of the scheduled time, same threshold as analytics.DELAYED_AFTER_MINUTES
+
+# How a report's scan is cut up: (table, alias in the partial SQL, integer column), into equal ranges of that column.
+# rowid pieces are ranges of the table's b-tree, which follows FlightNumber order for generated data, and read it
+# sequentially; a text FlightNumber range would go through the primary key index and look up every row. Departure
+# pieces are equal slices of time on the DepartureEpoch index (migration 10).
+FLIGHT_ROWS = ("Flights", "f", "rowid")
+FLIGHT_DEPARTURES = ("Flights", "f", "DepartureEpoch")
+
+
+def by_count(rows): # Largest count (last column) first, ties in key order, like the ORDER BY ... DESC of the serial reports
+    return sorted(rows, key=lambda row: -row[-1])
+
+
+def finish_destinations(conn, totals):
+    per_city = collections.Counter()
+    for destination_id, city in conn.execute("SELECT DestinationID, City FROM Destinations"):
+        if destination_id in totals:
+            per_city[city] += totals[destination_id][0]
+    return by_count(sorted(per_city.items(), key=lambda item: str(item[0])))
+
+
+def finish_pilots(conn, totals): # LEFT JOIN semantics: every pilot, with 0 when they fly nothing
+    return by_count([(first, last, totals.get(pilot_id, (0,))[0]) for pilot_id, first, last in conn.execute("SELECT PilotID, FirstName, LastName FROM Pilots ORDER BY PilotID")])
+
+
+def finish_aircraft(conn, totals):
+    return by_count([(model, manufacturer, totals.get(aircraft_id, (0,))[0]) for aircraft_id, model, manufacturer in conn.execute("SELECT AircraftID, Model, Manufacturer FROM Aircrafts ORDER BY AircraftID")])
+
+
+def finish_load_factors(conn, totals): # Booked seats over seats flown, per destination, highest first
+    rows = []
+    for destination_id, code, city in conn.execute("SELECT DestinationID, AirportCode, City FROM Destinations ORDER BY DestinationID"):
+        if destination_id in totals:
+            flights, booked, seats = totals[destination_id]
+            rows.append((code, city, flights, booked, seats, round(100.0 * booked / seats, 1)))
+    return by_count(rows)
+
+
+def finish_on_time(conn, totals): # Share of departed flights that left within ON_TIME_MINUTES, per destination, best first
+    rows = []
+    for destination_id, code, city in conn.execute("SELECT DestinationID, AirportCode, City FROM Destinations ORDER BY DestinationID"):
+        departed, on_time = totals.get(destination_id, (0, 0))
+        if departed:
+            rows.append((code, city, departed, on_time, round(100.0 * on_time / departed, 1)))
+    return by_count(rows)
+
+
+REPORTS = {
+    "flights_per_destination": {
+        "columns": ("City", "NumberOfFlights"),
+        "partial": "SELECT f.DestinationID, COUNT(f.FlightNumber) FROM Flights f WHERE {piece} AND f.DestinationID IS NOT NULL GROUP BY f.DestinationID",
+        "split": FLIGHT_ROWS,
+        "finish": finish_destinations,
+    },
+    "flights_per_pilot": {
+        "columns": ("FirstName", "LastName", "NumberOfFlights"),
+        "partial": "SELECT f.PilotID, COUNT(f.FlightNumber) FROM Flights f WHERE {piece} AND f.PilotID IS NOT NULL GROUP BY f.PilotID",
+        "split": FLIGHT_ROWS,
+        "finish": finish_pilots,
+    },
+    "aircraft_usage": {
+        "columns": ("Model", "Manufacturer", "UsageCount"),
+        "partial": "SELECT f.AircraftID, COUNT(f.AircraftID) FROM Flights f WHERE {piece} AND f.AircraftID IS NOT NULL GROUP BY f.AircraftID",
+        "split": FLIGHT_ROWS,
+        "finish": finish_aircraft,
+    },
+    "load_factor_per_route": {
+        "columns": ("AirportCode", "City", "Flights", "SeatsBooked", "Seats", "LoadFactorPercent"),
+        "partial": """
+            SELECT f.DestinationID, COUNT(*),
+                   SUM((SELECT COUNT(*) FROM Bookings b WHERE b.FlightNumber = f.FlightNumber AND b.BookingStatus IS NOT 'Cancelled')),
+                   SUM(a.Capacity)
+            FROM Flights f
+            JOIN Aircrafts a ON a.AircraftID = f.AircraftID
+            WHERE {piece} AND f.DestinationID IS NOT NULL AND a.Capacity > 0
+            GROUP BY f.DestinationID
+        """,
+        "split": FLIGHT_ROWS,
+        "finish": finish_load_factors,
+    },
+    "on_time_percentage": {
+        "columns": ("AirportCode", "City", "Departed", "OnTime", "OnTimePercent"),
+        # Each flight's first Departed event. ORDER BY ... LIMIT 1 rather than MIN(): SQLite pushes it into every partition
+        # of the FlightStatusLog view as an index probe, where MIN() materialises the whole view once per flight. It reads the
+        # text Timestamp, converted once per flight out here: selecting TimestampEpoch through the view also stops the push-down
+        "partial": f"""
+            SELECT DestinationID, COUNT(DepartedAt), SUM({migrations.epoch("DepartedAt")} <= DepartureEpoch + {ON_TIME_MINUTES * 60})
+            FROM (
+                SELECT f.DestinationID, f.DepartureEpoch,
+                       (SELECT l.Timestamp FROM FlightStatusLog l WHERE l.FlightNumber = f.FlightNumber AND l.Status = 'Departed' ORDER BY l.Timestamp LIMIT 1) AS DepartedAt
+                FROM Flights f
+                WHERE {{piece}} AND f.DestinationID IS NOT NULL
+            )
+            GROUP BY DestinationID
+        """,
+        "split": FLIGHT_DEPARTURES,
+        "finish": finish_on_time,
+    },
+}
+STATS_MODE_REPORTS = ("flights_per_destination", "flights_per_pilot", "aircraft_usage") # What main.statistic_mode shows
+
+
+def piece_sql(split): # Filter for one piece, bound to its first and last value
+    _, alias, column = split
+    return f"{alias}.{column} BETWEEN ? AND ?"
+
+
+def pieces(conn, split, count): # [(filter SQL, params)] covering the split table, at most count pieces
+    table, _, column = split
+    low, high = conn.execute(f"SELECT MIN({column}), MAX({column}) FROM {table}").fetchone()
+    if low is None:
+        return [("0", ())] # Empty table: one piece that matches nothing
+    size = max(1, -(-(high - low + 1) // count))
+    return [(piece_sql(split), (start, min(high, start + size - 1))) for start in range(low, high + 1, size)]
+
+
+_worker = None # This worker process's read-only connection
+
+
+def open_worker(path):
+    global _worker
+    _worker = connection.ConnectionManager(path).open_connection(read_only=True)
+
+
+def run_piece(sql, params): # Runs in a worker. Returns (rows, seconds)
+    started = time.perf_counter()
+    rows = _worker.execute(sql, params).fetchall()
+    return rows, time.perf_counter() - started
+
+
+class StatsEngine: # Process pool plus the report registry; one per database file, reused across runs
+
+    def __init__(self, path=None, workers=DEFAULT_WORKERS, pieces_per_report=None):
+        self.path = path or connection.db_file
+        self.workers = workers
+        self.pieces_per_report = pieces_per_report or workers
+        # spawn rather than fork: the service calling this has threads (and their locks) a forked child would inherit
+        self._pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"), initializer=open_worker, initargs=(self.path,))
+        self.timings = {} # Report name -> {"pieces", "slowest_piece_seconds", "piece_seconds"} of the last run
+
+    def run(self, names=None): # {report name: rows}, every piece of every report queued on the pool at once
+        names = list(names or REPORTS)
+        unknown = [name for name in names if name not in REPORTS]
+        if unknown:
+            raise ValueError(f"Unknown report {', '.join(unknown)}; choose from {', '.join(REPORTS)}")
+
+        futures = []
+        with connection.reader(self.path) as conn:
+            for name in names:
+                report = REPORTS[name]
+                for piece_sql, params in pieces(conn, report["split"], self.pieces_per_report):
+                    futures.append((name, self._pool.submit(run_piece, report["partial"].format(piece=piece_sql), params)))
+
+        totals = {name: {} for name in names}
+        timings = {name: [] for name in names}
+        for name, future in futures:
+            rows, seconds = future.result()
+            timings[name].append(seconds)
+            merged = totals[name]
+            for key, *values in rows: # SUM over no rows is NULL, counted as 0
+                merged[key] = [(total or 0) + (value or 0) for total, value in zip(merged.get(key, [0] * len(values)), values)]
+
+        self.timings = {name: {"pieces": len(seconds), "slowest_piece_seconds": round(max(seconds), 4), "piece_seconds": round(sum(seconds), 4)}
+                        for name, seconds in timings.items()}
+        with connection.reader(self.path) as conn:
+            return {name: REPORTS[name]["finish"](conn, totals[name]) for name in names}
+
+    def close(self):
+        self._pool.shutdown()
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(path=None, workers=DEFAULT_WORKERS): # One engine (and process pool) per database file, started on first use
+    path = path or connection.db_file
+    with _engines_lock:
+        if path not in _engines:
+            _engines[path] = StatsEngine(path, workers)
+        return _engines[path]
+
+
+def close_all():
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.close()
+        _engines.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Stats Mode reports across a process pool")
+    parser.add_argument("reports", nargs="*", help=f"reports to run (default all): {', '.join(REPORTS)}")
+    parser.add_argument("--db", default=None, help="database file (defaults to airline.db)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--pieces", type=int, default=None, help="pieces each split report is cut into (default one per worker)")
+    parser.add_argument("--limit", type=int, default=10, help="rows shown per report")
+    args = parser.parse_args()
+
+    if args.db:
+        connection.db_file = args.db
+    migrations.bootstrap()
+
+    engine = StatsEngine(workers=args.workers, pieces_per_report=args.pieces)
+    try:
+        started = time.perf_counter()
+        results = engine.run(args.reports)
+        elapsed = time.perf_counter() - started
+    finally:
+        engine.close()
+
+    for name, rows in results.items():
+        timing = engine.timings[name]
+        print(f"\n{name} ({len(rows)} rows, {timing['pieces']} pieces, slowest {timing['slowest_piece_seconds']} s of {timing['piece_seconds']} s)")
+        print(" | ".join(REPORTS[name]["columns"]))
+        for row in rows[:args.limit]:
+            print(" | ".join(str(value) for value in row))
+    print(f"\nAll reports in {elapsed:.3f} s, {sum(timing['piece_seconds'] for timing in engine.timings.values()):.3f} s of queries across {args.workers} workers")
@@ -0,0 +1,90 @@
+import argparse
+import re
+
+import connection
+import migrations
+
+# Passenger lookup by partial name, email or passport number over the PassengerSearch full-text index (migration 8),
+# instead of LIKE '%...%' scans of Passengers. Every word typed becomes a prefix term and all of them must match, so
+# "ali smi" finds Alice Smith, "P0001" a passport starting with it and "alice.smith@" the addresses starting with that
+# (anything with an @ or a dot is matched against whole email addresses, see migrations.EMAIL_TOKEN_PREFIX). Matches come back best first (bm25, weighted by
+# migrations.PASSENGER_SEARCH_WEIGHTS) with each passenger's most recent bookings and their flights, from one statement.
+#
+# Work is bounded whatever is typed: bm25 is only computed for the first RANK_CANDIDATES matches, so a bare "smith"
+# returns the best of those rather than scoring every Smith.
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+DEFAULT_BOOKINGS_PER_PASSENGER = 5
+RANK_CANDIDATES = 500
+TERM_PATTERN = re.compile(r"[\w.@+]+") # Same characters as the index tokenizer, less the marker's colon
+
+PASSENGER_COLUMNS = ("PassengerID", "FirstName", "LastName", "Email", "PassportNumber")
+BOOKING_COLUMNS = ("BookingID", "FlightNumber", "DepartureDateTime", "FlightStatus", "SeatNumber", "Class", "BookingStatus")
+
+# The FTS query is LIMITed before anything is joined, then each match's latest bookings are one index range each
+SEARCH_SQL = f"""
+    WITH Matches AS (
+        SELECT PassengerID, rank FROM (
+            SELECT rowid AS PassengerID, rank FROM PassengerSearch WHERE PassengerSearch MATCH ? LIMIT {RANK_CANDIDATES}
+        ) AS Candidates ORDER BY rank LIMIT ?
+    )
+    SELECT p.PassengerID, p.FirstName, p.LastName, p.Email, p.PassportNumber,
+           b.BookingID, b.FlightNumber, f.DepartureDateTime, f.Status, b.SeatNumber, b.Class, b.BookingStatus
+    FROM Matches m
+    JOIN Passengers p ON p.PassengerID = m.PassengerID
+    LEFT JOIN Bookings b ON b.BookingID IN (
+        SELECT BookingID FROM Bookings WHERE PassengerID = m.PassengerID ORDER BY BookingDate DESC, BookingID DESC LIMIT ?
+    )
+    LEFT JOIN Flights f ON f.FlightNumber = b.FlightNumber
+    ORDER BY m.rank, m.PassengerID, b.BookingDate DESC, b.BookingID DESC
+"""
+
+
+def match_query(text): # "ali smi" -> '"ali"* "smi"*'. Terms are quoted, so nothing typed is read as FTS syntax
+    terms = [term.strip(".") for term in TERM_PATTERN.findall(text or "")]
+    terms = [term for term in terms if term.strip("@+_")] # Stray punctuation on its own matches nothing useful
+    if not terms:
+        raise ValueError("Enter part of a name, email address or passport number")
+    return " ".join(f'"{migrations.EMAIL_TOKEN_PREFIX}{term}"*' if "@" in term or "." in term else f'"{term}"*' for term in terms)
+
+
+def search(text, limit=DEFAULT_LIMIT, bookings_per_passenger=DEFAULT_BOOKINGS_PER_PASSENGER, path=None):
+    # [(passenger row, [booking rows])], best match first. Rows follow PASSENGER_COLUMNS and BOOKING_COLUMNS
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    results = []
+    with connection.reader(path) as conn:
+        for row in conn.execute(SEARCH_SQL, (match_query(text), limit, int(bookings_per_passenger))):
+            passenger, booking = row[:len(PASSENGER_COLUMNS)], row[len(PASSENGER_COLUMNS):]
+            if not results or results[-1][0][0] != passenger[0]:
+                results.append((passenger, []))
+            if booking[0] is not None:
+                results[-1][1].append(booking)
+    return results
+
+
+def rebuild(path=None): # Reindex every passenger, e.g. after rows were written with the triggers dropped
+    with connection.writer(path) as conn:
+        migrations.rebuild_passenger_search(conn.cursor())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find passengers by partial name, email or passport number")
+    parser.add_argument("text", nargs="?", help="words to search for, each matched as a prefix")
+    parser.add_argument("--db", default=None, help="database file (defaults to airline.db)")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    parser.add_argument("--rebuild", action="store_true", help="reindex every passenger first")
+    args = parser.parse_args()
+
+    if args.db:
+        connection.db_file = args.db
+    migrations.bootstrap()
+
+    if args.rebuild:
+        rebuild()
+    if args.text:
+        for passenger, bookings in search(args.text, args.limit):
+            passenger_id, first_name, last_name, email, passport = passenger
+            print(f"{passenger_id} | {first_name} {last_name} | {email} | {passport}")
+            for booking_id, flight_number, departure, flight_status, seat, cabin, booking_status in bookings:
+                print(f"    {booking_id} | {flight_number} {departure} ({flight_status}) | {seat} {cabin} | {booking_status}")
@@ -0,0 +1,61 @@
+import connection
+import reference_cache
+
+# Canonical statement shapes for dynamic SQL. sqlite3 keeps a per-connection cache of prepared statements keyed by the
+# exact SQL text, so every distinct text is a fresh prepare and a fresh plan. The helpers here keep the number of
+# texts small and fixed:
+#
+#   - IN lists are de-duplicated and padded to the next power of four (repeating the last value, which changes
+#     nothing), so 1..512 values need at most six shapes instead of one per length. The values stay real
+#     parameters, so the planner still sees a short list and seeks the index per value
+#   - partial updates use COALESCE(?, column) for every column, so any mix of fields is one statement
+#   - LIMIT is always a parameter
+#
+# statement() records each text in an LRU the same size as the sqlite3 statement cache (connection.STATEMENT_CACHE_SIZE),
+# so stats() shows how well the shapes fit in it.
+
+MAX_IN_VALUES = 512
+
+_shapes = reference_cache.LRUCache(connection.STATEMENT_CACHE_SIZE)
+
+
+def in_arity(count): # Padded length for an IN list of count values: 1, 4, 16, 64, 256 or 512
+    if count > MAX_IN_VALUES:
+        raise ValueError(f"At most {MAX_IN_VALUES} values can be matched at once, got {count}")
+    arity = 1
+    while arity < count:
+        arity *= 4
+    return min(arity, MAX_IN_VALUES)
+
+
+def in_list(column, values): # (predicate, params) for column IN (...) with a padded, fixed arity
+    values = list(dict.fromkeys(values))
+    if not values:
+        raise ValueError(f"No values to match {column} against")
+    arity = in_arity(len(values))
+    return f"{column} IN ({','.join('?' * arity)})", values + [values[-1]] * (arity - len(values))
+
+
+def select(columns, table, predicates=(), order_by=None, limit=False): # SELECT with the predicates ANDed in the order given
+    sql = f"SELECT {columns} FROM {table}"
+    if predicates:
+        sql += " WHERE " + " AND ".join(predicates)
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    if limit:
+        sql += " LIMIT ?"
+    return statement(sql)
+
+
+def partial_update(table, columns, key): # One UPDATE for every combination of fields: a NULL parameter keeps the current value
+    assignments = ",\n        ".join(f"{column} = COALESCE(?, {column})" for column in columns)
+    return f"\n    UPDATE {table} SET\n        {assignments}\n    WHERE {key} = ?\n"
+
+
+def statement(sql): # Record a statement shape as it is used, returns the SQL unchanged
+    _shapes.get(sql, lambda _: True)
+    return sql
+
+
+def stats(): # Shape cache hits/misses; a miss is a statement text sqlite3 will most likely have to prepare again
+    return _shapes.stats()
@@ -0,0 +1,162 @@
+import threading
+from collections import OrderedDict
+
+import connection
+
+# In-process cache of the reference tables (Destinations, Pilots, Aircrafts), keyed by ID with LRU eviction.
+# These rows hardly ever change, so the hot paths (pilot checks on assignment, destination names on schedules)
+# read them from memory. Every write through data_access invalidates the affected entries straight after it commits.
+# The cache is per process: a write made by another process is only seen once the entry is evicted or cleared.
+
+DEFAULT_MAX_ENTRIES = 4096
+
+LOADERS = { # kind -> SQL loading one row by ID
+    "destination": "SELECT DestinationID, City, Country, AirportCode FROM Destinations WHERE DestinationID = ?",
+    "pilot": "SELECT PilotID, FirstName, LastName FROM Pilots WHERE PilotID = ?",
+    "aircraft": "SELECT AircraftID, Model, Manufacturer, Capacity, RegistrationNumber, LastMaintenanceDate FROM Aircrafts WHERE AircraftID = ?",
+}
+ALL_PILOTS_SQL = "SELECT PilotID, FirstName, LastName FROM Pilots"
+
+_MISSING = object()
+
+
+class LRUCache: # Bounded mapping with least-recently-used eviction and hit/miss counters. Thread safe
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        self._generation = 0 # Bumped by every invalidation, so a load that raced with one is not cached
+
+    def get(self, key, load): # Cached value for key, calling load(key) on a miss. None results are not cached
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+            generation = self._generation
+
+        value = load(key) # Loaded outside the lock so one slow query doesn't stall every other lookup
+        if value is not None:
+            self.put(key, value, generation)
+        return value
+
+    def put(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation: # Invalidated while loading, the value may be stale
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+class ReferenceCache: # One LRU per reference table, plus the full pilot list the assignment screen shows
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.caches = {kind: LRUCache(max_entries) for kind in LOADERS}
+        self.caches["pilot_list"] = LRUCache(1)
+
+    def _load(self, kind):
+        def load(key):
+            with connection.fresh_reads(), connection.reader(self.path) as conn: # Cached until invalidated, so never from a stale replica
+                return conn.execute(LOADERS[kind], (key,)).fetchone()
+        return load
+
+    def lookup(self, kind, key): # Row for the given ID, or None if it doesn't exist
+        key = normalise_id(key)
+        return self.caches[kind].get(key, self._load(kind))
+
+    def all_pilots(self):
+        def load(_):
+            with connection.fresh_reads(), connection.reader(self.path) as conn:
+                return tuple(conn.execute(ALL_PILOTS_SQL))
+        return self.caches["pilot_list"].get("all", load)
+
+    def invalidate(self, kind, key=None): # Drop one entry, or the whole table's entries when key is None
+        if key is None:
+            self.caches[kind].clear()
+        else:
+            self.caches[kind].invalidate(normalise_id(key))
+        if kind == "pilot":
+            self.caches["pilot_list"].clear()
+
+    def clear(self):
+        for cache in self.caches.values():
+            cache.clear()
+
+    def stats(self):
+        return {kind: cache.stats() for kind, cache in self.caches.items()}
+
+
+def normalise_id(key): # Menu input arrives as "3", the database returns 3; both must hit the same entry
+    if isinstance(key, str):
+        try:
+            return int(key.strip())
+        except ValueError:
+            return key
+    return key
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(path=None): # One shared cache per database file, like connection.get_manager
+    path = path or connection.db_file
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = ReferenceCache(path)
+        return cache
+
+
+def destination(destination_id, path=None):
+    return get_cache(path).lookup("destination", destination_id)
+
+
+def pilot(pilot_id, path=None):
+    return get_cache(path).lookup("pilot", pilot_id)
+
+
+def aircraft(aircraft_id, path=None):
+    return get_cache(path).lookup("aircraft", aircraft_id)
+
+
+def all_pilots(path=None):
+    return get_cache(path).all_pilots()
+
+
+def invalidate(kind, key=None, path=None): # Called by every write to a reference table, after it commits
+    get_cache(path).invalidate(kind, key)
+
+
+def stats(path=None):
+    return get_cache(path).stats()
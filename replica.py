@@ -0,0 +1,262 @@
+import argparse
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import connection
+import data_access
+import instrumentation
+import migrations
+
+# Read-mostly in-memory replica. The database file is serialized into one image in memory, and connection.reader() hands
+# out connections that each hold a private in-memory copy of that image instead of reading the WAL file, so reads never
+# touch the disk or its page cache. Writes still go to the file through connection.writer().
+#
+# The first version copied the file with the backup API into one cache=shared in-memory database that every reader
+# opened. Shared cache serialises its readers on table locks, which undid the parallel reader pool, and the memdb VFS
+# (one copy without shared cache) is capped at 1 GB. So the file is now serialized once per refresh, a whole-file
+# snapshot in one call like a single-step backup, and each reader deserializes a private copy it shares no locks with.
+#
+# The replica is stale from the first commit it has not seen: writer() commits mark it at once, and commits from other
+# processes show up in PRAGMA data_version, polled every refresh_interval. A background thread refreshes it once it has
+# been stale for half of max_staleness, so a stream of commits costs one serialize per half bound rather than one per
+# poll. Reads are only served from the replica while its lag is within max_staleness; past that they go to the disk
+# pool until the refresh lands. connection.fresh_reads() sets the bound to zero for one block, for cache fills and
+# reading back a write. The lag is exported as the airline_replica_lag_seconds gauge.
+#
+# The cost is memory and copying, and both grow with the file. There is no incremental refresh: every refresh
+# serializes the whole file again, and each reader copies the new image the first time it is used after it. Copies are
+# capped at the disk pool's max_readers; a read that finds them all busy goes to the disk pool instead of making
+# another. Memory is therefore at most (max_readers + 1) times the file, and up to twice that for a moment while a
+# refresh swaps a new generation in and readers on the old one finish. This suits databases that fit in memory several
+# times over and change in bursts. A large file written continuously is better read from the disk pool.
+
+DEFAULT_MAX_STALENESS = 1.0 # Seconds
+DEFAULT_REFRESH_INTERVAL = 0.25 # Seconds between checks for new commits
+
+log = logging.getLogger(__name__)
+
+
+class Generation: # One serialized image of the database and the idle readers holding copies of it
+
+    def __init__(self, image, data_version, max_copies):
+        self.image = image # Freed with the generation, once the refresh has swapped it out and no reader is using it
+        self.data_version = data_version
+        self.loaded_at = time.time()
+        self.max_copies = max_copies
+        self.copies = 0 # Readers opened on this image, each with its own copy
+        self.readers = queue.LifoQueue()
+        self.retired = False
+        self._lock = threading.Lock() # So a reader coming back can't slip into the pool after retire() has emptied it
+
+    def acquire(self): # An idle reader, a new copy while under max_copies, otherwise None
+        try:
+            return self.readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self.copies >= self.max_copies:
+                return None
+            self.copies += 1 # Reserved before copying, so concurrent callers can't overshoot
+        try:
+            conn = sqlite3.connect(":memory:", check_same_thread=False, cached_statements=connection.STATEMENT_CACHE_SIZE,
+                                   factory=instrumentation.connection_factory())
+            conn.deserialize(self.image)
+            conn.execute("PRAGMA query_only = ON")
+        except BaseException:
+            with self._lock:
+                self.copies -= 1
+            raise
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if not self.retired:
+                self.readers.put(conn)
+                return
+        conn.close() # Swapped out while this reader was in use
+
+    def retire(self): # Close what is idle; readers still out are closed as they come back
+        with self._lock:
+            self.retired = True
+            while True:
+                try:
+                    self.readers.get_nowait().close()
+                except queue.Empty:
+                    break
+
+
+class ReplicaManager: # In-memory copy of one database file, kept within max_staleness of it
+
+    def __init__(self, manager, max_staleness=DEFAULT_MAX_STALENESS, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        self.manager = manager # The file's ConnectionManager: all writes, and reads while the replica is too stale
+        self.max_staleness = max_staleness
+        self.refresh_interval = refresh_interval
+        self.refreshes = 0
+        self.refresh_seconds = 0.0
+        self.replica_reads = 0
+        self.disk_reads = 0
+        self._lock = threading.Lock() # Guards the current generation, the lag and the counters
+        self._refresh_lock = threading.Lock() # One refresh at a time, and the only user of the source connection
+        self._stale_since = None # time.monotonic() of the first commit the replica is missing, None while in sync
+        self._current = None
+        self._stopping = threading.Event()
+
+        self._source = sqlite3.connect(manager.path, check_same_thread=False)
+        for pragma in connection.PRAGMAS:
+            self._source.execute(pragma)
+        self._source.execute("PRAGMA query_only = ON")
+        self.refresh()
+
+        manager.commit_listeners.append(self.mark_stale)
+        instrumentation.register_gauge("airline_replica_lag_seconds", "Seconds the in-memory replica has been behind the database file", self.lag, db=manager.path)
+        self._thread = threading.Thread(target=self._run, name="replica-refresh", daemon=True)
+        self._thread.start()
+
+    def _data_version(self): # Changes whenever another connection commits to the file. Caller holds _refresh_lock
+        return self._source.execute("PRAGMA data_version").fetchone()[0]
+
+    def mark_stale(self): # A commit the replica has not seen yet
+        with self._lock:
+            if self._stale_since is None:
+                self._stale_since = time.monotonic()
+
+    def lag(self): # Seconds since the first commit the replica is missing, 0 while it is in sync
+        with self._lock:
+            return 0.0 if self._stale_since is None else round(time.monotonic() - self._stale_since, 6)
+
+    def refresh(self): # Serialize the whole file into a new image and swap it in
+        with self._refresh_lock:
+            started = time.monotonic()
+            version = self._data_version()
+            image = bytearray(self._source.serialize()) # One read transaction, so the image is a single consistent snapshot
+            image[18] = image[19] = 1 # Rollback journal format: an in-memory database can't be opened in WAL mode
+            generation = Generation(image, version, self.manager.max_readers)
+
+            with self._lock:
+                old, self._current = self._current, generation
+                if self._data_version() == version:
+                    self._stale_since = None # Nothing was committed while copying (a commit after this marks it again)
+                elif self._stale_since is None:
+                    self._stale_since = started
+                self.refreshes += 1
+                self.refresh_seconds += time.monotonic() - started
+        if old is not None:
+            old.retire()
+
+    def _check(self): # Poll for commits made outside this process's writer()
+        with self._refresh_lock:
+            changed = self._data_version() != self._current.data_version
+        if changed:
+            self.mark_stale()
+
+    def _run(self):
+        while not self._stopping.wait(self.refresh_interval):
+            try:
+                self._check()
+                if self.lag() >= self.max_staleness / 2: # Commits within the first half of the bound share one refresh
+                    self.refresh()
+            except sqlite3.Error as e: # Keep serving; past max_staleness reads fall back to the file anyway
+                log.error("Replica refresh of %s failed: %s", self.manager.path, e)
+
+    @contextmanager
+    def reader(self, max_staleness=None): # A replica connection while the lag is within bounds, otherwise a disk reader
+        bound = self.max_staleness if max_staleness is None else max_staleness
+        with self._lock:
+            in_bounds = self._stale_since is None or time.monotonic() - self._stale_since < bound
+            generation = self._current if in_bounds else None
+
+        # Copied outside the lock. If a refresh retires this generation meanwhile, its image is still here and the
+        # reader is closed when it comes back. None: too stale, or every copy allowed is in use
+        conn = generation.acquire() if generation is not None else None
+        with self._lock:
+            if conn is None:
+                self.disk_reads += 1
+            else:
+                self.replica_reads += 1
+
+        if conn is None:
+            with self.manager.reader() as conn:
+                yield conn
+            return
+        try:
+            yield conn
+        finally:
+            generation.release(conn)
+
+    def stats(self):
+        with self._lock:
+            current = self._current
+            return {
+                "lag_seconds": 0.0 if self._stale_since is None else round(time.monotonic() - self._stale_since, 6),
+                "max_staleness": self.max_staleness,
+                "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(current.loaded_at)),
+                "image_mb": round(len(current.image) / 1048576, 1),
+                "reader_copies": current.copies,
+                "max_copies": current.max_copies,
+                "refreshes": self.refreshes,
+                "mean_refresh_ms": round(self.refresh_seconds / self.refreshes * 1000, 3) if self.refreshes else None,
+                "replica_reads": self.replica_reads,
+                "disk_reads": self.disk_reads,
+            }
+
+    def close(self):
+        self._stopping.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        if self.mark_stale in self.manager.commit_listeners:
+            self.manager.commit_listeners.remove(self.mark_stale)
+        instrumentation.unregister_gauge("airline_replica_lag_seconds", db=self.manager.path)
+        with self._refresh_lock:
+            self._current.retire()
+            self._source.close()
+
+
+def enable(path=None, max_staleness=DEFAULT_MAX_STALENESS, refresh_interval=DEFAULT_REFRESH_INTERVAL): # Serve path's reads from memory from now on
+    manager = connection.get_manager(path)
+    if manager.replica is None:
+        manager.replica = ReplicaManager(manager, max_staleness, refresh_interval)
+    return manager.replica
+
+
+def disable(path=None):
+    manager = connection.get_manager(path)
+    replica, manager.replica = manager.replica, None
+    if replica is not None:
+        replica.close()
+
+
+def dashboard_reads(path=None): # The reads dashboards repeat: a flight search page, a pilot's schedule and the live stats
+    data_access.search_flights(statuses="Delayed,Scheduled", path=path)
+    data_access.pilot_schedule(1, path)
+    data_access.stats(live=True, path=path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the dashboard reads against the database file and against an in-memory replica of it")
+    parser.add_argument("--db", default=None, help="database file (defaults to airline.db)")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--max-staleness", type=float, default=DEFAULT_MAX_STALENESS)
+    args = parser.parse_args()
+
+    if args.db:
+        connection.db_file = args.db
+    migrations.bootstrap()
+
+    for label in ("file", "replica"):
+        if label == "replica":
+            started = time.perf_counter()
+            replica = enable(max_staleness=args.max_staleness)
+            print(f"Loaded the replica in {(time.perf_counter() - started) * 1000:.1f} ms")
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            dashboard_reads()
+        print(f"{label:<8} {(time.perf_counter() - started) / args.repeat * 1000:.3f} ms per round")
+    for name, value in replica.stats().items():
+        print(f"{name:<16} {value}")
+    connection.close_all()
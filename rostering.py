@@ -0,0 +1,166 @@
+import argparse
+import heapq
+import time
+
+import connection
+import duty_conflicts
+import migrations
+
+# Automatic pilot rostering. Every Scheduled or Delayed flight departing in the window that has no pilot, or whose pilot
+# is double-booked, gets one; flights that have already flown (or were cancelled) keep theirs and just block that
+# pilot's time. The duty windows live in a duty_conflicts.PilotIntervalIndex, so each check is a bisect into one
+# pilot's sorted schedule, with the same rest-gap rule as assign_pilot. A flight with no usable arrival time is left as
+# is, and its pilot (if any) is treated as busy for CONTEXT_HOURS from its departure.
+#
+# Two greedy passes:
+#   1. Keep: each pilot's current flights in order of arrival, keeping every one that still fits. Earliest finish first
+#      is the interval scheduling order, so it keeps as many of a pilot's existing flights as possible.
+#   2. Assign: the flights left over in departure order, each to the pilot with the fewest flights in the window who
+#      is free for it, from a heap keyed on that count. Pilots found busy are put back once the flight is placed.
+# Pass 1 leaves existing assignments alone, so only the flights it hands on are balanced. rebalance=True skips it and
+# assigns every rosterable flight afresh, evening out the counts at the cost of moving flights that were fine.
+# The solve and the write happen in one immediate transaction, so no other writer can change the schedule in between;
+# dry_run reads a snapshot instead and writes nothing.
+
+ROSTERABLE_STATUSES = ("Scheduled", "Delayed")
+CONTEXT_HOURS = 48 # Flights this close outside the window are loaded too, longer than any flight plus its rest gap
+EARLIEST, LATEST = -2 ** 62, 2 ** 62 # Open ends of the window, in epoch seconds
+
+# A range scan of the integer departure index (migration 10), every time already in epoch seconds
+ROSTER_FLIGHTS_SQL = """
+    SELECT FlightNumber, Status, PilotID, DepartureEpoch, ArrivalEpoch
+    FROM Flights
+    WHERE DepartureEpoch >= ? AND DepartureEpoch < ?
+"""
+PILOT_IDS_SQL = "SELECT PilotID FROM Pilots ORDER BY PilotID"
+ROSTER_ASSIGN_SQL = "UPDATE Flights SET PilotID = ? WHERE FlightNumber = ?"
+
+
+def bound(value, default): # Window edge in epoch seconds; a bare date means its midnight
+    if not value:
+        return default
+    seconds = migrations.to_epoch(value)
+    if seconds is None:
+        raise ValueError(f"{value} is not a date (YYYY-MM-DD or YYYY-MM-DD HH:MM:SS)")
+    return seconds
+
+
+def solve(rows, pilot_ids, departure_from, departure_to, min_rest_minutes=duty_conflicts.DEFAULT_MIN_REST_MINUTES, rebalance=False):
+    # rows follow ROSTER_FLIGHTS_SQL. Returns (changes, report) where changes is [(pilot_id or None, flight_number)]
+    index = duty_conflicts.PilotIntervalIndex(min_rest_minutes)
+    load = dict.fromkeys(pilot_ids, 0) # Flights each pilot flies in the window
+    held = {} # pilot -> [(end, start, flight)] rosterable flights they have now
+    open_flights = [] # (start, end, flight, previous pilot)
+    unassigned = [] # (flight, reason)
+    rosterable = 0
+
+    for flight_number, status, pilot_id, start, end in rows:
+        in_window = departure_from <= start < departure_to
+        known_end = end is not None and end >= start
+        if not in_window or status not in ROSTERABLE_STATUSES or not known_end:
+            if pilot_id is not None: # Without a usable arrival the pilot is blocked for CONTEXT_HOURS, longer than any real flight
+                index.add(pilot_id, flight_number, start, end if known_end else start + CONTEXT_HOURS * 3600)
+                if in_window and pilot_id in load:
+                    load[pilot_id] += 1
+            if in_window and status in ROSTERABLE_STATUSES:
+                rosterable += 1
+                unassigned.append((flight_number, "arrival time missing or before departure, left as is"))
+            continue
+
+        rosterable += 1
+        if pilot_id in load and not rebalance:
+            held.setdefault(pilot_id, []).append((end, start, flight_number))
+        else:
+            open_flights.append((start, end, flight_number, pilot_id))
+
+    kept = 0
+    for pilot_id, flights in held.items():
+        for end, start, flight_number in sorted(flights):
+            if index.conflicts(pilot_id, start, end):
+                open_flights.append((start, end, flight_number, pilot_id))
+            else:
+                index.add(pilot_id, flight_number, start, end)
+                load[pilot_id] += 1
+                kept += 1
+
+    pool = [(count, pilot_id) for pilot_id, count in load.items()]
+    heapq.heapify(pool)
+    changes, assigned, moved = [], 0, 0
+    for start, end, flight_number, previous in sorted(open_flights):
+        busy = []
+        while pool:
+            count, pilot_id = heapq.heappop(pool)
+            if index.conflicts(pilot_id, start, end):
+                busy.append((count, pilot_id))
+                continue
+            index.add(pilot_id, flight_number, start, end)
+            heapq.heappush(pool, (count + 1, pilot_id))
+            if pilot_id == previous: # Only with rebalance: the same pilot came out on top again
+                kept += 1
+                break
+            changes.append((pilot_id, flight_number))
+            if previous is None:
+                assigned += 1
+            else:
+                moved += 1
+            break
+        else:
+            unassigned.append((flight_number, "no pilot free"))
+            if previous is not None: # Better no pilot than a double-booked one
+                changes.append((None, flight_number))
+        for item in busy:
+            heapq.heappush(pool, item)
+
+    counts = [count for count, _ in pool]
+    return changes, {
+        "flights": rosterable,
+        "kept": kept,
+        "assigned": assigned,
+        "moved": moved,
+        "unassigned": unassigned,
+        "pilots": len(counts),
+        "min_per_pilot": min(counts, default=0),
+        "max_per_pilot": max(counts, default=0),
+    }
+
+
+def roster(departure_from=None, departure_to=None, min_rest_minutes=duty_conflicts.DEFAULT_MIN_REST_MINUTES, rebalance=False, dry_run=False, path=None):
+    # Roster the flights departing in [departure_from, departure_to), the whole schedule by default. Returns the report
+    departure_from, departure_to = bound(departure_from, EARLIEST), bound(departure_to, LATEST)
+    started = time.perf_counter()
+    with (connection.reader(path) if dry_run else connection.writer(path)) as conn:
+        conn.execute("BEGIN" if dry_run else "BEGIN IMMEDIATE")
+        rows = conn.execute(ROSTER_FLIGHTS_SQL, (departure_from - CONTEXT_HOURS * 3600, departure_to + CONTEXT_HOURS * 3600)).fetchall()
+        pilot_ids = [pilot_id for (pilot_id,) in conn.execute(PILOT_IDS_SQL)]
+        changes, report = solve(rows, pilot_ids, departure_from, departure_to, min_rest_minutes, rebalance)
+        if not dry_run:
+            conn.executemany(ROSTER_ASSIGN_SQL, changes)
+    report["written"] = 0 if dry_run else len(changes)
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assign pilots to every unassigned or double-booked flight")
+    parser.add_argument("--db", default=None, help="database file (defaults to airline.db)")
+    parser.add_argument("--from", dest="departure_from", default=None, help="first departure date to roster (inclusive)")
+    parser.add_argument("--to", dest="departure_to", default=None, help="last departure date to roster (exclusive)")
+    parser.add_argument("--min-rest", type=float, default=duty_conflicts.DEFAULT_MIN_REST_MINUTES, help="minimum rest between flights, in minutes")
+    parser.add_argument("--rebalance", action="store_true", help="reassign every flight in the window to even out the counts, not just the open ones")
+    parser.add_argument("--dry-run", action="store_true", help="work out the roster without writing it")
+    parser.add_argument("--limit", type=int, default=20, help="unassigned flights listed")
+    args = parser.parse_args()
+
+    if args.db:
+        connection.db_file = args.db
+    migrations.bootstrap()
+
+    report = roster(args.departure_from, args.departure_to, args.min_rest, args.rebalance, args.dry_run)
+    print(f"{report['flights']} flights to roster: {report['kept']} kept their pilot, {report['assigned']} assigned, "
+          f"{report['moved']} moved to another pilot, {len(report['unassigned'])} left unassigned")
+    print(f"{report['pilots']} pilots flying {report['min_per_pilot']}-{report['max_per_pilot']} flights each in the window")
+    print(f"{report['written']} flights updated in {report['seconds']} s" + (" (dry run)" if args.dry_run else ""))
+    if report["unassigned"]:
+        print("\nFlight Number | Reason")
+        for flight_number, reason in report["unassigned"][:args.limit]:
+            print(f"{flight_number} | {reason}")
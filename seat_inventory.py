@@ -0,0 +1,328 @@
+import argparse
+import re
+import threading
+import time
+from functools import lru_cache
+
+import connection
+import data_access
+import migrations
+import reference_cache
+
+# Seat inventory. Each aircraft's capacity gives a seat map: rows of six seats (1A..1F, 2A..), split front to back into
+# cabins, one per booking class. A flight's occupancy is one bitmap per cabin, a Python int with bit i set when the
+# cabin's i-th seat is taken, loaded lazily from Bookings the first time the flight is touched and kept in an LRU.
+#
+# Aircrafts records no cabin layout, so CABINS gives default shares of the rows, and each flight's boundaries are moved
+# just far enough that every live booking sits in the cabin of its own Class. When the bookings can't fit any front to
+# back layout (the generated data picks a class per booking at random), the defaults stand and the bookings whose seat
+# is in another class's cabin are counted as misclassed: their seats are still taken, in the cabin they are in.
+#
+#   - availability is a counter per cabin, O(1)
+#   - the first free seat is the lowest clear bit, a few whole-int operations, O(seats/64) machine words
+#   - allocation holds the flight's lock and writes the booking with an INSERT that only succeeds if no live booking
+#     holds the seat, so the database stays the arbiter: a seat taken behind our back (another process, an import)
+#     makes the INSERT a no-op, the bit is set and the next free seat is tried
+#
+# Like reference_cache, the bitmaps are per process. Bookings written elsewhere are only seen after invalidate() or
+# eviction; they can never be double-booked, but a seat freed elsewhere stays unavailable here until then.
+
+SEAT_LETTERS = "ABCDEF"
+CABINS = (("First", 0.04), ("Business", 0.12), ("Premium Economy", 0.14), ("Economy", None)) # Share of the rows, front to back. Economy takes the rest
+DEFAULT_CABIN = "Economy"
+DEFAULT_MAX_FLIGHTS = 10000
+SEAT_PATTERN = re.compile(r"\s*0*(\d+)\s*([A-Za-z])\s*")
+
+FLIGHT_AIRCRAFT_SQL = "SELECT f.FlightNumber, a.Capacity FROM Flights f LEFT JOIN Aircrafts a ON a.AircraftID = f.AircraftID WHERE f.FlightNumber = ?"
+TAKEN_SEATS_SQL = "SELECT SeatNumber, Class FROM Bookings WHERE FlightNumber = ? AND BookingStatus IS NOT 'Cancelled'"
+BOOK_SEAT_SQL = """
+    INSERT INTO Bookings (PassengerID, FlightNumber, BookingDate, SeatNumber, Class, BookingStatus)
+    SELECT ?, ?, ?, ?, ?, 'Confirmed'
+    WHERE NOT EXISTS (SELECT 1 FROM Bookings WHERE FlightNumber = ? AND SeatNumber = ? AND BookingStatus IS NOT 'Cancelled')
+"""
+BOOKING_SEAT_SQL = "SELECT FlightNumber, SeatNumber FROM Bookings WHERE BookingID = ? AND BookingStatus IS NOT 'Cancelled'"
+CANCEL_BOOKING_SQL = "UPDATE Bookings SET BookingStatus = 'Cancelled' WHERE BookingID = ? AND BookingStatus IS NOT 'Cancelled'"
+
+
+class SeatUnavailableError(RuntimeError): # The requested seat is taken, or the cabin is full
+
+    def __init__(self, flight_number, cabin, seat=None):
+        self.flight_number, self.cabin, self.seat = flight_number, cabin, seat
+        super().__init__(f"Seat {seat} on {flight_number} is already taken" if seat else f"No free {cabin} seats on {flight_number}")
+
+
+def seat_index(seat, capacity): # "12C" -> seat index, None for anything that is not a seat on an aircraft of this capacity
+    match = SEAT_PATTERN.fullmatch(seat or "")
+    if not match or match.group(2).upper() not in SEAT_LETTERS:
+        return None
+    index = (int(match.group(1)) - 1) * len(SEAT_LETTERS) + SEAT_LETTERS.index(match.group(2).upper())
+    return index if 0 <= index < capacity else None
+
+
+def cabin_row_ends(rows, booked=None):
+    # Row each cabin ends before, front to back. The CABINS shares, with each boundary clamped between the last booked row
+    # of the cabins in front of it and the first booked row of those behind. booked is {cabin: (first row, last row)};
+    # when the ranges are out of cabin order no boundary fits them all and the shares are kept
+    ends, start = [], 0
+    for _, share in CABINS:
+        start = rows if share is None else min(rows, start + round(rows * share))
+        ends.append(start)
+    booked = booked or {}
+    names = [name for name, _ in CABINS]
+    fitted = []
+    for position, end in enumerate(ends[:-1]):
+        low = max([booked[name][1] + 1 for name in names[:position + 1] if name in booked], default=0)
+        high = min([booked[name][0] for name in names[position + 1:] if name in booked], default=rows)
+        if low > high:
+            return tuple(ends)
+        fitted.append(min(max(end, low), high))
+    return tuple(fitted + ends[-1:])
+
+
+class SeatMap: # Layout of an aircraft of a given capacity: seat labels <-> indexes, and the index range of each cabin
+
+    def __init__(self, capacity, row_ends):
+        self.capacity = capacity
+        self.cabins = {}
+        start = 0
+        for (name, _), row_end in zip(CABINS, row_ends):
+            end = min(capacity, row_end * len(SEAT_LETTERS))
+            self.cabins[name] = (start, end)
+            start = end
+
+    def index(self, seat): # "12C" -> seat index, None for anything that is not a seat on this aircraft
+        return seat_index(seat, self.capacity)
+
+    def label(self, index):
+        return f"{index // len(SEAT_LETTERS) + 1}{SEAT_LETTERS[index % len(SEAT_LETTERS)]}"
+
+    def cabin_of(self, index):
+        for name, (start, end) in self.cabins.items():
+            if start <= index < end:
+                return name
+        return None
+
+
+@lru_cache(maxsize=None)
+def seat_map(capacity, row_ends=None): # Flights with the same capacity and cabin boundaries share one layout
+    return SeatMap(capacity, row_ends or cabin_row_ends(-(-capacity // len(SEAT_LETTERS))))
+
+
+def layout_for(capacity, bookings): # Seat map for a flight, its cabin boundaries fitted to the (SeatNumber, Class) of its live bookings
+    booked = {}
+    cabins = {name for name, _ in CABINS}
+    for seat, cabin in bookings:
+        index = seat_index(seat, capacity)
+        if index is not None and cabin in cabins:
+            row = index // len(SEAT_LETTERS)
+            first, last = booked.get(cabin, (row, row))
+            booked[cabin] = (min(first, row), max(last, row))
+    return seat_map(capacity, cabin_row_ends(-(-capacity // len(SEAT_LETTERS)), booked))
+
+
+class FlightInventory: # Occupancy of one flight. Callers hold lock around anything that reads and then changes the bitmaps
+
+    def __init__(self, flight_number, layout, bookings):
+        self.flight_number = flight_number
+        self.layout = layout
+        self.lock = threading.Lock()
+        self.bitmaps = {name: 0 for name in layout.cabins}
+        self.taken = {name: 0 for name in layout.cabins}
+        self.unplaced = 0 # Live bookings whose SeatNumber is not a seat on this aircraft (free text from before the inventory)
+        self.duplicates = 0 # Live bookings sharing a seat with an earlier one
+        self.misclassed = 0 # Live bookings whose Class is not the cabin their seat is in
+        for seat, cabin in bookings:
+            index = layout.index(seat)
+            if index is None:
+                self.unplaced += 1
+                continue
+            if cabin != layout.cabin_of(index):
+                self.misclassed += 1
+            if self.is_taken(index):
+                self.duplicates += 1
+            else:
+                self.mark(index)
+
+    def _bit(self, index): # (cabin, bit within the cabin's bitmap)
+        cabin = self.layout.cabin_of(index)
+        return cabin, 1 << (index - self.layout.cabins[cabin][0])
+
+    def is_taken(self, index):
+        cabin, bit = self._bit(index)
+        return bool(self.bitmaps[cabin] & bit)
+
+    def mark(self, index):
+        cabin, bit = self._bit(index)
+        if not self.bitmaps[cabin] & bit:
+            self.bitmaps[cabin] |= bit
+            self.taken[cabin] += 1
+
+    def clear(self, index):
+        cabin, bit = self._bit(index)
+        if self.bitmaps[cabin] & bit:
+            self.bitmaps[cabin] &= ~bit
+            self.taken[cabin] -= 1
+
+    def size(self, cabin):
+        start, end = self.layout.cabins[cabin]
+        return end - start
+
+    def free(self, cabin):
+        return self.size(cabin) - self.taken[cabin]
+
+    def first_free(self, cabin): # Index of the frontmost free seat in the cabin, None when it is full
+        start, end = self.layout.cabins[cabin]
+        free = ~self.bitmaps[cabin] & ((1 << (end - start)) - 1)
+        if not free:
+            return None
+        return start + (free & -free).bit_length() - 1 # free & -free isolates the lowest set bit
+
+    def availability(self): # {cabin: (free, total)}
+        return {cabin: (self.free(cabin), self.size(cabin)) for cabin in self.layout.cabins}
+
+
+class SeatInventory: # Lazily loaded FlightInventory per flight, with allocation and release written through to Bookings
+
+    def __init__(self, path=None, max_flights=DEFAULT_MAX_FLIGHTS):
+        self.path = path
+        self.flights = reference_cache.LRUCache(max_flights)
+
+    def _load(self, flight_number):
+        with connection.fresh_reads(), connection.reader(self.path) as conn: # The bitmap must start from every committed booking
+            conn.execute("BEGIN") # Aircraft and bookings from the same snapshot
+            row = conn.execute(FLIGHT_AIRCRAFT_SQL, (flight_number,)).fetchone()
+            if row is None:
+                raise data_access.NotFoundError(f"Flight {flight_number} not found")
+            if not row[1]:
+                raise ValueError(f"Flight {flight_number} has no aircraft with a known capacity, so it has no seat map")
+            bookings = conn.execute(TAKEN_SEATS_SQL, (flight_number,)).fetchall()
+        return FlightInventory(flight_number, layout_for(row[1], bookings), bookings)
+
+    def flight(self, flight_number):
+        return self.flights.get(flight_number, self._load)
+
+    def availability(self, flight_number):
+        return self.flight(flight_number).availability()
+
+    def allocate(self, flight_number, passenger_id, cabin=DEFAULT_CABIN, seat=None, booking_date=None):
+        # Book a seat in the cabin: the given one, or the frontmost free one. Returns (BookingID, seat label)
+        inventory = self.flight(flight_number)
+        if cabin not in inventory.layout.cabins:
+            raise ValueError(f"Unknown class {cabin}, expected one of {', '.join(inventory.layout.cabins)}")
+        booking_date = booking_date or time.strftime("%Y-%m-%d")
+
+        with inventory.lock:
+            while True:
+                if seat is None:
+                    index = inventory.first_free(cabin)
+                    if index is None:
+                        raise SeatUnavailableError(flight_number, cabin)
+                else:
+                    index = inventory.layout.index(seat)
+                    if index is None or inventory.layout.cabin_of(index) != cabin:
+                        raise ValueError(f"{seat} is not a {cabin} seat on {flight_number}")
+                    if inventory.is_taken(index):
+                        raise SeatUnavailableError(flight_number, cabin, inventory.layout.label(index))
+
+                label = inventory.layout.label(index)
+                with connection.writer(self.path) as conn:
+                    cursor = conn.execute(BOOK_SEAT_SQL, (passenger_id, flight_number, booking_date, label, cabin, flight_number, label))
+                inventory.mark(index) # Ours now, or already taken by a booking this process had not seen
+                if cursor.rowcount:
+                    return cursor.lastrowid, label
+                if seat is not None:
+                    raise SeatUnavailableError(flight_number, cabin, label)
+
+    def release(self, booking_id): # Cancel a booking and free its seat. Returns (FlightNumber, seat)
+        with connection.fresh_reads(), connection.reader(self.path) as conn: # The booking may have been made a moment ago
+            row = conn.execute(BOOKING_SEAT_SQL, (booking_id,)).fetchone()
+        if row is None:
+            raise data_access.NotFoundError(f"No live booking {booking_id}")
+        flight_number, seat = row
+
+        inventory = self.flight(flight_number)
+        with inventory.lock:
+            with connection.writer(self.path) as conn:
+                if not conn.execute(CANCEL_BOOKING_SQL, (booking_id,)).rowcount:
+                    raise data_access.NotFoundError(f"No live booking {booking_id}")
+            index = inventory.layout.index(seat)
+            if index is not None:
+                inventory.clear(index)
+        return flight_number, seat
+
+    def invalidate(self, flight_number=None): # Forget one flight's bitmaps (or all of them), e.g. after an import or an aircraft swap
+        if flight_number is None:
+            self.flights.clear()
+        else:
+            self.flights.invalidate(flight_number)
+
+
+_inventories = {}
+_inventories_lock = threading.Lock()
+
+
+def get_inventory(path=None): # One shared inventory per database file, like reference_cache.get_cache
+    path = path or connection.db_file
+    with _inventories_lock:
+        inventory = _inventories.get(path)
+        if inventory is None:
+            inventory = _inventories[path] = SeatInventory(path)
+        return inventory
+
+
+def availability(flight_number, path=None): # {cabin: (free, total)}
+    return get_inventory(path).availability(flight_number)
+
+
+def allocate(flight_number, passenger_id, cabin=DEFAULT_CABIN, seat=None, path=None):
+    return get_inventory(path).allocate(flight_number, passenger_id, cabin, seat)
+
+
+def release(booking_id, path=None):
+    return get_inventory(path).release(booking_id)
+
+
+def invalidate(flight_number=None, path=None):
+    get_inventory(path).invalidate(flight_number)
+
+
+def seat_chart(flight_number, path=None): # (cabin, [(seat, taken)]) per cabin, front to back
+    inventory = get_inventory(path).flight(flight_number)
+    with inventory.lock:
+        return [(cabin, [(inventory.layout.label(index), inventory.is_taken(index)) for index in range(start, end)])
+                for cabin, (start, end) in inventory.layout.cabins.items()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seat maps and seat allocation per flight")
+    parser.add_argument("command", choices=["show", "book", "release"])
+    parser.add_argument("--db", default=None, help="database file (defaults to airline.db)")
+    parser.add_argument("--flight", help="show/book: flight number")
+    parser.add_argument("--passenger", type=int, help="book: passenger ID")
+    parser.add_argument("--class", dest="cabin", default=DEFAULT_CABIN, choices=[name for name, _ in CABINS], help="book: cabin")
+    parser.add_argument("--seat", default=None, help="book: a specific seat, otherwise the frontmost free one")
+    parser.add_argument("--booking", type=int, help="release: booking ID")
+    args = parser.parse_args()
+
+    if args.db:
+        connection.db_file = args.db
+    migrations.bootstrap()
+
+    if args.command == "show":
+        inventory = get_inventory().flight(args.flight)
+        for cabin, seats in seat_chart(args.flight):
+            free, total = inventory.availability()[cabin]
+            print(f"{cabin} ({free}/{total} free)")
+            for row in range(0, len(seats), len(SEAT_LETTERS)):
+                print("  " + " ".join(("  --" if taken else f"{label:>4}") for label, taken in seats[row:row + len(SEAT_LETTERS)]))
+        if inventory.unplaced or inventory.duplicates or inventory.misclassed:
+            print(f"{inventory.unplaced} bookings with a seat not on this aircraft, {inventory.duplicates} double-booked seats, "
+                  f"{inventory.misclassed} booked in a class other than their seat's cabin")
+
+    elif args.command == "book":
+        booking_id, seat = allocate(args.flight, args.passenger, args.cabin, args.seat)
+        print(f"Booking {booking_id}: seat {seat} on {args.flight}")
+
+    elif args.command == "release":
+        flight_number, seat = release(args.booking)
+        print(f"Booking {args.booking} cancelled, seat {seat} on {flight_number} is free")
@@ -0,0 +1,490 @@
+import argparse
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import baggage
+import change_feed
+import connection
+import data_access
+import duty_conflicts
+import flight_search
+import instrumentation
+import migrations
+import parallel_stats
+import passenger_search
+import query_builder
+import replica
+import seat_inventory
+import status_ingest
+
+# HTTP/JSON front-end so gate agents and dashboards can use the database at the same time as the menu.
+# Every request gets its own thread. Reads run straight on the shared pool of read-only WAL connections, so they
+# proceed in parallel (sqlite3 releases the GIL while a statement runs). Writes are handed to one writer thread
+# through a bounded queue and applied one after another on the single writer connection, so concurrent writers
+# queue up in Python instead of fighting over the database lock. A full queue, or a write still not done after
+# WRITE_TIMEOUT, answers 503 with Retry-After rather than piling up.
+#
+# Routes:
+#   GET   /flights?destination=1,2&status=Delayed&from=2025-01-01&to=2025-02-01&after=<next>&page_size=50
+#   GET   /flights/<number>
+#   PATCH /flights/<number>              {"departure": ..., "arrival": ..., "status": ...}
+#   PUT   /flights/<number>/pilot        {"pilot_id": 3, "min_rest_minutes": 60}
+#   GET   /flights/<number>/seats         availability per cabin plus the seat chart
+#   POST  /flights/<number>/bookings      {"passenger_id": 7, "class": "Economy", "seat": "14C"}, seat optional
+#   GET   /flights/<number>/baggage       bag count and weight plus every bag on the flight
+#   POST  /bookings/<id>/cancel
+#   GET   /passengers?q=alice%20smi&limit=20&bookings=5
+#   GET   /pilots
+#   GET   /pilots/<id>/schedule
+#   POST  /roster                        {"from": "2025-03-01", "to": "2025-04-01", "min_rest_minutes": 60, "rebalance": false, "dry_run": false}
+#   PATCH /destinations/<id>             {"city": ..., "country": ..., "airport_code": ...}
+#   GET   /stats?live=1                  parallel=1 aggregates Flights across parallel_stats' process pool
+#   POST  /status-events                 {"events": [{"flight_number": ..., "status": ..., "timestamp": ..., "reason": ...}]}
+#   GET   /status-events/metrics
+#   POST  /baggage-scans                 {"scans": [{"tag_number": ..., "checkpoint": ..., "scanned_at": ..., "location": ..., "booking_id": ..., "weight": ...}]}
+#   GET   /baggage-scans/metrics
+#   GET   /changes?consumer=billing&limit=1000&table=Flights
+#   POST  /changes/<consumer>/ack        {"seq": 1234}
+#   GET   /metrics                       Prometheus text; /metrics.json for the same as JSON
+#
+# With --replica, reads come from an in-memory copy of the database (replica.py) that trails writes by at most
+# --max-staleness seconds; a write's own response is read back from the file.
+#
+# Status events and baggage scans are the high-rate streams, they skip the write queue and go to group-commit writers
+# (status_ingest, baggage). POST /status-events and /baggage-scans answer 202 once queued, not committed.
+
+DEFAULT_PORT = 8080
+DEFAULT_READERS = max(4, os.cpu_count() or 1)
+WRITE_QUEUE_SIZE = 1000
+WRITE_TIMEOUT = 30 # Seconds a request waits for its write before giving up
+RETRY_AFTER = 1 # Seconds, sent with every 503
+MAX_BODY = 1024 * 1024
+
+
+class QueueFullError(RuntimeError): # The writer is too far behind to accept more work
+    pass
+
+
+class WriteTimeoutError(RuntimeError): # A queued write did not finish within WRITE_TIMEOUT
+    pass
+
+
+class WriteQueue: # Single writer thread applying queued write operations in arrival order, plus the status and baggage ingestors
+
+    def __init__(self, max_pending=WRITE_QUEUE_SIZE, path=None):
+        self.path = path
+        self._pending = queue.Queue(max_pending)
+        self.status_events = status_ingest.StatusIngestor(path)
+        self.baggage_scans = baggage.ScanIngestor(path)
+        self._thread = threading.Thread(target=self._run, name="writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, operation, *args, **kwargs): # Queue a data_access write, returns a Future with its result
+        future = Future()
+        try:
+            self._pending.put_nowait((future, operation, args, kwargs))
+        except queue.Full:
+            raise QueueFullError("Too many pending writes, try again shortly")
+        return future
+
+    def call(self, operation, *args, **kwargs): # Queue a write and wait for it, re-raising whatever it raised
+        future = self.submit(operation, *args, **kwargs)
+        try:
+            return future.result(WRITE_TIMEOUT)
+        except FutureTimeoutError:
+            if future.cancel(): # Still queued: it never runs, so a retry can't apply it twice
+                raise WriteTimeoutError(f"The write did not start within {WRITE_TIMEOUT} s and was dropped, try again shortly")
+            raise WriteTimeoutError(f"The write did not finish within {WRITE_TIMEOUT} s, it may still be applied")
+
+    def pending(self):
+        return self._pending.qsize()
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            future, operation, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(operation(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def stop(self): # Finish the writes already queued, then stop the thread
+        self._pending.put(None)
+        self._thread.join()
+        self.status_events.stop()
+        self.baggage_scans.stop()
+
+
+class HTTPError(Exception): # Error with a status code, turned into a JSON error response
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def as_dicts(columns, rows):
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def encode_cursor(after): # Keyset cursor (DepartureEpoch, FlightNumber) as one query-string value, "|FlightNumber" with no departure
+    return None if after is None else f"{'' if after[0] is None else after[0]}|{after[1]}"
+
+
+def decode_cursor(value):
+    if not value:
+        return None
+    departure, separator, flight_number = value.partition("|")
+    if not separator or not (departure == "" or departure.lstrip("-").isdigit()):
+        raise HTTPError(400, "after must be the 'next' value of a previous page")
+    return int(departure) if departure else None, flight_number
+
+
+def search_flights(query, path):
+    try:
+        page_size = min(int(query.get("page_size", flight_search.DEFAULT_PAGE_SIZE)), 1000)
+    except ValueError:
+        raise HTTPError(400, "page_size must be a number")
+    rows, after = data_access.search_flights(query.get("destination"), query.get("status"), query.get("from"), query.get("to"), decode_cursor(query.get("after")), max(1, page_size), path)
+    return {"flights": as_dicts(data_access.FLIGHT_COLUMNS, rows), "next": encode_cursor(after)}
+
+
+def get_flight(flight_number, path):
+    return dict(zip(data_access.FLIGHT_COLUMNS, data_access.get_flight(flight_number, path)))
+
+
+def min_rest_minutes(body): # The duty rest gap for an assignment; only an explicit non-negative integer, so null can't switch the check off
+    value = body.get("min_rest_minutes", duty_conflicts.DEFAULT_MIN_REST_MINUTES)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise HTTPError(400, "min_rest_minutes must be a whole number of minutes, 0 or more")
+    return value
+
+
+def update_flight(writes, flight_number, body, path):
+    writes.call(data_access.update_flight, flight_number, body.get("departure"), body.get("arrival"), body.get("status"), path=path)
+    with connection.fresh_reads(): # Answer with the write, not a replica that hasn't caught up yet
+        return get_flight(flight_number, path)
+
+
+def assign_pilot(writes, flight_number, body, path):
+    if "pilot_id" not in body:
+        raise HTTPError(400, "pilot_id is required")
+    writes.call(data_access.assign_pilot, flight_number, body["pilot_id"], min_rest_minutes(body), path=path)
+    with connection.fresh_reads():
+        return get_flight(flight_number, path)
+
+
+def flight_seats(flight_number, path):
+    availability = seat_inventory.availability(flight_number, path)
+    return {
+        "availability": {cabin: {"free": free, "total": total} for cabin, (free, total) in availability.items()},
+        "seats": {cabin: [{"seat": seat, "taken": taken} for seat, taken in seats] for cabin, seats in seat_inventory.seat_chart(flight_number, path)},
+    }
+
+
+def book_seat(writes, flight_number, body, path):
+    if "passenger_id" not in body:
+        raise HTTPError(400, "passenger_id is required")
+    booking_id, seat = writes.call(seat_inventory.allocate, flight_number, body["passenger_id"], body.get("class", seat_inventory.DEFAULT_CABIN), body.get("seat"), path=path)
+    return {"booking_id": booking_id, "flight_number": flight_number, "seat": seat}
+
+
+def cancel_booking(writes, booking_id, path):
+    flight_number, seat = writes.call(seat_inventory.release, booking_id, path=path)
+    return {"booking_id": booking_id, "flight_number": flight_number, "seat": seat}
+
+
+def flight_baggage(flight_number, path):
+    count, weight = data_access.flight_baggage_totals(flight_number, path)
+    return {"flight_number": flight_number, "bag_count": count, "total_weight": weight,
+            "bags": as_dicts(baggage.BAG_COLUMNS, data_access.bags_for_flight(flight_number, path))}
+
+
+def search_passengers(query, path):
+    try:
+        limit = int(query.get("limit", passenger_search.DEFAULT_LIMIT))
+        bookings = int(query.get("bookings", passenger_search.DEFAULT_BOOKINGS_PER_PASSENGER))
+    except ValueError:
+        raise HTTPError(400, "limit and bookings must be numbers")
+    results = data_access.search_passengers(query.get("q"), limit, max(0, bookings), path)
+    return {"passengers": [dict(zip(passenger_search.PASSENGER_COLUMNS, passenger), bookings=as_dicts(passenger_search.BOOKING_COLUMNS, rows))
+                           for passenger, rows in results]}
+
+
+def list_pilots(path):
+    return {"pilots": as_dicts(data_access.PILOT_COLUMNS, data_access.list_pilots(path))}
+
+
+def pilot_schedule(pilot_id, path):
+    pilot, flights = data_access.pilot_schedule(pilot_id, path)
+    return {"pilot": dict(zip(data_access.PILOT_COLUMNS, pilot)), "flights": as_dicts(data_access.SCHEDULE_COLUMNS, flights)}
+
+
+def roster_pilots(writes, body, path): # Runs on the writer thread like any other write; a dry run only reads
+    arguments = (body.get("from"), body.get("to"), min_rest_minutes(body), bool(body.get("rebalance")))
+    if body.get("dry_run"):
+        report = data_access.roster_pilots(*arguments, dry_run=True, path=path)
+    else:
+        report = writes.call(data_access.roster_pilots, *arguments, path=path)
+    return dict(report, unassigned=[{"flight": flight, "reason": reason} for flight, reason in report["unassigned"]])
+
+
+def update_destination(writes, destination_id, body, path):
+    writes.call(data_access.update_destination, destination_id, body.get("city"), body.get("country"), body.get("airport_code"), path=path)
+    return dict(zip(data_access.DESTINATION_COLUMNS, data_access.get_destination(destination_id, path)))
+
+
+def get_stats(query, path):
+    flag = lambda name: query.get(name, "") not in ("", "0", "false")
+    reports = data_access.stats(live=flag("live"), path=path, parallel=flag("parallel"))
+    return {
+        "flights_per_destination": as_dicts(("City", "NumberOfFlights"), reports["flights_per_destination"]),
+        "flights_per_pilot": as_dicts(("FirstName", "LastName", "NumberOfFlights"), reports["flights_per_pilot"]),
+        "aircraft_usage": as_dicts(("Model", "Manufacturer", "UsageCount"), reports["aircraft_usage"]),
+    }
+
+
+def submit_status_events(writes, body): # Queue the whole batch without blocking, or none of it (503) when the ingest queue is full
+    events = body.get("events", [body])
+    if not isinstance(events, list) or not all(isinstance(event, dict) for event in events):
+        raise HTTPError(400, "events must be a list of objects")
+    for event in events:
+        if not event.get("flight_number") or not event.get("status"):
+            raise HTTPError(400, "Every event needs flight_number and status")
+    try:
+        writes.status_events.put_all([status_ingest.new_event(event["flight_number"], event["status"], event.get("timestamp"), event.get("reason"))
+                                      for event in events])
+    except queue.Full:
+        raise QueueFullError(f"Status event queue is full, none of the {len(events)} events were queued")
+    return {"queued": len(events)}
+
+
+def submit_baggage_scans(writes, body): # Same contract as status events: all queued without blocking, or none and 503
+    scans = body.get("scans", [body])
+    if not isinstance(scans, list) or not all(isinstance(scan, dict) for scan in scans):
+        raise HTTPError(400, "scans must be a list of objects")
+    for scan in scans:
+        if not scan.get("tag_number") or not scan.get("checkpoint"):
+            raise HTTPError(400, "Every scan needs tag_number and checkpoint")
+    try:
+        writes.baggage_scans.put_all([baggage.new_scan(scan["tag_number"], scan["checkpoint"], scan.get("scanned_at"), scan.get("location"),
+                                                       scan.get("booking_id"), scan.get("weight"), scan.get("description")) for scan in scans])
+    except queue.Full:
+        raise QueueFullError(f"Baggage scan queue is full, none of the {len(scans)} scans were queued")
+    return {"queued": len(scans)}
+
+
+def pull_changes(query, path): # The next batch for a consumer; its position only moves when the batch is acknowledged
+    if not query.get("consumer"):
+        raise HTTPError(400, "consumer is required")
+    try:
+        limit = min(int(query.get("limit", change_feed.DEFAULT_BATCH_SIZE)), 10000)
+    except ValueError:
+        raise HTTPError(400, "limit must be a number")
+    tables = [table for table in query.get("table", "").split(",") if table]
+    changes = change_feed.pull(query["consumer"], max(1, limit), tables, path)
+    return {"changes": as_dicts(change_feed.CHANGE_COLUMNS, changes), "last_seq": changes[-1][0] if changes else None}
+
+
+def acknowledge_changes(writes, consumer, body, path):
+    if not isinstance(body.get("seq"), int):
+        raise HTTPError(400, "seq must be the Seq of the last change processed")
+    writes.call(change_feed.acknowledge, consumer, body["seq"], path=path)
+    return {"consumer": consumer, "seq": body["seq"]}
+
+
+def route(writes, method, parts, query, body): # Dispatch one request to the operation it names, returns the JSON-ready result
+    path = writes.path # Every read and write goes to the database the server was started on
+    if parts == ["flights"] and method == "GET":
+        return search_flights(query, path)
+    if len(parts) == 2 and parts[0] == "flights":
+        if method == "GET":
+            return get_flight(parts[1], path)
+        if method == "PATCH":
+            return update_flight(writes, parts[1], body, path)
+    if len(parts) == 3 and parts[0] == "flights" and parts[2] == "pilot" and method == "PUT":
+        return assign_pilot(writes, parts[1], body, path)
+    if len(parts) == 3 and parts[0] == "flights" and parts[2] == "seats" and method == "GET":
+        return flight_seats(parts[1], path)
+    if len(parts) == 3 and parts[0] == "flights" and parts[2] == "bookings" and method == "POST":
+        return book_seat(writes, parts[1], body, path)
+    if len(parts) == 3 and parts[0] == "flights" and parts[2] == "baggage" and method == "GET":
+        return flight_baggage(parts[1], path)
+    if len(parts) == 3 and parts[0] == "bookings" and parts[2] == "cancel" and method == "POST":
+        return cancel_booking(writes, parts[1], path)
+    if parts == ["passengers"] and method == "GET":
+        return search_passengers(query, path)
+    if parts == ["pilots"] and method == "GET":
+        return list_pilots(path)
+    if len(parts) == 3 and parts[0] == "pilots" and parts[2] == "schedule" and method == "GET":
+        return pilot_schedule(parts[1], path)
+    if parts == ["roster"] and method == "POST":
+        return roster_pilots(writes, body, path)
+    if len(parts) == 2 and parts[0] == "destinations" and method == "PATCH":
+        return update_destination(writes, parts[1], body, path)
+    if parts == ["stats"] and method == "GET":
+        return get_stats(query, path)
+    if parts == ["status-events"] and method == "POST":
+        return submit_status_events(writes, body)
+    if parts == ["status-events", "metrics"] and method == "GET":
+        return writes.status_events.stats()
+    if parts == ["baggage-scans"] and method == "POST":
+        return submit_baggage_scans(writes, body)
+    if parts == ["baggage-scans", "metrics"] and method == "GET":
+        return writes.baggage_scans.stats()
+    if parts == ["metrics"] and method == "GET":
+        return instrumentation.prometheus()
+    if parts == ["metrics.json"] and method == "GET":
+        return dict(instrumentation.snapshot(), statement_shapes=query_builder.stats())
+    if parts == ["changes"] and method == "GET":
+        return pull_changes(query, path)
+    if len(parts) == 3 and parts[0] == "changes" and parts[2] == "ack" and method == "POST":
+        return acknowledge_changes(writes, parts[1], body, path)
+    raise HTTPError(404, f"No route for {method} /{'/'.join(parts)}")
+
+
+def error_status(error): # HTTP status for an exception raised by an operation
+    if isinstance(error, HTTPError):
+        return error.status
+    if isinstance(error, data_access.NotFoundError):
+        return 404
+    if isinstance(error, change_feed.CursorExpiredError):
+        return 410
+    if isinstance(error, (data_access.DutyConflictError, seat_inventory.SeatUnavailableError, sqlite3.IntegrityError)):
+        return 409
+    if isinstance(error, (QueueFullError, WriteTimeoutError)):
+        return 503
+    if isinstance(error, ValueError):
+        return 400
+    return 500
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    writes = None # WriteQueue, set by make_server
+    protocol_version = "HTTP/1.1" # Keep-alive, so a dashboard polling the service reuses its connection
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_PATCH(self):
+        self.handle_request("PATCH")
+
+    def do_PUT(self):
+        self.handle_request("PUT")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def handle_request(self, method):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        try:
+            result = route(self.writes, method, parts, query, self.read_body())
+            status = 202 if parts in (["status-events"], ["baggage-scans"]) and method == "POST" else 200
+        except Exception as e:
+            status = error_status(e)
+            if status == 500:
+                self.log_error("Unhandled error on %s %s: %r", method, self.path, e)
+            result = {"error": str(e) if status != 500 else "Internal server error"}
+            if isinstance(e, data_access.DutyConflictError):
+                result["conflicts"] = [{"flight": flight, "pilot": pilot, "clashes": clashes} for flight, pilot, clashes in e.conflicts]
+
+        if isinstance(result, str): # Prometheus text
+            payload, content_type = result.encode(), "text/plain; version=0.0.4"
+        else:
+            payload, content_type = json.dumps(result).encode(), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        if status == 503:
+            self.send_header("Retry-After", str(RETRY_AFTER))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_body(self): # Request body as a dict, {} for requests without one
+        # A body that is refused unread would be parsed as the next request on this keep-alive connection, so those
+        # errors close it instead
+        if self.headers.get("Transfer-Encoding"):
+            self.close_connection = True
+            raise HTTPError(411, "Send the request body with a Content-Length")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self.close_connection = True
+            raise HTTPError(400, "Content-Length must be a non-negative number")
+        if not length:
+            return {}
+        if length > MAX_BODY:
+            self.close_connection = True
+            raise HTTPError(413, "Request body too large")
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise HTTPError(400, "Request body must be JSON")
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        return body
+
+
+def make_server(host="127.0.0.1", port=DEFAULT_PORT, readers=DEFAULT_READERS, path=None, max_staleness=None):
+    # Migrate the database, size the reader pool and start the writer thread. Returns (server, write queue)
+    # max_staleness (seconds) serves reads from an in-memory replica that may lag writes by up to that long.
+    # path defaults to connection.db_file as it is now; changing db_file later doesn't move a running server
+    path = path or connection.db_file
+    migrations.bootstrap(path)
+    connection.get_manager(path, readers)
+    if max_staleness is not None:
+        replica.enable(path, max_staleness)
+    writes = WriteQueue(path=path)
+    handler = type("Handler", (RequestHandler,), {"writes": writes})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, writes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the airline operations over HTTP/JSON")
+    parser.add_argument("--db", default=None, help="database file (defaults to airline.db)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--readers", type=int, default=DEFAULT_READERS, help="read-only connections in the pool")
+    parser.add_argument("--slow-query-ms", type=float, default=instrumentation.DEFAULT_SLOW_QUERY_MS, help="log statements slower than this")
+    parser.add_argument("--slow-query-log", default=None, help="append slow queries to this JSON lines file")
+    parser.add_argument("--no-instrument", action="store_true", help="turn off query instrumentation and /metrics")
+    parser.add_argument("--replica", action="store_true", help="serve reads from an in-memory copy of the database")
+    parser.add_argument("--max-staleness", type=float, default=replica.DEFAULT_MAX_STALENESS, help="seconds replica reads may lag writes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s") # Failed ingest batches are logged
+    if args.db:
+        connection.db_file = args.db
+    if not args.no_instrument:
+        instrumentation.enable(args.slow_query_ms, args.slow_query_log)
+
+    server, writes = make_server(args.host, args.port, args.readers, max_staleness=args.max_staleness if args.replica else None)
+    print(f"Serving {connection.db_file} on http://{args.host}:{args.port} with {args.readers} readers" + (" and an in-memory replica" if args.replica else ""))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        writes.stop()
+        parallel_stats.close_all()
+        connection.close_all()
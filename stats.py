@@ -0,0 +1,65 @@
+import argparse
+import sys
+
+import connection
+import main
+import migrations
+
+# Maintenance for the Stats Mode summary tables (migration 3). The Flights triggers keep them current, this checks
+# them against a live aggregate and rebuilds them if they have drifted (e.g. after editing the file with triggers off).
+
+
+def live_counts(conn, key): # {key: flight count} aggregated straight from Flights
+    return dict(conn.execute(f"SELECT {key}, COUNT(*) FROM Flights WHERE {key} IS NOT NULL GROUP BY {key}"))
+
+
+def summary_counts(conn, table, key, count): # {key: count} from a summary table, rows that have dropped to zero are left out
+    return dict(conn.execute(f"SELECT {key}, {count} FROM {table} WHERE {count} != 0"))
+
+
+def check(path=None): # Returns {summary table: [(key, summary count, live count), ...]} for every mismatch, empty when consistent
+    mismatches = {}
+
+    with connection.reader(path) as conn:
+        conn.execute("BEGIN") # One snapshot for both sides of the comparison
+        for table, key, count in migrations.FLIGHT_COUNT_SUMMARIES:
+            live = live_counts(conn, key)
+            summary = summary_counts(conn, table, key, count)
+            wrong = [(value, summary.get(value, 0), live.get(value, 0)) for value in sorted(set(live) | set(summary)) if summary.get(value, 0) != live.get(value, 0)]
+            if wrong:
+                mismatches[table] = wrong
+
+    return mismatches
+
+
+def rebuild(path=None): # Recompute every summary table from Flights in one transaction
+    with connection.writer(path) as conn:
+        migrations.rebuild_flight_count_summaries(conn.cursor())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stats Mode summary tables")
+    parser.add_argument("command", choices=["show", "check", "rebuild"])
+    parser.add_argument("--db", default=None, help="database file (defaults to airline.db)")
+    parser.add_argument("--live", action="store_true", help="show: aggregate Flights directly instead of reading the summary tables")
+    parser.add_argument("--parallel", action="store_true", help="show: aggregate Flights in pieces across a process pool (see parallel_stats.py)")
+    args = parser.parse_args()
+
+    if args.db:
+        connection.db_file = args.db
+
+    if args.command == "show":
+        main.statistic_mode(live=args.live, parallel=args.parallel)
+
+    elif args.command == "check":
+        problems = check()
+        for table, rows in problems.items():
+            print(f"{table}: {len(rows)} mismatched rows")
+            for key, summary, live in rows[:10]:
+                print(f"  {key}: summary {summary}, live {live}")
+        print("Summary tables are consistent" if not problems else "Run 'python stats.py rebuild' to repair")
+        sys.exit(1 if problems else 0)
+
+    elif args.command == "rebuild":
+        rebuild()
+        print("Summary tables rebuilt")
@@ -0,0 +1,88 @@
+import argparse
+import time
+
+import bulk_import
+import group_commit
+import migrations
+
+# Group-commit ingestion of flight status events, on the queue and writer thread of group_commit.GroupCommitIngestor.
+# Each batch is written in a single transaction: every event is appended to FlightStatusLog and each flight's Status is
+# set to its latest event. When the queue is full, submit() blocks (or raises queue.Full with block=False), which is
+# the back-pressure.
+#
+# Events for unknown flights or with bad fields are counted as rejected and dropped, they never fail a batch.
+
+SPEC = bulk_import.TABLES["status"]
+DEFAULT_MAX_BATCH = group_commit.DEFAULT_MAX_BATCH
+DEFAULT_MAX_DELAY = group_commit.DEFAULT_MAX_DELAY
+DEFAULT_MAX_PENDING = group_commit.DEFAULT_MAX_PENDING
+
+INSERT_LOG_SQL = f"INSERT INTO {migrations.STATUS_LOG_LIVE} (FlightNumber, Status, Timestamp, Reason) VALUES (?, ?, ?, ?)"
+
+# Skipped when the log already holds a newer event for the flight, so a late event never overwrites a newer status
+UPDATE_STATUS_SQL = """
+    UPDATE Flights SET Status = ?
+    WHERE FlightNumber = ?
+      AND NOT EXISTS (SELECT 1 FROM FlightStatusLog WHERE FlightNumber = ? AND Timestamp > ?)
+"""
+
+
+def now(): # Default event timestamp, in the stored format
+    return time.strftime(bulk_import.DATETIME_FORMAT, time.gmtime())
+
+
+def new_event(flight_number, status, timestamp=None, reason=None): # One event as the ingestor queues it
+    return {"FlightNumber": flight_number, "Status": status, "Timestamp": timestamp or now(), "Reason": reason}
+
+
+def write_batch(conn, events): # Validate, update and append one batch inside the caller's transaction. Returns (committed, rejected)
+    rows = []
+    for event in events:
+        try:
+            rows.append(bulk_import.validate_row(SPEC, event))
+        except ValueError:
+            pass
+
+    column, parent, missing = bulk_import.missing_parents(conn, SPEC, rows)[SPEC["columns"].index("FlightNumber")]
+    rows = [row for row in rows if row[1] not in missing]
+
+    latest = {} # FlightNumber -> row with the newest timestamp; later arrivals win ties
+    for row in rows:
+        if row[1] not in latest or row[3] >= latest[row[1]][3]:
+            latest[row[1]] = row
+
+    conn.executemany(UPDATE_STATUS_SQL, [(row[2], row[1], row[1], row[3]) for row in latest.values()])
+    conn.executemany(INSERT_LOG_SQL, [row[1:] for row in rows])
+    return len(rows), len(events) - len(rows)
+
+
+class StatusIngestor(group_commit.GroupCommitIngestor):
+
+    def __init__(self, path=None, max_batch=DEFAULT_MAX_BATCH, max_delay=DEFAULT_MAX_DELAY, max_pending=DEFAULT_MAX_PENDING, on_error=None):
+        super().__init__(write_batch, "status", path, max_batch, max_delay, max_pending, on_error)
+
+    def submit(self, flight_number, status, timestamp=None, reason=None, block=True, timeout=None):
+        self.put(new_event(flight_number, status, timestamp, reason), block, timeout)
+
+
+def replay(path, db_path=None, max_batch=DEFAULT_MAX_BATCH, max_delay=DEFAULT_MAX_DELAY): # Feed a CSV/JSONL file of events through the ingestor, returns its stats
+    ingestor = StatusIngestor(db_path, max_batch, max_delay)
+    try:
+        for _, row in bulk_import.read_rows(path):
+            ingestor.submit(row.get("FlightNumber"), row.get("Status"), row.get("Timestamp"), row.get("Reason"))
+        ingestor.flush()
+    finally:
+        ingestor.stop()
+    return ingestor.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a file of flight status events through the group-commit ingestor")
+    parser.add_argument("file", help="CSV or JSONL with FlightNumber, Status, Timestamp and Reason")
+    parser.add_argument("--db", default=None, help="database file (defaults to airline.db)")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="flush after this many events")
+    parser.add_argument("--max-delay", type=float, default=DEFAULT_MAX_DELAY, help="flush after the oldest event has waited this many seconds")
+    args = parser.parse_args()
+
+    for name, value in replay(args.file, args.db, args.max_batch, args.max_delay).items():
+        print(f"{name:<18} {value}")
@@ -0,0 +1,181 @@
+import argparse
+import gzip
+import json
+import os
+import time
+
+import connection
+import migrations
+
+# Maintenance and history queries for the month-partitioned FlightStatusLog (migration 5).
+#
+#   roll     moves every event from a finished month out of FlightStatusLogLive into FlightStatusLog_YYYYMM, so Live
+#            only ever holds the current month and hot queries stay small
+#   archive  writes partitions older than a cutoff to gzipped JSON lines files, then drops their tables
+#   history  reads one flight's events from only the partitions overlapping the requested period, optionally
+#            including archived files
+#
+# Partitions are listed in LogPartitions. The FlightStatusLog view is rebuilt whenever the set of tables changes.
+
+DEFAULT_ARCHIVE_DIR = "archive"
+ARCHIVE_COLUMNS = ("LogID", "FlightNumber", "Status", "Timestamp", "Reason")
+
+HISTORY_FILTER = " WHERE FlightNumber = ? AND Timestamp >= ? AND Timestamp < ?"
+EARLIEST, LATEST = "0000", "9999" # Open ends of a period, compare correctly against the stored timestamps
+
+
+def month_start(value=None): # "YYYY-MM-01 00:00:00" of the month containing value (a timestamp, date or "YYYY-MM"); now when None
+    if value is None:
+        value = time.strftime("%Y-%m", time.gmtime())
+    return f"{value[:7]}-01 00:00:00"
+
+
+def next_month(start): # Start of the month after the one starting at start
+    year, month = int(start[:4]), int(start[5:7])
+    year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f"{year:04d}-{month:02d}-01 00:00:00"
+
+
+def partition_name(start):
+    return f"FlightStatusLog_{start[:4]}{start[5:7]}"
+
+
+def partitions(conn, include_archived=False): # (TableName, PeriodStart, PeriodEnd, RowCount, ArchivePath) in period order
+    sql = "SELECT TableName, PeriodStart, PeriodEnd, RowCount, ArchivePath FROM LogPartitions"
+    if not include_archived:
+        sql += " WHERE ArchivePath IS NULL"
+    return conn.execute(sql + " ORDER BY PeriodStart").fetchall()
+
+
+def roll(before=None, path=None): # Move finished months out of Live. before is exclusive, default the current month. Returns {table: rows moved}
+    cutoff = month_start(before)
+    moved = {}
+
+    with connection.writer(path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        months = [row[0] for row in conn.execute(f"SELECT DISTINCT substr(Timestamp, 1, 7) FROM {migrations.STATUS_LOG_LIVE} WHERE Timestamp < ?", (cutoff,))]
+        archived = {row[0] for row in partitions(conn, include_archived=True) if row[4]}
+
+        for month in months:
+            start = month_start(month)
+            end = next_month(start)
+            table = partition_name(start)
+            if table in archived:
+                raise ValueError(f"{table} is already archived, events for {month} can no longer be rolled into it")
+
+            for statement in migrations.status_log_partition_ddl(table):
+                conn.execute(statement)
+            count = conn.execute(f"INSERT INTO {table} ({migrations.STATUS_LOG_COLUMNS}) SELECT {migrations.STATUS_LOG_COLUMNS} "
+                                 f"FROM {migrations.STATUS_LOG_LIVE} WHERE Timestamp >= ? AND Timestamp < ?", (start, end)).rowcount
+            conn.execute(f"DELETE FROM {migrations.STATUS_LOG_LIVE} WHERE Timestamp >= ? AND Timestamp < ?", (start, end))
+            conn.execute("INSERT INTO LogPartitions (TableName, PeriodStart, PeriodEnd, RowCount) VALUES (?, ?, ?, ?) "
+                         "ON CONFLICT (TableName) DO UPDATE SET RowCount = RowCount + excluded.RowCount", (table, start, end, count))
+            moved[table] = count
+
+        if moved:
+            migrations.rebuild_status_log_view(conn.cursor())
+    return moved
+
+
+def archive(before, directory=DEFAULT_ARCHIVE_DIR, path=None, vacuum=False):
+    # Archive every partition whose period ends on or before the start of before's month. Each file is written and
+    # re-read before its table is dropped, so a failure never loses events. Returns {table: archive file}
+    cutoff = month_start(before)
+    os.makedirs(directory, exist_ok=True)
+    archived = {}
+
+    with connection.writer(path) as conn:
+        for table, start, end, _, _ in partitions(conn):
+            if end > cutoff:
+                continue
+
+            archive_path = os.path.join(directory, f"{table}.jsonl.gz")
+            count = 0
+            with gzip.open(archive_path + ".tmp", "wt", encoding="utf-8") as handle:
+                for row in conn.execute(f"SELECT {migrations.STATUS_LOG_COLUMNS} FROM {table} ORDER BY FlightNumber, Timestamp"):
+                    handle.write(json.dumps(dict(zip(ARCHIVE_COLUMNS, row))) + "\n")
+                    count += 1
+            if sum(1 for _ in read_archive(archive_path + ".tmp")) != count:
+                raise OSError(f"Archive {archive_path} did not read back {count} events, {table} was kept")
+            os.replace(archive_path + ".tmp", archive_path)
+
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE LogPartitions SET ArchivePath = ?, ArchivedAt = ?, RowCount = ? WHERE TableName = ?",
+                         (archive_path, time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()), count, table))
+            conn.execute(f"DROP TABLE {table}")
+            migrations.rebuild_status_log_view(conn.cursor())
+            conn.commit()
+            archived[table] = archive_path
+
+        if vacuum and archived:
+            conn.execute("VACUUM") # Hands the dropped tables' pages back to the filesystem
+    return archived
+
+
+def read_archive(archive_path): # Yield archived events as tuples in column order
+    with gzip.open(archive_path, "rt", encoding="utf-8") as handle:
+        for line in handle:
+            event = json.loads(line)
+            yield tuple(event.get(column) for column in ARCHIVE_COLUMNS)
+
+
+def history(flight_number, since=None, until=None, include_archived=False, path=None):
+    # One flight's events in time order, since inclusive and until exclusive. Only Live and the partitions whose month
+    # overlaps the period are queried; archived partitions are read from their files when include_archived is set
+    since, until = since or EARLIEST, until or LATEST
+
+    with connection.reader(path) as conn:
+        conn.execute("BEGIN") # Catalog and tables from one snapshot, a concurrent roll can't move rows between reads
+        overlapping = [row for row in partitions(conn, include_archived) if row[1] < until and row[2] > since]
+        tables = [migrations.STATUS_LOG_LIVE] + [row[0] for row in overlapping if not row[4]]
+        sql = " UNION ALL ".join(f"SELECT {migrations.STATUS_LOG_COLUMNS} FROM {table}{HISTORY_FILTER}" for table in tables)
+        events = conn.execute(sql, [flight_number, since, until] * len(tables)).fetchall()
+
+    for row in overlapping:
+        if row[4]:
+            events += [event for event in read_archive(row[4]) if event[1] == flight_number and since <= (event[3] or "") < until]
+
+    events.sort(key=lambda event: (event[3] or "", event[0]))
+    return events
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FlightStatusLog partition maintenance")
+    parser.add_argument("command", choices=["list", "roll", "archive", "history"])
+    parser.add_argument("--db", default=None, help="database file (defaults to airline.db)")
+    parser.add_argument("--before", default=None, help="roll/archive: month (YYYY-MM) to keep, older data is moved")
+    parser.add_argument("--dir", default=DEFAULT_ARCHIVE_DIR, help="archive: where the compressed files are written")
+    parser.add_argument("--vacuum", action="store_true", help="archive: VACUUM afterwards to shrink the file")
+    parser.add_argument("--flight", help="history: flight number")
+    parser.add_argument("--since", default=None, help="history: from this timestamp (inclusive)")
+    parser.add_argument("--until", default=None, help="history: to this timestamp (exclusive)")
+    parser.add_argument("--archived", action="store_true", help="history: include archived partitions")
+    args = parser.parse_args()
+
+    if args.db:
+        connection.db_file = args.db
+    migrations.bootstrap()
+
+    if args.command == "list":
+        with connection.reader() as conn:
+            live = conn.execute(f"SELECT COUNT(*) FROM {migrations.STATUS_LOG_LIVE}").fetchone()[0]
+            print(f"{migrations.STATUS_LOG_LIVE:<26} | {'current':<21} | {live:>9} |")
+            for table, start, end, count, archive_path in partitions(conn, include_archived=True):
+                print(f"{table:<26} | {start[:10]} - {end[:10]} | {count:>9} | {archive_path or ''}")
+
+    elif args.command == "roll":
+        for table, count in roll(args.before).items():
+            print(f"{table}: {count} events moved")
+
+    elif args.command == "archive":
+        if not args.before:
+            parser.error("archive needs --before")
+        for table, archive_path in archive(args.before, args.dir, vacuum=args.vacuum).items():
+            print(f"{table} archived to {archive_path}")
+
+    elif args.command == "history":
+        if not args.flight:
+            parser.error("history needs --flight")
+        print("LogID | Status | Timestamp | Reason")
+        for log_id, _, status, timestamp, reason in history(args.flight, args.since, args.until, args.archived):
+            print(f"{log_id} | {status} | {timestamp} | {reason or ''}")
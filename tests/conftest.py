@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # The modules live flat in the repo root
+
+import connection
+import generate_data
+
+
+@pytest.fixture
+def seeded_db(tmp_path): # A small generated database, fully migrated, closed again after the test
+    path = str(tmp_path / "airline.db")
+    generate_data.generate(path, 300, seed=7, progress=False)
+    yield path
+    connection.close_all()
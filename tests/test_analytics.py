@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+import analytics
+import columnar
+import connection
+import data_access
+
+
+def snapshot(path, directory):
+    columnar.export(str(directory), path, progress=False)
+    return columnar.load(str(directory))
+
+
+def test_flights_per_destination_matches_stats(seeded_db, tmp_path):
+    expected = dict(data_access.stats(path=seeded_db)["flights_per_destination"])
+    assert analytics.flights_per_destination(snapshot(seeded_db, tmp_path / "snapshot")) == expected
+
+
+def test_flights_to_unknown_destinations_are_not_counted(seeded_db, tmp_path):
+    with connection.writer(seeded_db) as conn:
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("INSERT INTO Flights (FlightNumber, DepartureDateTime, ArrivalDateTime, DestinationID) VALUES ('ORPHAN', '2025-01-01 10:00:00', '2025-01-01 12:00:00', 9999)")
+        conn.commit()
+        conn.execute("PRAGMA foreign_keys = ON")
+
+    expected = dict(data_access.stats(live=True, path=seeded_db)["flights_per_destination"])
+    assert analytics.flights_per_destination(snapshot(seeded_db, tmp_path / "snapshot")) == expected
@@ -0,0 +1,52 @@
+import sqlite3
+
+import pytest
+
+import backup
+import connection
+
+
+def rows(path, sql="SELECT FlightNumber, DepartureDateTime, Status FROM Flights ORDER BY FlightNumber"):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def snapshot(seeded_db, tmp_path):
+    return backup.backup(seeded_db, str(tmp_path / "backups"), pages=8, sleep=0)
+
+
+def test_backup_verifies_and_restores_to_the_same_data(seeded_db, tmp_path, snapshot):
+    assert snapshot["steps"] > 1 # Stepped, not one copy
+    assert backup.verify(snapshot["file"])["tables"] == snapshot["tables"]
+    assert snapshot["tables"]["Flights"] == 300
+    assert [manifest["file"] for manifest in backup.snapshots(str(tmp_path / "backups"))] == [snapshot["file"]]
+
+    before = rows(seeded_db)
+    with connection.writer(seeded_db) as conn: # Later writes are not in the snapshot
+        conn.execute("UPDATE Flights SET Status = 'Cancelled'")
+    restored = str(tmp_path / "restored.db")
+    backup.restore(snapshot["file"], restored)
+    assert rows(restored) == before != rows(seeded_db)
+    assert rows(restored, "PRAGMA journal_mode") == [("wal",)]
+
+    with pytest.raises(FileExistsError, match="force"):
+        backup.restore(snapshot["file"], seeded_db)
+    backup.restore(snapshot["file"], seeded_db, force=True)
+    assert rows(seeded_db) == rows(restored)
+
+
+def test_damaged_snapshot_is_not_restored(tmp_path, snapshot):
+    with open(snapshot["file"], "r+b") as handle:
+        handle.seek(-100, 2)
+        handle.write(b"\xff" * 10)
+    with pytest.raises(ValueError, match="checksum"):
+        backup.verify(snapshot["file"])
+
+    restored = tmp_path / "restored.db"
+    with pytest.raises(ValueError, match="checksum"):
+        backup.restore(snapshot["file"], str(restored))
+    assert not restored.exists()
@@ -0,0 +1,74 @@
+import pytest
+
+import baggage
+import connection
+import data_access
+
+
+def booking(path, flight_number):
+    with connection.writer(path) as conn:
+        return conn.execute("INSERT INTO Bookings (PassengerID, FlightNumber, Class, BookingStatus) VALUES (1, ?, 'Economy', 'Confirmed')",
+                            (flight_number,)).lastrowid
+
+
+def ingest(path, scans): # Through the group-commit writer, as the service does. Returns its stats
+    ingestor = baggage.ScanIngestor(path, max_delay=0.01)
+    try:
+        ingestor.put_all([baggage.new_scan(*scan) for scan in scans])
+        assert ingestor.flush(5)
+    finally:
+        ingestor.stop()
+    return ingestor.stats()
+
+
+def recomputed(path): # Flight totals straight from Baggage, what the triggers must agree with
+    with connection.reader(path) as conn:
+        return {flight: (count, weight) for flight, count, weight in conn.execute(
+            "SELECT b.FlightNumber, COUNT(*), SUM(coalesce(g.Weight, 0)) FROM Baggage g JOIN Bookings b ON b.BookingID = g.BookingID "
+            "WHERE b.FlightNumber IN ('BG1', 'BG2') GROUP BY b.FlightNumber")}
+
+
+@pytest.fixture
+def bookings(seeded_db):
+    for flight_number in ("BG1", "BG2"):
+        data_access.create_flight({"FlightNumber": flight_number}, seeded_db)
+    return booking(seeded_db, "BG1"), booking(seeded_db, "BG2")
+
+
+def test_totals_follow_scans_reweighs_moves_and_deletes(seeded_db, bookings):
+    first, second = bookings
+    stats = ingest(seeded_db, [("T1", "CheckIn", "2025-01-01 08:00:00", "DESK", first, 20.0),
+                               ("T2", "CheckIn", "2025-01-01 08:01:00", "DESK", first, 15.5),
+                               ("T3", "CheckIn", "2025-01-01 08:02:00", "DESK", second, 10.0),
+                               ("T9", "Loaded", "2025-01-01 09:00:00", "RAMP"), # Never checked in
+                               ("T4", "CheckIn", "2025-01-01 08:03:00", "DESK", 999999, 5.0), # No such booking
+                               ("T5", "Teleported", "2025-01-01 08:04:00", "DESK", first, 5.0),
+                               ("T6", "CheckIn", "2025-01-01 08:05:00", "DESK", first, -1.0)])
+    assert (stats["committed"], stats["rejected"]) == (3, 4)
+    assert data_access.flight_baggage_totals("BG1", seeded_db) == (2, 35.5)
+    assert data_access.flight_baggage_totals("BG2", seeded_db) == (1, 10.0)
+
+    ingest(seeded_db, [("T1", "CheckIn", "2025-01-01 08:30:00", "DESK", first, 23.0)]) # Re-weigh
+    assert data_access.flight_baggage_totals("BG1", seeded_db) == (2, 38.5)
+
+    with connection.writer(seeded_db) as conn:
+        conn.execute("UPDATE Bookings SET FlightNumber = 'BG2' WHERE BookingID = ?", (first,))
+    assert data_access.flight_baggage_totals("BG1", seeded_db) == (0, 0.0)
+    assert data_access.flight_baggage_totals("BG2", seeded_db) == (3, 48.5)
+
+    with connection.writer(seeded_db) as conn:
+        conn.execute("DELETE FROM Baggage WHERE TagNumber = 'T3'")
+    assert data_access.flight_baggage_totals("BG2", seeded_db) == (2, 38.5)
+    assert recomputed(seeded_db) == {"BG2": (2, 38.5)}
+
+
+def test_late_scan_keeps_the_newest_checkpoint(seeded_db, bookings):
+    ingest(seeded_db, [("T1", "CheckIn", "2025-01-01 08:00:00", "DESK", bookings[0], 20.0),
+                       ("T1", "Claimed", "2025-01-01 12:00:00", "BELT")])
+    ingest(seeded_db, [("T1", "Unloaded", "2025-01-01 11:00:00", "RAMP")]) # Arrives after the claim
+
+    [bag] = data_access.bags_for_flight("BG1", seeded_db)
+    assert dict(zip(baggage.BAG_COLUMNS, bag))["LastCheckpoint"] == "Claimed"
+    with connection.reader(seeded_db) as conn:
+        assert conn.execute(baggage.SCAN_HISTORY_SQL, ("T1",)).fetchall() == [
+            ("CheckIn", "2025-01-01 08:00:00", "DESK"), ("Unloaded", "2025-01-01 11:00:00", "RAMP"), ("Claimed", "2025-01-01 12:00:00", "BELT")]
@@ -0,0 +1,31 @@
+import csv
+
+import bulk_import
+import connection
+
+
+def write_csv(path, columns, rows):
+    with open(path, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(columns)
+        writer.writerows(rows)
+
+
+def test_fast_load_only_rejects_its_own_rows(seeded_db, tmp_path):
+    with connection.writer(seeded_db) as conn:
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("INSERT INTO Flights (FlightNumber, DepartureDateTime, ArrivalDateTime, DestinationID) VALUES ('OLD1', '2025-01-01 10:00:00', '2025-01-01 12:00:00', 9999)")
+        conn.commit()
+        conn.execute("PRAGMA foreign_keys = ON")
+
+    feed = str(tmp_path / "flights.csv")
+    write_csv(feed, ["FlightNumber", "DepartureDateTime", "ArrivalDateTime", "DestinationID"],
+              [["NEW1", "2025-02-01 10:00:00", "2025-02-01 12:00:00", 1], ["NEW2", "2025-02-01 10:00:00", "2025-02-01 12:00:00", 9999]])
+    summary = bulk_import.import_file("flights", feed, fast=True, db_path=seeded_db, progress=False)
+
+    assert (summary["inserted"], summary["rejected"]) == (1, 1)
+    with connection.reader(seeded_db) as conn:
+        numbers = {number for (number,) in conn.execute("SELECT FlightNumber FROM Flights WHERE FlightNumber IN ('OLD1', 'NEW1', 'NEW2')")}
+        assert numbers == {"OLD1", "NEW1"}
+    with connection.writer(seeded_db) as conn: # The tracking trigger and table are gone from the writer
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_temp_master").fetchone()[0] == 0
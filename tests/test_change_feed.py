@@ -0,0 +1,45 @@
+import pytest
+
+import change_feed
+import connection
+import data_access
+
+
+def operations(batch):
+    return [(table, key, operation, columns) for _, table, key, operation, columns, _ in batch]
+
+
+def test_consumer_sees_each_change_until_it_acknowledges(seeded_db):
+    change_feed.register("billing", path=seeded_db)
+    data_access.create_flight({"FlightNumber": "CDC1", "Status": "Scheduled"}, seeded_db)
+    data_access.update_flight("CDC1", status="Delayed", path=seeded_db)
+    data_access.update_flight("CDC1", status="Delayed", path=seeded_db) # No-op, not a change
+    data_access.update_destination(1, city="Renamed", path=seeded_db)
+
+    batch = change_feed.pull("billing", path=seeded_db)
+    assert operations(batch) == [("Flights", "CDC1", "INSERT", None), ("Flights", "CDC1", "UPDATE", "Status"),
+                                 ("Destinations", "1", "UPDATE", "City")]
+    assert [seq for seq, *_ in batch] == sorted(seq for seq, *_ in batch)
+    assert change_feed.pull("billing", path=seeded_db) == batch # Not acknowledged, so delivered again
+    assert operations(change_feed.pull("billing", tables=["Destinations"], path=seeded_db)) == [("Destinations", "1", "UPDATE", "City")]
+
+    change_feed.acknowledge("billing", batch[1][0], path=seeded_db)
+    change_feed.acknowledge("billing", batch[0][0], path=seeded_db) # Never moves backwards
+    assert change_feed.pull("billing", path=seeded_db) == batch[2:]
+
+    handled = []
+    assert change_feed.consume("billing", handled.extend, batch_size=1, path=seeded_db) == 1
+    assert handled == batch[2:] and change_feed.pull("billing", path=seeded_db) == []
+
+
+def test_truncation_expires_consumers_left_behind(seeded_db):
+    change_feed.register("slow", path=seeded_db)
+    data_access.create_flight({"FlightNumber": "CDC2"}, seeded_db)
+    with connection.writer(seeded_db) as conn:
+        conn.execute("UPDATE ChangeLog SET ChangedAt = '2000-01-01 00:00:00'") # Everything is past retention
+
+    assert change_feed.truncate(path=seeded_db) >= 1
+    with pytest.raises(change_feed.CursorExpiredError):
+        change_feed.pull("slow", path=seeded_db)
+    change_feed.register("fresh", path=seeded_db)
+    assert change_feed.pull("fresh", path=seeded_db) == []
@@ -0,0 +1,67 @@
+import pytest
+
+import connection
+import data_access
+import duty_conflicts
+import migrations
+
+
+def new_pilot(path, flights): # A pilot with no flights yet plus the given (flight number, departure, arrival) rows, unassigned
+    with connection.writer(path) as conn:
+        pilot_id = conn.execute("INSERT INTO Pilots (FirstName, LastName) VALUES ('Test', 'Pilot')").lastrowid
+        conn.executemany("INSERT INTO Flights (FlightNumber, DepartureDateTime, ArrivalDateTime, Status) VALUES (?, ?, ?, 'Scheduled')", flights)
+    return pilot_id
+
+
+def pilot_of(path, flight_number):
+    return data_access.get_flight(flight_number, path)[5]
+
+
+def test_overlap_and_rest_gap_are_refused_atomically(seeded_db):
+    pilot_id = new_pilot(seeded_db, [("D1", "2030-01-01 08:00:00", "2030-01-01 12:00:00"),
+                                     ("D2", "2030-01-01 11:00:00", "2030-01-01 13:00:00"),
+                                     ("D3", "2030-01-01 12:30:00", "2030-01-01 14:00:00"),
+                                     ("D4", "2030-01-01 15:00:00", "2030-01-01 16:00:00")])
+    data_access.assign_pilot("D1", pilot_id, path=seeded_db)
+
+    with pytest.raises(data_access.DutyConflictError) as error:
+        data_access.assign_pilots([("D4", pilot_id), ("D2", pilot_id)], path=seeded_db)
+    assert error.value.conflicts == [("D2", pilot_id, ["D1"])]
+    assert pilot_of(seeded_db, "D4") is None # Nothing from the failed batch is written
+
+    with pytest.raises(data_access.DutyConflictError): # Overlaps nothing, but only 30 minutes of rest
+        data_access.assign_pilot("D3", pilot_id, path=seeded_db)
+    data_access.assign_pilot("D3", pilot_id, min_rest_minutes=15, path=seeded_db)
+    assert [conflict for conflict in duty_conflicts.audit(seeded_db) if conflict[0] == pilot_id] == [(pilot_id, "D1", "D3")]
+
+
+def test_moving_a_flight_away_frees_its_slot_within_the_batch(seeded_db):
+    first = new_pilot(seeded_db, [("M1", "2030-02-01 08:00:00", "2030-02-01 12:00:00"), ("M2", "2030-02-01 09:00:00", "2030-02-01 11:00:00")])
+    second = new_pilot(seeded_db, [])
+    data_access.assign_pilot("M1", first, path=seeded_db)
+
+    data_access.assign_pilots([("M1", second), ("M2", first)], path=seeded_db)
+    assert (pilot_of(seeded_db, "M1"), pilot_of(seeded_db, "M2")) == (second, first)
+
+
+def test_flight_without_times_is_assigned_without_a_check(seeded_db):
+    first, second = new_pilot(seeded_db, [("T0", "2030-04-01 08:00:00", "2030-04-01 10:00:00")]), new_pilot(seeded_db, [("T1", None, None)])
+    data_access.assign_pilot("T0", first, path=seeded_db)
+    data_access.create_flight({"FlightNumber": "FLX", "PilotID": first}, seeded_db)
+
+    data_access.assign_pilot("FLX", second, path=seeded_db)
+    data_access.assign_pilot("T1", second, path=seeded_db)
+    assert pilot_of(seeded_db, "FLX") == pilot_of(seeded_db, "T1") == second
+
+
+def test_assignment_reads_times_like_the_index(seeded_db):
+    # Text stored before migration 10 added the format checks; SQLite still parses it, so it has to clash
+    with connection.writer(seeded_db) as conn:
+        migrations.drop_timestamp_check_triggers(conn.cursor())
+    pilot_id = new_pilot(seeded_db, [("L1", "2030-03-01 08:00", "2030-03-01 12:00"), ("L2", "2030-03-01T09:00:00", "2030-03-01T10:00:00")])
+    with connection.writer(seeded_db) as conn:
+        migrations.create_timestamp_check_triggers(conn.cursor())
+    data_access.assign_pilot("L1", pilot_id, path=seeded_db)
+
+    with pytest.raises(data_access.DutyConflictError):
+        data_access.assign_pilot("L2", pilot_id, path=seeded_db)
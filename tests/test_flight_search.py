@@ -0,0 +1,47 @@
+import connection
+import flight_search
+import migrations
+
+
+def undate(path, flight_numbers):
+    with connection.writer(path) as conn:
+        conn.executemany("UPDATE Flights SET DepartureDateTime = NULL WHERE FlightNumber = ?", [(number,) for number in flight_numbers])
+
+
+def all_flight_numbers(path):
+    with connection.reader(path) as conn:
+        return sorted(number for (number,) in conn.execute("SELECT FlightNumber FROM Flights"))
+
+
+def test_page_ending_on_undated_flight_continues(seeded_db):
+    undated = all_flight_numbers(seeded_db)[:3]
+    undate(seeded_db, undated)
+
+    rows, after = flight_search.search_page(page_size=2, path=seeded_db)
+    assert [row[0] for row in rows] == undated[:2]
+    assert after == (None, undated[1])
+
+    rows, after = flight_search.search_page(after=after, page_size=2, path=seeded_db)
+    assert rows[0][0] == undated[2]
+    assert rows[1][1] is not None
+
+
+def test_pages_cover_every_flight_once(seeded_db):
+    undate(seeded_db, all_flight_numbers(seeded_db)[::50])
+
+    seen = [row[0] for page in flight_search.iter_pages(page_size=1, path=seeded_db) for row in page]
+    assert sorted(seen) == all_flight_numbers(seeded_db)
+    assert len(seen) == len(set(seen))
+
+
+def test_pages_continue_past_pre_migration_timestamps(seeded_db):
+    # Text written before migration 10's format checks, still parsed by SQLite into DepartureEpoch
+    legacy = all_flight_numbers(seeded_db)[:2]
+    with connection.writer(seeded_db) as conn:
+        migrations.drop_timestamp_check_triggers(conn.cursor())
+        conn.execute("UPDATE Flights SET DepartureDateTime = '2024-12-01 08:00' WHERE FlightNumber = ?", (legacy[0],))
+        conn.execute("UPDATE Flights SET DepartureDateTime = '2024-12-01T09:00:00' WHERE FlightNumber = ?", (legacy[1],))
+        migrations.create_timestamp_check_triggers(conn.cursor())
+
+    seen = [row[0] for page in flight_search.iter_pages(page_size=1, path=seeded_db) for row in page]
+    assert sorted(seen) == all_flight_numbers(seeded_db)
@@ -0,0 +1,33 @@
+import logging
+
+import group_commit
+
+
+def test_failed_batch_is_reported_not_printed(seeded_db, caplog, capsys):
+    failures = []
+
+    def write(conn, events):
+        if "bad" in events:
+            raise ValueError("bad event")
+        return len(events), 0
+
+    def on_error(events, error):
+        failures.append((list(events), str(error)))
+        raise RuntimeError("handler broke") # Must not stop the writer
+
+    ingestor = group_commit.GroupCommitIngestor(write, "test", seeded_db, max_delay=0.01, on_error=on_error)
+    try:
+        with caplog.at_level(logging.ERROR, logger="group_commit"):
+            ingestor.put_all(["ok", "bad"])
+            assert ingestor.flush(5)
+            ingestor.put("fine")
+            assert ingestor.flush(5)
+    finally:
+        ingestor.stop()
+
+    assert failures == [(["ok", "bad"], "bad event")]
+    stats = ingestor.stats()
+    assert (stats["failed_batches"], stats["rejected"], stats["committed"]) == (1, 2, 1)
+    assert stats["last_error"].endswith(": bad event")
+    assert "Test batch of 2 events failed" in caplog.text and "handler broke" in caplog.text
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,28 @@
+import time
+
+import instrumentation
+
+
+def test_streamed_operation_is_timed_while_consumed(monkeypatch):
+    monkeypatch.setattr(instrumentation, "enabled", True)
+    instrumentation.reset()
+    seen = []
+
+    def rows():
+        for row in range(3):
+            time.sleep(0.02)
+            seen.append(instrumentation.current_operation())
+            yield row
+
+    @instrumentation.operation
+    def stream_rows():
+        return rows()
+
+    result = stream_rows()
+    assert "stream_rows" not in instrumentation.snapshot()["operations"]
+    for _ in result:
+        assert instrumentation.current_operation() is None # The caller's own work isn't tagged or timed
+
+    timing = instrumentation.snapshot()["operations"]["stream_rows"]
+    assert seen == ["stream_rows"] * 3
+    assert timing["count"] == 1 and timing["total_ms"] >= 60
@@ -0,0 +1,65 @@
+import os
+import shutil
+
+import connection
+import data_access
+import migrations
+
+REPO_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "airline.db")
+TABLES = ("Destinations", "Pilots", "Aircrafts", "Flights", "Passengers", "Bookings", "Baggage", "FlightStatusLog")
+
+
+def schema(path): # Every schema object by (type, name), with its SQL
+    with connection.reader(path) as conn:
+        return {(kind, name): sql for kind, name, sql in conn.execute("SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'")}
+
+
+def row_counts(path):
+    with connection.reader(path) as conn:
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES}
+
+
+def test_bootstrap_is_idempotent(tmp_path):
+    path = str(tmp_path / "fresh.db")
+    try:
+        assert migrations.bootstrap(path) == (list(range(1, migrations.latest_version() + 1)), True)
+        before, counts = schema(path), row_counts(path)
+
+        assert migrations.bootstrap(path) == ([], False)
+        assert schema(path) == before and row_counts(path) == counts
+    finally:
+        connection.close_all()
+
+
+def test_every_version_upgrades_to_the_same_schema(tmp_path, monkeypatch):
+    full = str(tmp_path / "full.db")
+    try:
+        migrations.bootstrap(full)
+        expected, counts = schema(full), row_counts(full)
+
+        for version in range(1, migrations.latest_version()):
+            path = str(tmp_path / f"v{version}.db")
+            with monkeypatch.context() as patch: # A database left at this version by an older release, seeded there
+                patch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:version])
+                migrations.bootstrap(path)
+            with connection.reader(path) as conn:
+                assert migrations.current_version(conn) == version
+
+            assert migrations.bootstrap(path) == (list(range(version + 1, migrations.latest_version() + 1)), False)
+            assert schema(path) == expected, f"upgrading from version {version}"
+            assert row_counts(path) == counts
+            assert data_access.stats(path=path) == data_access.stats(live=True, path=path) # Summaries built from the existing rows
+    finally:
+        connection.close_all()
+
+
+def test_pre_versioning_database_is_adopted_without_reseeding(tmp_path):
+    path = str(tmp_path / "airline.db")
+    shutil.copy(REPO_DB, path)
+    try:
+        counts = row_counts(path)
+        applied, seeded = migrations.bootstrap(path)
+        assert applied == list(range(1, migrations.latest_version() + 1)) and not seeded
+        assert row_counts(path) == counts
+    finally:
+        connection.close_all()
@@ -0,0 +1,54 @@
+import pytest
+
+import connection
+import passenger_search
+
+
+def add_passenger(path, first, last, email, passport, booking_dates=()):
+    with connection.writer(path) as conn:
+        passenger_id = conn.execute("INSERT INTO Passengers (FirstName, LastName, Email, PassportNumber) VALUES (?, ?, ?, ?)",
+                                    (first, last, email, passport)).lastrowid
+        flight_number = conn.execute("SELECT FlightNumber FROM Flights LIMIT 1").fetchone()[0]
+        conn.executemany("INSERT INTO Bookings (PassengerID, FlightNumber, BookingDate, Class, BookingStatus) VALUES (?, ?, ?, 'Economy', 'Confirmed')",
+                         [(passenger_id, flight_number, date) for date in booking_dates])
+    return passenger_id
+
+
+def found(path, text, **options):
+    return [passenger[0] for passenger, _ in passenger_search.search(text, path=path, **options)]
+
+
+def test_prefix_terms_find_names_emails_and_passports(seeded_db):
+    passenger_id = add_passenger(seeded_db, "Zephyrine", "Quillfeather", "zephyrine.q@example.org", "ZQ7781234")
+
+    for text in ("zeph quill", "QUILLFEATHER", "ZQ778", "zephyrine.q@", "zephyrine.q@example.org"):
+        assert found(seeded_db, text) == [passenger_id], text
+    assert passenger_id not in found(seeded_db, "example.org") # Email terms match whole addresses from the start
+    assert found(seeded_db, "zeph nobody") == []
+
+
+def test_index_follows_inserts_updates_and_deletes(seeded_db):
+    passenger_id = add_passenger(seeded_db, "Ottoline", "Brackenbury", "ob@example.org", "OB0000001")
+    with connection.writer(seeded_db) as conn:
+        conn.execute("UPDATE Passengers SET LastName = 'Featherstonehaugh' WHERE PassengerID = ?", (passenger_id,))
+    assert found(seeded_db, "brackenbury") == []
+    assert found(seeded_db, "ottoline feather") == [passenger_id]
+
+    with connection.writer(seeded_db) as conn:
+        conn.execute("DELETE FROM Passengers WHERE PassengerID = ?", (passenger_id,))
+    assert found(seeded_db, "ottoline") == []
+
+
+def test_latest_bookings_come_with_each_match(seeded_db):
+    add_passenger(seeded_db, "Perpetua", "Wolstenholme", "pw@example.org", "PW0000001", ["2024-01-01", "2024-03-01", "2024-02-01"])
+    [(passenger, bookings)] = passenger_search.search("perpetua", bookings_per_passenger=2, path=seeded_db)
+    assert passenger[1:3] == ("Perpetua", "Wolstenholme")
+    with connection.reader(seeded_db) as conn:
+        dates = [conn.execute("SELECT BookingDate FROM Bookings WHERE BookingID = ?", (booking[0],)).fetchone()[0] for booking in bookings]
+    assert dates == ["2024-03-01", "2024-02-01"] # The newest two
+
+
+def test_typed_text_is_never_fts_syntax(seeded_db):
+    assert found(seeded_db, 'quill" OR NEAR(') == []
+    with pytest.raises(ValueError):
+        passenger_search.search("  *?- ", path=seeded_db)
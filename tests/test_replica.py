@@ -0,0 +1,38 @@
+import contextlib
+import os
+import time
+
+import connection
+import replica
+
+
+def is_memory(conn): # A deserialized copy has a placeholder name where a file reader has the file's path
+    return not os.path.isabs(conn.execute("PRAGMA database_list").fetchone()[2])
+
+
+def test_copies_are_capped_at_the_pool_size(seeded_db):
+    connection.close_all() # Generating the database opened a default-sized pool
+    connection.get_manager(seeded_db, 2)
+    replicas = replica.enable(seeded_db)
+    with contextlib.ExitStack() as held:
+        readers = [held.enter_context(connection.reader(seeded_db)) for _ in range(3)]
+        assert [is_memory(conn) for conn in readers] == [True, True, False]
+    stats = replicas.stats()
+    assert (stats["reader_copies"], stats["replica_reads"], stats["disk_reads"]) == (2, 2, 1)
+
+
+def test_commits_within_half_the_bound_share_one_refresh(seeded_db):
+    replicas = replica.enable(seeded_db, max_staleness=1.0, refresh_interval=0.02)
+    for status in ("Delayed", "Scheduled", "Delayed"):
+        with connection.writer(seeded_db) as conn:
+            conn.execute("UPDATE Flights SET Status = ? WHERE rowid = 1", (status,))
+        time.sleep(0.05)
+    assert replicas.stats()["refreshes"] == 1 # Just the initial load, the commits are still pending
+
+    deadline = time.monotonic() + 2
+    while replicas.lag() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert replicas.stats()["refreshes"] == 2
+    with connection.reader(seeded_db) as conn:
+        assert is_memory(conn)
+        assert conn.execute("SELECT Status FROM Flights WHERE rowid = 1").fetchone()[0] == "Delayed"
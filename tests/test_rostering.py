@@ -0,0 +1,23 @@
+import rostering
+
+HOUR = 3600
+
+
+def test_flight_without_arrival_still_blocks_its_pilot():
+    rows = [
+        ("FL1", "Scheduled", 1, 10 * HOUR, None), # Pilot 1 keeps this one, arrival unknown
+        ("FL2", "Scheduled", None, 12 * HOUR, 14 * HOUR),
+    ]
+    changes, report = rostering.solve(rows, [1, 2], rostering.EARLIEST, rostering.LATEST)
+    assert changes == [(2, "FL2")]
+    assert report["unassigned"] == [("FL1", "arrival time missing or before departure, left as is")]
+    assert report["flights"] == 2 and report["max_per_pilot"] == 1
+
+
+def test_flight_after_the_conservative_window_can_reuse_the_pilot():
+    rows = [
+        ("FL1", "Departed", 1, 10 * HOUR, 5 * HOUR), # Arrival before departure
+        ("FL2", "Scheduled", None, (10 + rostering.CONTEXT_HOURS + 1) * HOUR, (12 + rostering.CONTEXT_HOURS) * HOUR),
+    ]
+    changes, _ = rostering.solve(rows, [1], rostering.EARLIEST, rostering.LATEST)
+    assert changes == [(1, "FL2")]
@@ -0,0 +1,20 @@
+import connection
+import seat_inventory
+
+
+def test_cabins_follow_booked_classes(seeded_db):
+    with connection.writer(seeded_db) as conn:
+        flight_number = conn.execute("SELECT f.FlightNumber FROM Flights f JOIN Aircrafts a ON a.AircraftID = f.AircraftID WHERE a.Capacity >= 100 LIMIT 1").fetchone()[0]
+        conn.execute("UPDATE Bookings SET BookingStatus = 'Cancelled' WHERE FlightNumber = ?", (flight_number,))
+        conn.execute("INSERT INTO Bookings (PassengerID, FlightNumber, SeatNumber, Class, BookingStatus) VALUES (1, ?, '1A', 'Business', 'Confirmed')", (flight_number,))
+
+    inventory = seat_inventory.SeatInventory(seeded_db).flight(flight_number)
+    assert inventory.layout.cabin_of(inventory.layout.index("1A")) == "Business"
+    assert inventory.taken["Business"] == 1 and inventory.misclassed == 0
+
+
+def test_bookings_out_of_cabin_order_keep_the_default_layout():
+    rows = 30
+    defaults = seat_inventory.cabin_row_ends(rows)
+    assert seat_inventory.cabin_row_ends(rows, {"Economy": (0, 0), "First": (10, 10)}) == defaults
+    assert seat_inventory.cabin_row_ends(rows, {"Business": (0, 3)})[0] == 0
@@ -0,0 +1,96 @@
+import http.client
+import json
+import queue
+import threading
+import urllib.parse
+
+import pytest
+
+import connection
+import group_commit
+import service
+
+
+@pytest.fixture
+def server(seeded_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(connection, "db_file", str(tmp_path / "default.db")) # Only the server's own path may be used
+    server, writes = service.make_server(port=0, path=seeded_db)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, writes
+    server.shutdown()
+    server.server_close()
+    writes.stop()
+
+
+def test_refused_body_closes_the_connection(server, monkeypatch):
+    monkeypatch.setattr(service, "MAX_BODY", 10)
+    conn = http.client.HTTPConnection("127.0.0.1", server[0].server_address[1])
+    conn.request("POST", "/roster", json.dumps({"dry_run": True, "padding": "x" * 100}))
+    response = conn.getresponse()
+    response.read()
+    assert response.status == 413
+    assert response.getheader("Connection") == "close"
+
+
+def test_write_timeout_is_503_and_drops_the_write(server, monkeypatch):
+    _, writes = server
+    monkeypatch.setattr(service, "WRITE_TIMEOUT", 0.05)
+    release, applied = threading.Event(), []
+    writes.submit(release.wait) # Keeps the writer thread busy
+    with pytest.raises(service.WriteTimeoutError, match="dropped"):
+        writes.call(applied.append, "late")
+    release.set()
+    writes.call(lambda: None) # Everything queued before this has run or been dropped
+    assert applied == []
+    assert service.error_status(service.WriteTimeoutError()) == 503
+
+
+def test_put_all_queues_a_whole_batch_or_nothing():
+    events = group_commit.EventQueue(3)
+    events.put("queued")
+    with pytest.raises(queue.Full):
+        events.put_all(["a", "b", "c"])
+    assert events.qsize() == 1
+    events.put_all(["a", "b"])
+    assert [events.get_nowait() for _ in range(3)] == ["queued", "a", "b"]
+
+
+def test_flight_cursor_pages_through_every_flight(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server[0].server_address[1])
+    seen, after = [], ""
+    while after is not None:
+        conn.request("GET", "/flights?page_size=100" + (f"&after={urllib.parse.quote(after)}" if after else ""))
+        page = json.loads(conn.getresponse().read())
+        seen += [flight["FlightNumber"] for flight in page["flights"]]
+        after = page["next"]
+    assert len(seen) == len(set(seen)) == 300
+
+    conn.request("GET", "/flights?after=" + urllib.parse.quote("2024-12-01 08:00:00|FL101"))
+    response = conn.getresponse()
+    response.read()
+    assert response.status == 400
+
+
+def request(server, method, url, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", server[0].server_address[1])
+    conn.request(method, url, None if body is None else json.dumps(body))
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_every_route_uses_the_server_database(server, seeded_db, tmp_path):
+    with connection.reader(seeded_db) as conn:
+        flight_number, pilot_id = conn.execute("SELECT FlightNumber, PilotID FROM Flights WHERE PilotID IS NOT NULL LIMIT 1").fetchone()
+
+    assert request(server, "PATCH", f"/flights/{flight_number}", {"status": "Delayed"})[1]["Status"] == "Delayed"
+    for url in (f"/flights/{flight_number}/seats", f"/flights/{flight_number}/baggage", f"/pilots/{pilot_id}/schedule", "/pilots", "/stats", "/changes?consumer=test"):
+        assert request(server, "GET", url)[0] == 200, url
+    assert request(server, "POST", "/roster", {"dry_run": True})[0] == 200
+    assert not (tmp_path / "default.db").exists()
+
+
+@pytest.mark.parametrize("value", [None, "60", 1.5, -1, True])
+def test_min_rest_must_be_a_whole_number(server, value):
+    status, result = request(server, "PUT", "/flights/FL101/pilot", {"pilot_id": 1, "min_rest_minutes": value})
+    assert status == 400 and "min_rest_minutes" in result["error"]
+    assert request(server, "POST", "/roster", {"dry_run": True, "min_rest_minutes": value})[0] == 400
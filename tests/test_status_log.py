@@ -0,0 +1,45 @@
+import pytest
+
+import connection
+import data_access
+import migrations
+import status_log
+
+EVENTS = [("Scheduled", "2024-01-10 08:00:00"), ("Delayed", "2024-01-31 23:59:59"), ("Boarding", "2024-02-01 00:00:00"),
+          ("Departed", "2024-02-15 09:30:00"), ("Arrived", "2024-03-02 12:00:00")]
+
+
+def log_events(path, flight_number, events):
+    with connection.writer(path) as conn:
+        conn.executemany("INSERT INTO FlightStatusLog (FlightNumber, Status, Timestamp) VALUES (?, ?, ?)",
+                         [(flight_number, status, timestamp) for status, timestamp in events])
+
+
+def statuses(events):
+    return [event[2] for event in events]
+
+
+def test_roll_then_archive_keeps_every_event_reachable(seeded_db, tmp_path):
+    data_access.create_flight({"FlightNumber": "SL1"}, seeded_db)
+    log_events(seeded_db, "SL1", EVENTS)
+
+    moved = status_log.roll("2024-03", path=seeded_db)
+    assert moved["FlightStatusLog_202401"] >= 2 and moved["FlightStatusLog_202402"] >= 2
+    assert status_log.roll("2024-03", path=seeded_db) == {}
+    with connection.reader(seeded_db) as conn:
+        assert conn.execute(f"SELECT Status FROM {migrations.STATUS_LOG_LIVE} WHERE FlightNumber = 'SL1'").fetchall() == [("Arrived",)]
+        assert conn.execute("SELECT COUNT(*) FROM FlightStatusLog WHERE FlightNumber = 'SL1'").fetchone()[0] == len(EVENTS)
+
+    assert statuses(status_log.history("SL1", path=seeded_db)) == [status for status, _ in EVENTS]
+    assert statuses(status_log.history("SL1", "2024-01-31 23:59:59", "2024-02-15 09:30:00", path=seeded_db)) == ["Delayed", "Boarding"]
+
+    archived = status_log.archive("2024-02", str(tmp_path / "archive"), path=seeded_db)
+    assert "FlightStatusLog_202401" in archived and "FlightStatusLog_202402" not in archived
+    with connection.reader(seeded_db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'FlightStatusLog_202401'").fetchone()[0] == 0
+    assert statuses(status_log.history("SL1", path=seeded_db)) == ["Boarding", "Departed", "Arrived"]
+    assert statuses(status_log.history("SL1", include_archived=True, path=seeded_db)) == [status for status, _ in EVENTS]
+
+    log_events(seeded_db, "SL1", [("Cancelled", "2024-01-20 10:00:00")]) # Late event for a month already archived
+    with pytest.raises(ValueError, match="already archived"):
+        status_log.roll("2024-03", path=seeded_db)